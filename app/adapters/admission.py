@@ -0,0 +1,94 @@
+import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Protocol
+
+from app.adapters import metrics
+from app.domain import exceptions
+
+
+class AdmissionProtocol(Protocol):
+    def check(self, pixels: list[int]):
+        raise NotImplementedError
+
+    def __call__(self, user_id: int, pixels: list[int]) -> AsyncIterator[None]:
+        raise NotImplementedError
+
+
+class AdmissionController:
+    """
+    Bounds the image work one worker takes on at a time:
+
+    - a single image above max_image_pixels is refused outright (ImageTooLarge);
+    - a user may have at most per_user publishes in flight;
+    - pixels of all admitted requests, read from headers, stay within max_pixels;
+    - at most max_jobs publishes run at once, a request waits queue_timeout for a slot.
+
+    Anything over a limit raises AdmissionRejected immediately instead of queueing.
+    """
+
+    def __init__(
+            self,
+            max_pixels: int = 200_000_000,
+            max_image_pixels: int = 50_000_000,
+            max_jobs: int = 4,
+            per_user: int = 2,
+            queue_timeout: float = 0.5,
+            retry_after: int = 1
+    ):
+        self.max_pixels = max_pixels
+        self.max_image_pixels = max_image_pixels
+        self.per_user = per_user
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.pixels = 0
+        self._jobs = asyncio.Semaphore(max_jobs)
+        self._users: dict[int, int] = defaultdict(int)
+
+    def _reject(self, reason: str):
+        metrics.ADMISSION_REJECTED.labels(reason).inc()
+        raise exceptions.AdmissionRejected(reason, self.retry_after)
+
+    def check(self, pixels: list[int]):
+        """Refuse images above max_image_pixels without taking a slot, for work done elsewhere."""
+        if any(p > self.max_image_pixels for p in pixels):
+            metrics.ADMISSION_REJECTED.labels("image_pixels").inc()
+            raise exceptions.ImageTooLarge(max(pixels))
+
+    @asynccontextmanager
+    async def __call__(self, user_id: int, pixels: list[int]) -> AsyncIterator[None]:
+        self.check(pixels)
+        total = sum(pixels)
+        if self._users[user_id] >= self.per_user:
+            self._reject("per_user")
+        # the first request is always admitted so a post bigger than the budget can still run alone
+        if self.pixels and self.pixels + total > self.max_pixels:
+            self._reject("pixels")
+
+        self._users[user_id] += 1
+        self.pixels += total
+        try:
+            try:
+                # wait_for can lose a slot acquired just as the timeout fires, asyncio.timeout cannot
+                async with asyncio.timeout(self.queue_timeout):
+                    await self._jobs.acquire()
+            except TimeoutError:
+                self._reject("jobs")
+            try:
+                yield
+            finally:
+                self._jobs.release()
+        finally:
+            self.pixels -= total
+            self._users[user_id] -= 1
+            if not self._users[user_id]:
+                del self._users[user_id]
+
+
+class NoAdmission:
+    def check(self, pixels: list[int]):
+        pass
+
+    @asynccontextmanager
+    async def __call__(self, user_id: int, pixels: list[int]) -> AsyncIterator[None]:
+        yield
@@ -0,0 +1,104 @@
+import io
+import time
+from typing import Protocol
+
+import numpy as np
+from PIL import Image
+
+_C1 = (0.01 * 255) ** 2
+_C2 = (0.03 * 255) ** 2
+
+
+def _box_mean(x: np.ndarray, window: int) -> np.ndarray:
+    s = np.pad(x, ((1, 0), (1, 0))).cumsum(axis=0).cumsum(axis=1)
+    return (
+        s[window:, window:] - s[:-window, window:] - s[window:, :-window] + s[:-window, :-window]
+    ) / (window * window)
+
+
+def ssim(a: np.ndarray, b: np.ndarray, window: int = 7) -> float:
+    """Mean structural similarity of two grayscale images of equal shape."""
+    window = min(window, *a.shape)
+    mu_a, mu_b = _box_mean(a, window), _box_mean(b, window)
+    var_a = _box_mean(a * a, window) - mu_a * mu_a
+    var_b = _box_mean(b * b, window) - mu_b * mu_b
+    cov = _box_mean(a * b, window) - mu_a * mu_b
+    ssim_map = ((2 * mu_a * mu_b + _C1) * (2 * cov + _C2)) / (
+        (mu_a * mu_a + mu_b * mu_b + _C1) * (var_a + var_b + _C2)
+    )
+    return float(ssim_map.mean())
+
+
+def _preview_size(size: tuple[int, int], limit: int) -> tuple[int, int]:
+    width, height = size
+    scale = min(1.0, limit / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _luma(image: Image.Image, size: tuple[int, int]) -> np.ndarray:
+    return np.asarray(image.convert("L").resize(size, Image.BOX), dtype=np.float64)
+
+
+class EncoderProtocol(Protocol):
+    def __call__(self, image: Image.Image) -> tuple[bytes, int]:
+        raise NotImplementedError
+
+
+class JPEGEncoder:
+    def __init__(self, quality: int = 95):
+        self.quality = quality
+
+    def __call__(self, image: Image.Image) -> tuple[bytes, int]:
+        buffer = io.BytesIO()
+        image.save(buffer, "jpeg", optimize=True, quality=self.quality)
+        return buffer.getvalue(), self.quality
+
+
+class AdaptiveJPEGEncoder:
+    """
+    Binary search for the lowest JPEG quality whose downscaled copy keeps SSIM
+    above the threshold. Falls back to max_quality when the time budget runs out
+    before any candidate passes.
+    """
+
+    def __init__(
+            self,
+            min_quality: int = 60,
+            max_quality: int = 95,
+            threshold: float = 0.985,
+            time_budget: float = 0.5,
+            preview: int = 256
+    ):
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.threshold = threshold
+        self.time_budget = time_budget
+        self.preview = preview
+
+    @staticmethod
+    def _encode(image: Image.Image, quality: int) -> bytes:
+        buffer = io.BytesIO()
+        image.save(buffer, "jpeg", optimize=True, progressive=True, quality=quality)
+        return buffer.getvalue()
+
+    def _score(self, data: bytes, reference: np.ndarray, size: tuple[int, int]) -> float:
+        with Image.open(io.BytesIO(data), formats=["JPEG"]) as candidate:
+            candidate.draft("L", size)
+            return ssim(reference, _luma(candidate, size))
+
+    def __call__(self, image: Image.Image) -> tuple[bytes, int]:
+        deadline = time.monotonic() + self.time_budget
+        size = _preview_size(image.size, self.preview)
+        reference = _luma(image, size)
+
+        best: tuple[bytes, int] | None = None
+        low, high = self.min_quality, self.max_quality
+        while low <= high and time.monotonic() < deadline:
+            quality = (low + high) // 2
+            data = self._encode(image, quality)
+            if self._score(data, reference, size) >= self.threshold:
+                best, high = (data, quality), quality - 1
+            else:
+                low = quality + 1
+
+        return best or (self._encode(image, self.max_quality), self.max_quality)
@@ -0,0 +1,97 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Hashable, Protocol
+
+from app.adapters import metrics
+from app.adapters.compression import ENCODINGS, compress
+
+
+@dataclass(frozen=True)
+class CachedBody:
+    identity: bytes
+    encodings: tuple[str, ...] = ()
+    expire_at: float = 0.0
+    gzip_level: int = 6
+    brotli_quality: int = 4
+    compressed: dict[str, bytes] = field(default_factory=dict, compare=False, repr=False)
+
+    def encoded(self, encoding: str) -> bytes:
+        """Compressed on the first request for the encoding, then kept with the entry."""
+        body = self.compressed.get(encoding)
+        if body is None:
+            body = compress(self.identity, encoding, self.gzip_level, self.brotli_quality)
+            self.compressed[encoding] = body
+        return body
+
+
+class FeedCacheProtocol(Protocol):
+    generation: int
+
+    def get(self, key: Hashable) -> CachedBody | None:
+        raise NotImplementedError
+
+    def set(self, key: Hashable, body: bytes, generation: int) -> CachedBody:
+        raise NotImplementedError
+
+    def invalidate(self, post_id: int | None = None):
+        raise NotImplementedError
+
+
+class FeedCache:
+    """
+    Per-process LRU of rendered feed pages and posts. An entry is compressed
+    once per Content-Encoding a client asks for, so hot responses are
+    compressed once per TTL and unused encodings cost nothing.
+
+    Entries are keyed ("feed", ...) or ("post", post_id). A write bumps the
+    generation, and set() drops bodies rendered before the bump, so a request
+    that read the database before a publish cannot repopulate a stale page.
+    Writes made by other processes (web workers, image workers) are not seen,
+    their pages are served until the ttl expires.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 30, gzip_level: int = 6, brotli_quality: int = 4):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.generation = 0
+        self._entries: OrderedDict[Hashable, CachedBody] = OrderedDict()
+
+    def get(self, key: Hashable) -> CachedBody | None:
+        entry = self._entries.get(key)
+        if entry is None or entry.expire_at < time.monotonic():
+            metrics.FEED_CACHE_REQUESTS.labels("miss").inc()
+            return None
+        self._entries.move_to_end(key)
+        metrics.FEED_CACHE_REQUESTS.labels("hit").inc()
+        return entry
+
+    def set(self, key: Hashable, body: bytes, generation: int) -> CachedBody:
+        entry = CachedBody(body, ENCODINGS, time.monotonic() + self.ttl, self.gzip_level, self.brotli_quality)
+        if generation == self.generation:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, post_id: int | None = None):
+        self.generation += 1
+        for key in list(self._entries):
+            if key[0] == "feed" or key == ("post", post_id):
+                del self._entries[key]
+
+
+class NoFeedCache:
+    generation = 0
+
+    def get(self, key: Hashable) -> CachedBody | None:
+        return None
+
+    def set(self, key: Hashable, body: bytes, generation: int) -> CachedBody:
+        return CachedBody(identity=body)
+
+    def invalidate(self, post_id: int | None = None):
+        pass
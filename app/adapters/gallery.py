@@ -1,14 +1,19 @@
 import io
 import os.path
-import shutil
 import uuid
 from enum import StrEnum, auto
 from logging import Logger
-from typing import Protocol
+from typing import BinaryIO, Protocol
 from uuid import UUID
 
 from PIL import Image
 
+from app.adapters import image_formats, metrics, similarity
+from app.adapters.encoding import EncoderProtocol, JPEGEncoder
+from app.adapters.picture_cache import CachedPicture, PictureCache
+from app.adapters.similarity import SimilarityIndex, SimilarityIndexProtocol
+from app.adapters.uploads import UploadStorage
+
 
 class Source(StrEnum):
     original: str = auto()
@@ -16,17 +21,26 @@ class Source(StrEnum):
 
 
 class ImageProcess:
-    def __init__(self, raw_image: bytes, original_path: str, optimized_path: str):
+    def __init__(
+            self,
+            raw_image: bytes,
+            original_path: str,
+            optimized_path: str,
+            encoder: EncoderProtocol = JPEGEncoder()
+    ):
         self.raw_image = raw_image
         self.buffer: io.BytesIO | None = None
         self.image: Image | None = None
         self.format: str | None = None
         self.original_path = original_path
         self.optimized_path = optimized_path
+        self.encoder = encoder
+        self.quality: int | None = None
 
     def __enter__(self):
         self.buffer = io.BytesIO(self.raw_image)
-        self.image = Image.open(self.buffer)
+        with metrics.IMAGE_STAGE_SECONDS.labels("open").time():
+            self.image = image_formats.open_image(self.buffer)
         self.format = self.image.format.lower()
         self.width, self.height = self.image.size
         return self
@@ -40,43 +54,56 @@ class ImageProcess:
         return len(self.raw_image)
 
     def convert(self):
-        self.image = self.image.convert("RGB")
+        with metrics.IMAGE_STAGE_SECONDS.labels("convert").time():
+            self.image = self.image.convert("RGB")
 
     def crop(self, box: tuple[int, int, int, int]):
-        self.image = self.image.crop(box)
+        with metrics.IMAGE_STAGE_SECONDS.labels("crop").time():
+            self.image = self.image.crop(box)
 
     def resize(self, resolution_limit: int = 1920):
-        if self.width > resolution_limit and self.height >= self.height:
-            self.image = self.image.resize(
-                (resolution_limit, int((self.height / self.width) * resolution_limit)),
-                Image.ANTIALIAS
-            )
-        elif self.height > resolution_limit:
-            self.image = self.image.resize(
-                (int((self.width / self.height) * resolution_limit), resolution_limit),
-                Image.ANTIALIAS
-            )
+        with metrics.IMAGE_STAGE_SECONDS.labels("resize").time():
+            if self.width > resolution_limit and self.height >= self.height:
+                self.image = self.image.resize(
+                    (resolution_limit, int((self.height / self.width) * resolution_limit)),
+                    Image.ANTIALIAS
+                )
+            elif self.height > resolution_limit:
+                self.image = self.image.resize(
+                    (int((self.width / self.height) * resolution_limit), resolution_limit),
+                    Image.ANTIALIAS
+                )
+
+    def phash(self) -> int:
+        with metrics.IMAGE_STAGE_SECONDS.labels("hash").time():
+            return similarity.dhash(self.image)
 
     def save(self, save_original: bool) -> UUID:
         filename = uuid.uuid4()
-        self.image.save(
-            os.path.join(self.optimized_path, f'{filename}'), 'jpeg',
-            optimize=True, quality=95
-        )
-
-        if save_original:
-            with open(os.path.join(self.original_path, f"{filename}"), "wb") as f:
-                f.write(self.raw_image)
-        else:
-            os.link(
-                os.path.join(self.optimized_path, f'{filename}'),
-                os.path.join(self.original_path, f"{filename}")
-            )
+        with metrics.IMAGE_STAGE_SECONDS.labels("encode").time():
+            data, self.quality = self.encoder(self.image)
+
+        with metrics.IMAGE_STAGE_SECONDS.labels("write").time():
+            with open(os.path.join(self.optimized_path, f'{filename}'), "wb") as f:
+                f.write(data)
+
+            if save_original:
+                with open(os.path.join(self.original_path, f"{filename}"), "wb") as f:
+                    f.write(self.raw_image)
+            else:
+                os.link(
+                    os.path.join(self.optimized_path, f'{filename}'),
+                    os.path.join(self.original_path, f"{filename}")
+                )
 
         return filename
 
 
 class GalleryProtocol(Protocol):
+    uploads: UploadStorage
+    cache: PictureCache
+    similar: SimilarityIndexProtocol
+
     def __init__(self): pass
 
     def __call__(self, raw_image: bytes, user_id: str) -> ImageProcess:
@@ -88,14 +115,32 @@ class GalleryProtocol(Protocol):
     def delete(self, user_id: str, picture_id: str):
         raise NotImplementedError
 
+    def cached(self, source: Source, user_id: str, picture_id: str) -> CachedPicture | None:
+        raise NotImplementedError
+
+    def probe(self, raw_image: bytes | BinaryIO) -> image_formats.Probe:
+        raise NotImplementedError
+
 
 class Gallery:
-    def __init__(self, logger: Logger, base_path: str):
+    def __init__(
+            self,
+            logger: Logger,
+            base_path: str,
+            encoder: EncoderProtocol = JPEGEncoder(),
+            max_upload_length: int = 512 * 1024 * 1024,
+            cache: PictureCache | None = None,
+            similar: SimilarityIndexProtocol | None = None
+    ):
         self.logger = logger
         self.logger.info("initialization...")
         self.base_path = os.path.abspath(base_path)
+        self.encoder = encoder
         os.makedirs(os.path.join(self.base_path, Source.original), exist_ok=True)
         os.makedirs(os.path.join(self.base_path, Source.optimized), exist_ok=True)
+        self.uploads = UploadStorage(os.path.join(self.base_path, "uploads"), max_upload_length)
+        self.cache = cache or PictureCache()
+        self.similar = similar or SimilarityIndex()
 
     def path(self, source: Source, user_id: str, picture_id: str) -> str:
         return os.path.abspath(os.path.join(
@@ -103,10 +148,30 @@ class Gallery:
         ))
 
     def delete(self, user_id: str, picture_id: str):
+        self.cache.invalidate(user_id, picture_id)
+        self.similar.discard(UUID(picture_id))
         for source in Source:
-            shutil.rmtree(os.path.abspath(os.path.join(
-                self.base_path, source, user_id, picture_id
-            )))
+            try:
+                os.remove(self.path(source, user_id, picture_id))
+            except FileNotFoundError:
+                self.logger.warning("%s/%s/%s is already deleted", source, user_id, picture_id)
+
+    def cached(self, source: Source, user_id: str, picture_id: str) -> CachedPicture | None:
+        """Picture bytes from memory, loaded on a miss; None for missing files and files too big to cache."""
+        key = (source, user_id, picture_id)
+        entry = self.cache.get(key)
+        if entry is None:
+            try:
+                with open(self.path(source, user_id, picture_id), "rb") as f:
+                    if os.fstat(f.fileno()).st_size > self.cache.max_item_bytes:
+                        return None
+                    entry = self.cache.put(key, f.read())
+            except FileNotFoundError:
+                return None
+        return entry
+
+    def probe(self, raw_image: bytes | BinaryIO) -> image_formats.Probe:
+        return image_formats.probe(raw_image)
 
     def __call__(self, raw_image: bytes, user_id: str) -> ImageProcess:
         original_path = os.path.abspath(os.path.join(
@@ -118,4 +183,4 @@ class Gallery:
         os.makedirs(original_path, exist_ok=True)
         os.makedirs(optimized_path, exist_ok=True)
 
-        return ImageProcess(raw_image, original_path, optimized_path)
+        return ImageProcess(raw_image, original_path, optimized_path, self.encoder)
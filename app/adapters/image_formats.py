@@ -0,0 +1,89 @@
+"""
+Allow-listed image decoders.
+
+Pillow imports every bundled plugin the first time Image.open cannot match
+the bytes against the preloaded ones. register() imports only the decoders we
+accept and marks Pillow as initialized so the rest are never loaded; every
+open is additionally restricted with formats=[...] to the sniffed format.
+"""
+import io
+from dataclasses import dataclass
+from typing import BinaryIO
+
+from PIL import Image, JpegImagePlugin, PngImagePlugin, UnidentifiedImageError, features
+
+from app.domain.exceptions import ImageTooLarge, UnsupportedImageFormat
+
+try:
+    import pillow_heif
+except ImportError:  # HEIC support is optional
+    pillow_heif = None
+
+FORMATS = ["JPEG", "PNG"]
+
+_HEIF_BRANDS = (b"heic", b"heix", b"hevc", b"hevx", b"mif1", b"msf1")
+
+
+def register():
+    if features.check("webp") and "WEBP" not in FORMATS:
+        from PIL import WebPImagePlugin  # noqa: F401, imported for registration
+        FORMATS.append("WEBP")
+    if pillow_heif and "HEIF" not in FORMATS:
+        pillow_heif.register_heif_opener()
+        FORMATS.append("HEIF")
+    Image._initialized = max(Image._initialized, 2)
+
+
+def sniff(data: bytes) -> str | None:
+    """Format by magic bytes, None when it is not on the allow-list."""
+    if data[:3] == b"\xff\xd8\xff":
+        fmt = "JPEG"
+    elif data[:8] == b"\x89PNG\r\n\x1a\n":
+        fmt = "PNG"
+    elif data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        fmt = "WEBP"
+    elif data[4:8] == b"ftyp" and data[8:12] in _HEIF_BRANDS:
+        fmt = "HEIF"
+    else:
+        return None
+    return fmt if fmt in FORMATS else None
+
+
+def open_image(data: bytes | BinaryIO) -> Image.Image:
+    """Sniff and parse headers only, pixels are decoded on the first load()."""
+    fp = io.BytesIO(data) if isinstance(data, bytes) else data
+    fmt = sniff(fp.read(16))
+    fp.seek(0)
+    if fmt is None:
+        raise UnsupportedImageFormat()
+    try:
+        return Image.open(fp, formats=[fmt])
+    except UnidentifiedImageError:
+        raise UnsupportedImageFormat()
+    except Image.DecompressionBombError:
+        # the header declares more pixels than Pillow agrees to decode
+        raise ImageTooLarge()
+
+
+@dataclass(frozen=True)
+class Probe:
+    format: str
+    width: int
+    height: int
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+
+def probe(data: bytes | BinaryIO) -> Probe:
+    """Header-only, a file object is left open and rewound."""
+    try:
+        with open_image(data) as image:
+            return Probe(image.format.lower(), *image.size)
+    finally:
+        if not isinstance(data, bytes):
+            data.seek(0)
+
+
+register()
@@ -0,0 +1,154 @@
+"""
+Non-blocking logging.
+
+Loggers only put records on a bounded queue (QueueHandler); a QueueListener
+thread formats and writes them. When the queue is full a record is dropped
+(the newest or the oldest, by policy) and counted instead of blocking the
+event loop. The request id and sampling of chatty loggers are applied on the
+caller's side, so sampled-out records never reach the queue. Tracebacks are
+formatted by the listener too.
+"""
+import atexit
+import copy
+import logging
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+import orjson
+
+from app.adapters import metrics
+from app.config import Logging
+
+request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+TEXT_FORMAT = "%(levelname)-3s: %(asctime)s  %(name)s L%(lineno)-3d [%(request_id)s] %(message)s"
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of the records below WARNING from the given logger prefixes."""
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        # longest prefix first so "sqlalchemy.engine" wins over "sqlalchemy"
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        for prefix, rate in self.rates:
+            if record.name == prefix or record.name.startswith(prefix + "."):
+                if random.random() < rate:
+                    return True
+                metrics.LOG_RECORDS_DROPPED.labels("sampled").inc()
+                return False
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return orjson.dumps(entry).decode()
+
+
+class DroppingQueueHandler(QueueHandler):
+    def __init__(self, queue_: queue.Queue, drop: str = "newest"):
+        super().__init__(queue_)
+        self.drop = drop
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        QueueHandler.prepare formats the record here and drops exc_info. Only the
+        message arguments are merged (they may change before the listener runs);
+        the listener's formatter renders the traceback from exc_info.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        if self.drop == "oldest":
+            try:
+                self.queue.get_nowait()
+                self.queue.put_nowait(record)
+            except (queue.Empty, queue.Full):
+                pass
+        metrics.LOG_RECORDS_DROPPED.labels("queue_full").inc()
+
+
+class DroppingQueueListener(QueueListener):
+    def enqueue_sentinel(self):
+        """
+        QueueListener puts its stop sentinel with put_nowait, which raises on a full
+        queue and leaves the listener running. The listener drains the queue, so the
+        sentinel waits for room; failing that the oldest record makes way.
+        """
+        while True:
+            try:
+                self.queue.put(self._sentinel, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+            try:
+                self.queue.get_nowait()
+                metrics.LOG_RECORDS_DROPPED.labels("queue_full").inc()
+            except queue.Empty:
+                pass
+
+
+_listener: DroppingQueueListener | None = None
+
+
+def setup(config: Logging) -> DroppingQueueListener:
+    """Route the root logger through a bounded queue; the listener is stopped at exit to flush it."""
+    global _listener
+    if _listener:
+        _listener.stop()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JSONFormatter() if config.format == "json" else logging.Formatter(TEXT_FORMAT))
+    records = queue.Queue(config.queue_size)
+    handler = DroppingQueueHandler(records, config.drop)
+    handler.addFilter(RequestIdFilter())
+    if config.sample:
+        handler.addFilter(SamplingFilter(config.sample))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(config.level)
+
+    _listener = DroppingQueueListener(records, stream)
+    _listener.start()
+    return _listener
+
+
+@atexit.register
+def _flush():
+    if _listener:
+        _listener.stop()
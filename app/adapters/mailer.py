@@ -1,6 +1,7 @@
 from logging import Logger
 from typing import Protocol
 
+from app.adapters import metrics
 from app.adapters.gmail import GmailProvider
 
 
@@ -18,4 +19,5 @@ class Mailer:
         self.provider = provider
 
     async def send(self, subject: str, content: str, email: str):
-        return self.provider.send(email, subject, content)
+        with metrics.MAILER_SEND_SECONDS.time():
+            return self.provider.send(email, subject, content)
@@ -0,0 +1,282 @@
+"""
+Minimal Prometheus-compatible metrics.
+
+Children are plain Python objects updated without locks: the app runs on one
+event loop per process and int/float updates happen under the GIL, so the only
+cost of an observation is a dict lookup and a bisect.
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children: dict[tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self.children[()] = self._child()
+
+    def _child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        child = self.children.get(values)
+        if child is None:
+            child = self.children.setdefault(values, self._child())
+        return child
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def expose(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.kind}\n"
+        return header + "".join(f"{line}\n" for line in self.samples())
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+    _child = _CounterChild
+
+    def inc(self, amount: float = 1):
+        self.children[()].inc(amount)
+
+    def samples(self):
+        for values, child in list(self.children.items()):
+            yield f"{self.name}{_labels(self.labelnames, values)} {_number(child.value)}"
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def set(self, value: float):
+        self.value = value
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+
+class Gauge(Counter):
+    kind = "gauge"
+    _child = _GaugeChild
+
+    def __init__(self, name, documentation, labelnames=(), callback: Callable[[], dict] | None = None):
+        self.callback = callback
+        super().__init__(name, documentation, labelnames)
+
+    def set(self, value: float):
+        self.children[()].set(value)
+
+    def samples(self):
+        if self.callback:
+            for values, value in self.callback().items():
+                self.labels(*values).set(value)
+        return super().samples()
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float):
+        self.children[()].observe(value)
+
+    def time(self) -> _Timer:
+        return _Timer(self.children[()])
+
+    def samples(self):
+        for values, child in list(self.children.items()):
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), list(child.counts)):
+                cumulative += count
+                labels = _labels(self.labelnames, values, f'le="{_number(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, values)} {_number(child.sum)}"
+            yield f"{self.name}_count{_labels(self.labelnames, values)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = (), callback=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def expose(self) -> str:
+        return "".join(metric.expose() for metric in list(self.metrics.values()))
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ["method", "route", "status"]
+)
+HTTP_REQUEST_QUERIES = REGISTRY.histogram(
+    "http_request_db_queries", "SQL statements issued per HTTP request.", ["method", "route"], COUNT_BUCKETS
+)
+HTTP_REQUEST_QUERY_SECONDS = REGISTRY.histogram(
+    "http_request_db_duration_seconds", "Time spent in SQL per HTTP request.", ["method", "route"]
+)
+DB_QUERY_SECONDS = REGISTRY.histogram("db_query_duration_seconds", "SQL statement latency.")
+IMAGE_STAGE_SECONDS = REGISTRY.histogram(
+    "image_stage_duration_seconds", "ImageProcess stage latency.", ["stage"]
+)
+MAILER_SEND_SECONDS = REGISTRY.histogram("mailer_send_duration_seconds", "Mailer.send latency.")
+ADMISSION_REJECTED = REGISTRY.counter(
+    "admission_rejected_total", "Publishes refused by admission control.", ["reason"]
+)
+PICTURE_CACHE_REQUESTS = REGISTRY.counter(
+    "picture_cache_requests_total", "Gallery picture cache lookups.", ["result"]
+)
+PICTURE_CACHE_BYTES = REGISTRY.gauge("picture_cache_bytes", "Bytes held by the Gallery picture cache.")
+PICTURE_NEAR_DUPLICATES = REGISTRY.counter(
+    "picture_near_duplicates_total", "Published pictures flagged as near-duplicates of an indexed picture."
+)
+FEED_CACHE_REQUESTS = REGISTRY.counter("feed_cache_requests_total", "Feed cache lookups.", ["result"])
+EVENT_LOOP_LAG_SECONDS = REGISTRY.histogram(
+    "event_loop_lag_seconds", "How late the watchdog heartbeat woke up."
+)
+EVENT_LOOP_STALLS = REGISTRY.counter(
+    "event_loop_stalls_total", "Callbacks that held the event loop past the watchdog threshold.", ["route"]
+)
+EVENT_LOOP_STALL_SECONDS = REGISTRY.histogram(
+    "event_loop_stall_duration_seconds", "Duration of event loop stalls.", ["route"]
+)
+LOG_RECORDS_DROPPED = REGISTRY.counter(
+    "log_records_dropped_total", "Log records dropped by sampling or a full logging queue.", ["reason"]
+)
+VIEW_FLUSHES = REGISTRY.counter("post_view_flushes_total", "Batched post view counter flushes.", ["result"])
+VIEWS_PENDING = REGISTRY.gauge("post_views_pending", "Post views counted in memory and not flushed yet.")
+VIEWS_DROPPED = REGISTRY.counter("post_views_dropped_total", "Post views dropped while flushes were failing.")
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_start
+    DB_QUERY_SECONDS.observe(elapsed)
+    stats = query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+
+
+_pools = {}
+
+
+def _pool_stats() -> dict:
+    stats = {}
+    for name, pool in list(_pools.items()):
+        for state in ("checkedin", "checkedout", "overflow", "size"):
+            if hasattr(pool, state):
+                stats[(name, state)] = getattr(pool, state)()
+    return stats
+
+
+DB_POOL_CONNECTIONS = REGISTRY.gauge(
+    "db_pool_connections", "Connection pool state.", ["engine", "state"], _pool_stats
+)
+
+
+def instrument_engine(engine: AsyncEngine, name: str = "default"):
+    sync_engine = engine.sync_engine
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    _pools[name] = sync_engine.pool
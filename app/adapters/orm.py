@@ -1,4 +1,6 @@
-from sqlalchemy import MetaData
+from datetime import datetime, timezone
+
+from sqlalchemy import DateTime, MetaData, TypeDecorator
 from sqlalchemy.orm import DeclarativeBase
 
 _convention = {
@@ -15,3 +17,14 @@ _convention = {
 
 class Base(DeclarativeBase):
     metadata = MetaData(naming_convention=_convention)
+
+
+class UTCDateTime(TypeDecorator):
+    """DateTime(timezone=True) that stays tz-aware on backends that drop the offset (SQLite)."""
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_result_value(self, value: datetime | None, dialect):
+        if value is not None and value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value
@@ -0,0 +1,63 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from app.adapters import metrics
+
+
+@dataclass
+class CachedPicture:
+    body: bytes
+    expire_at: float
+    # rendered by the sender on first use and reused for every hit
+    raw_headers: list[tuple[bytes, bytes]] | None = None
+
+
+class PictureCache:
+    """
+    Byte-bounded LRU of small picture files keyed by (source, user_id, picture_id).
+
+    Pictures never change, but another worker may delete one: delete() only
+    invalidates this process, so entries also expire after ttl seconds.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_item_bytes: int = 256 * 1024, ttl: float = 300):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self._entries: OrderedDict[tuple[str, str, str], CachedPicture] = OrderedDict()
+
+    def get(self, key: tuple[str, str, str]) -> CachedPicture | None:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expire_at < time.monotonic():
+            self._pop(key)
+            entry = None
+        if entry is None:
+            metrics.PICTURE_CACHE_REQUESTS.labels("miss").inc()
+            return None
+        self._entries.move_to_end(key)
+        metrics.PICTURE_CACHE_REQUESTS.labels("hit").inc()
+        return entry
+
+    def put(self, key: tuple[str, str, str], body: bytes) -> CachedPicture:
+        entry = CachedPicture(body, time.monotonic() + self.ttl)
+        if len(body) > self.max_item_bytes or len(body) > self.max_bytes:
+            return entry
+        self._pop(key)
+        self._entries[key] = entry
+        self.bytes += len(body)
+        while self.bytes > self.max_bytes:
+            self._pop(next(iter(self._entries)))
+        metrics.PICTURE_CACHE_BYTES.set(self.bytes)
+        return entry
+
+    def invalidate(self, user_id: str, picture_id: str):
+        for key in [k for k in self._entries if k[1:] == (user_id, picture_id)]:
+            self._pop(key)
+        metrics.PICTURE_CACHE_BYTES.set(self.bytes)
+
+    def _pop(self, key: tuple[str, str, str]):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= len(entry.body)
@@ -1,10 +1,46 @@
+from __future__ import annotations
+
+import html
+import re
+import uuid
 from datetime import datetime
+from typing import AsyncIterator
 
-from sqlalchemy import select, delete
-from sqlalchemy.orm import joinedload
+import sqlalchemy as sa
+from sqlalchemy import select, delete, update, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app.domain import models
 
+# Hot lookups are built once with bound parameters: a statement object memoizes its
+# cache key, so executing it skips constructing the select and hashing it against
+# the compiled cache on every call, and the SQL text stays identical for the
+# asyncpg prepared statement cache.
+_USER_BY_ID = select(models.User).where(models.User.id == sa.bindparam("user_id"))
+_USER_BY_EMAIL = select(models.User).where(models.User.email == sa.bindparam("email"))
+_USER_BY_USERNAME = select(models.User).where(models.User.username == sa.bindparam("username"))
+_USERNAME_TAKEN = select(models.User.username).where(models.User.username == sa.bindparam("username"))
+_POST_BY_ID = select(models.Post).where(models.Post.id == sa.bindparam("post_id")).options(
+    joinedload(models.Post.pictures), joinedload(models.Post.user)
+)
+_VERIFY_CODE_BY_EMAIL = select(models.VerifyCode).where(models.VerifyCode.email == sa.bindparam("email"))
+_DELETE_VERIFY_CODE = delete(models.VerifyCode).where(models.VerifyCode.email == sa.bindparam("email"))
+
+
+# the database marks matches with private-use characters, the text is HTML-escaped before they become <mark>
+_MARK_START, _MARK_STOP = "\ue000", "\ue001"
+
+
+def _highlight(snippet: str) -> str:
+    return html.escape(snippet).replace(_MARK_START, "<mark>").replace(_MARK_STOP, "</mark>")
+
+
+def _upsert(session, table):
+    """INSERT with ON CONFLICT clauses for the session's dialect."""
+    return (sqlite if session.bind.dialect.name == "sqlite" else postgresql).insert(table)
+
 
 class UserRepository:
     def __init__(self, session):
@@ -14,9 +50,7 @@ class UserRepository:
         self.session.add(user)
 
     async def get(self, user_id: int) -> models.User | None:
-        return (await self.session.execute(
-            select(models.User).where(models.User.id == user_id)
-        )).scalar()
+        return (await self.session.execute(_USER_BY_ID, {"user_id": user_id})).scalar()
 
     # async def get_by_telegram_user_id(self, telegram_user_id: int) -> models.User | None:
     #     return (await self.session.execute(
@@ -24,14 +58,13 @@ class UserRepository:
     #     )).scalar()
 
     async def is_username_available(self, username: str) -> bool:
-        return not bool((await self.session.execute(
-            select(models.User.username).where(models.User.username == username)
-        )).scalar())
+        return not bool((await self.session.execute(_USERNAME_TAKEN, {"username": username})).scalar())
 
     async def get_by_email(self, email: str) -> models.User | None:
-        return (await self.session.execute(
-            select(models.User).where(models.User.email == email)
-        )).scalar()
+        return (await self.session.execute(_USER_BY_EMAIL, {"email": email})).scalar()
+
+    async def get_by_username(self, username: str) -> models.User | None:
+        return (await self.session.execute(_USER_BY_USERNAME, {"username": username})).scalar()
 
 
 class PostRepository:
@@ -41,12 +74,18 @@ class PostRepository:
     def add(self, post: models.Post):
         self.session.add(post)
 
+    async def add_many(self, posts: list[dict]) -> list[int]:
+        """One multi-row INSERT ... RETURNING, ids come back in the order of posts."""
+        return list(await self.session.scalars(
+            sa.insert(models.Post).returning(models.Post.id, sort_by_parameter_order=True), posts
+        ))
+
+    async def add_pictures(self, pictures: list[dict]):
+        if pictures:
+            await self.session.execute(sa.insert(models.Picture), pictures)
+
     async def get(self, post_id: int) -> models.Post | None:
-        return (await self.session.execute(
-            select(models.Post).where(models.Post.id == post_id).options(
-                joinedload(models.Post.pictures), joinedload(models.Post.user)
-            )
-        )).scalar()
+        return (await self.session.execute(_POST_BY_ID, {"post_id": post_id})).scalar()
 
     async def list(self, from_date: datetime | None, number: int | None) -> models.Post | None:
         return (await self.session.execute(
@@ -55,25 +94,336 @@ class PostRepository:
             )
         )).unique().scalars()
 
-    async def delete(self, post_id: int) -> models.Post:
-        return (await self.session.execute(
+    async def list_by_user(
+            self, user_id: int, limit: int, before: tuple[datetime, int] | None = None
+    ) -> list[models.Post]:
+        statement = select(models.Post).where(models.Post.user_id == user_id)
+        if before:
+            statement = statement.where(sa.tuple_(models.Post.created_at, models.Post.id) < sa.tuple_(*before))
+        statement = statement.order_by(models.Post.created_at.desc(), models.Post.id.desc()).limit(limit).options(
+            joinedload(models.Post.pictures), joinedload(models.Post.user)
+        )
+        return list((await self.session.execute(statement)).unique().scalars())
+
+    async def stream(
+            self, since: tuple[datetime, int] | None = None, batch: int = 1000
+    ) -> AsyncIterator[models.Post]:
+        """
+        All posts in (created_at, id) order through a server-side cursor, batch rows at a time.
+        Pictures are loaded per batch with selectinload, joined collections cannot be streamed.
+        """
+        statement = select(models.Post).where(models.Post.status == "published").order_by(
+            models.Post.created_at, models.Post.id
+        ).options(
+            selectinload(models.Post.pictures), joinedload(models.Post.user)
+        ).execution_options(yield_per=batch)
+        if since:
+            statement = statement.where(sa.tuple_(models.Post.created_at, models.Post.id) > sa.tuple_(*since))
+        async for post in await self.session.stream_scalars(statement):
+            yield post
+
+    async def search(
+            self, query: str, limit: int, after: tuple[float, int] | None = None
+    ) -> list[tuple[models.Post, float, str]]:
+        if self.session.bind.dialect.name == "sqlite":
+            rank, snippet, condition, source = self._sqlite_search(query)
+        else:
+            rank, snippet, condition, source = self._postgres_search(query)
+
+        statement = select(models.Post, rank.label("rank"), snippet.label("snippet")).select_from(source)
+        statement = statement.where(condition).order_by(rank.desc(), models.Post.id.desc()).limit(limit)
+        if after:
+            statement = statement.where(sa.tuple_(rank, models.Post.id) < sa.tuple_(*after))
+        statement = statement.options(joinedload(models.Post.pictures), joinedload(models.Post.user))
+
+        return [
+            (post, rank, _highlight(snippet)) for post, rank, snippet in (await self.session.execute(statement)).unique()
+        ]
+
+    @staticmethod
+    def _postgres_search(query: str):
+        tsquery = sa.func.websearch_to_tsquery(models.SEARCH_CONFIG, query)
+        vector = sa.literal_column("posts.search_vector")
+        document = sa.func.concat_ws(" ", models.Post.title, models.Post.description)
+        return (
+            sa.func.ts_rank_cd(vector, tsquery),
+            sa.func.ts_headline(
+                models.SEARCH_CONFIG, document, tsquery,
+                f"StartSel={_MARK_START}, StopSel={_MARK_STOP}, MaxFragments=2, MaxWords=20, MinWords=5"
+            ),
+            vector.op("@@")(tsquery),
+            models.Post.__table__,
+        )
+
+    @staticmethod
+    def _sqlite_search(query: str):
+        fts = sa.table("posts_fts", sa.column("rowid"))
+        match = " ".join(f'"{term}"' for term in re.findall(r"\w+", query)) or '""'
+        return (
+            # bm25 is lower-is-better, negate it to share the keyset ordering with PostgreSQL
+            -sa.func.bm25(sa.literal_column("posts_fts")),
+            sa.func.snippet(sa.literal_column("posts_fts"), -1, _MARK_START, _MARK_STOP, "…", 20),
+            sa.literal_column("posts_fts").op("MATCH")(match),
+            models.Post.__table__.join(fts, fts.c.rowid == models.Post.id),
+        )
+
+    async def delete(self, post_id: int) -> models.Post | None:
+        """
+        The deleted post with the pictures deleted along with it, None when this
+        statement did not delete it (a concurrent delete got there first).
+        """
+        pictures = list((await self.session.execute(
+            delete(models.Picture).where(models.Picture.post_id == post_id).returning(models.Picture)
+        )).scalars())
+        post = (await self.session.execute(
             delete(models.Post).where(models.Post.id == post_id).returning(models.Post)
         )).scalar()
+        if post:
+            set_committed_value(post, "pictures", pictures)
+        return post
 
+    async def set_status(self, post_id: int, status: str, current: str, **values) -> bool:
+        """Move the post from current to status, False when it is gone or in another status."""
+        return bool((await self.session.execute(
+            update(models.Post).where(models.Post.id == post_id, models.Post.status == current).values(
+                status=status, **values
+            ).execution_options(synchronize_session=False)
+        )).rowcount)
 
-class VerifyCodesRepository:
+    async def status(self, post_id: int) -> tuple[str, models.Job | None] | None:
+        """Status of the post and its pending or failed job."""
+        row = (await self.session.execute(
+            select(models.Post.status, models.Job).outerjoin(models.Job, models.Job.post_id == models.Post.id).where(
+                models.Post.id == post_id
+            ).order_by(models.Job.id.desc()).limit(1)
+        )).first()
+        return tuple(row) if row else None
+
+
+class PictureRepository:
     def __init__(self, session):
         self.session = session
 
-    def add(self, verify_code: models.VerifyCode):
-        self.session.add(verify_code)
+    async def get(self, picture_id: uuid.UUID) -> models.Picture | None:
+        return await self.session.get(models.Picture, picture_id)
+
+    async def list_with_users(self, picture_ids: list[uuid.UUID]) -> dict[uuid.UUID, tuple[models.Picture, int]]:
+        return {picture.id: (picture, user_id) for picture, user_id in await self.session.execute(
+            select(models.Picture, models.Post.user_id).join(models.Post).where(models.Picture.id.in_(picture_ids))
+        )}
+
+    async def hashes(self, after: uuid.UUID | None, limit: int) -> list[tuple[int, uuid.UUID]]:
+        statement = select(models.Picture.phash, models.Picture.id).where(models.Picture.phash.is_not(None))
+        if after:
+            statement = statement.where(models.Picture.id > after)
+        return [tuple(row) for row in await self.session.execute(statement.order_by(models.Picture.id).limit(limit))]
+
+
+class UserStatsRepository:
+    def __init__(self, session):
+        self.session = session
+
+    async def get(self, user_id: int) -> models.UserStats | None:
+        return await self.session.get(models.UserStats, user_id)
+
+    async def increment(self, user_id: int, posts: int, pictures: int, storage_bytes: int):
+        """One upsert, so concurrent first publishes of a user do not race to insert the row."""
+        statement = _upsert(self.session, models.UserStats).values(
+            user_id=user_id, posts=posts, pictures=pictures, storage_bytes=storage_bytes
+        )
+        await self.session.execute(statement.on_conflict_do_update(
+            index_elements=[models.UserStats.user_id],
+            set_=dict(
+                posts=models.UserStats.posts + statement.excluded.posts,
+                pictures=models.UserStats.pictures + statement.excluded.pictures,
+                storage_bytes=models.UserStats.storage_bytes + statement.excluded.storage_bytes
+            )
+        ))
+
+    async def actual(self, from_user_id: int, limit: int) -> list[tuple[int, int, int, int]]:
+        pictures = select(
+            models.Picture.post_id,
+            func.count(models.Picture.id).label("pictures"),
+            func.coalesce(func.sum(models.Picture.size), 0).label("storage_bytes")
+        ).group_by(models.Picture.post_id).subquery()
+        users = select(models.User.id).where(models.User.id >= from_user_id).order_by(
+            models.User.id
+        ).limit(limit).subquery()
+        return [tuple(row) for row in await self.session.execute(
+            select(
+                users.c.id,
+                func.count(models.Post.id),
+                func.coalesce(func.sum(pictures.c.pictures), 0),
+                func.coalesce(func.sum(pictures.c.storage_bytes), 0)
+            ).select_from(users).outerjoin(
+                models.Post, sa.and_(models.Post.user_id == users.c.id, models.Post.status == "published")
+            ).outerjoin(
+                pictures, pictures.c.post_id == models.Post.id
+            ).group_by(users.c.id).order_by(users.c.id)
+        )]
 
-    async def get(self, email: str) -> models.Post | None:
+    async def list(self, user_ids: list[int]) -> dict[int, models.UserStats]:
+        return {s.user_id: s for s in (await self.session.execute(
+            select(models.UserStats).where(models.UserStats.user_id.in_(user_ids))
+        )).scalars()}
+
+
+class PostViewsRepository:
+    def __init__(self, session):
+        self.session = session
+
+    async def increment_many(self, counts: dict[int, int], batch: int = 5000):
+        """
+        One INSERT ... SELECT ... ON CONFLICT DO UPDATE per batch posts, selecting
+        from posts so counts of posts deleted meanwhile are dropped. Each post takes
+        three bind parameters, a batch stays under asyncpg's limit of 32767.
+        """
+        post_ids = list(counts)
+        for start in range(0, len(post_ids), batch):
+            chunk = {post_id: counts[post_id] for post_id in post_ids[start:start + batch]}
+            statement = _upsert(self.session, models.PostViews).from_select(
+                ["post_id", "views"],
+                select(models.Post.id, sa.case(chunk, value=models.Post.id)).where(models.Post.id.in_(chunk))
+            )
+            await self.session.execute(statement.on_conflict_do_update(
+                index_elements=[models.PostViews.post_id],
+                set_={"views": models.PostViews.views + statement.excluded.views}
+            ))
+
+
+class IdempotencyKeyRepository:
+    def __init__(self, session):
+        self.session = session
+
+    async def claim(
+            self, user_id: int, key: str, fingerprint: str, now: datetime, expire_at: datetime, stale_before: datetime
+    ) -> datetime | None:
+        """
+        Insert the key as in progress, or take over an expired key or one whose owner
+        stopped before stale_before. The owner token (locked_at) is returned, None
+        when someone else holds the key.
+        """
+        values = dict(
+            user_id=user_id, key=key, fingerprint=fingerprint, status_code=None, body=None, headers=None,
+            locked_at=now, expire_at=expire_at
+        )
+        inserted = await self.session.execute(
+            _upsert(self.session, models.IdempotencyKey).values(**values).on_conflict_do_nothing()
+        )
+        if inserted.rowcount:
+            return now
+        taken_over = await self.session.execute(
+            update(models.IdempotencyKey).where(
+                models.IdempotencyKey.user_id == user_id,
+                models.IdempotencyKey.key == key,
+                sa.or_(
+                    models.IdempotencyKey.expire_at < now,
+                    sa.and_(
+                        models.IdempotencyKey.status_code.is_(None),
+                        models.IdempotencyKey.locked_at < stale_before
+                    )
+                )
+            ).values(**values).execution_options(synchronize_session=False)
+        )
+        return now if taken_over.rowcount else None
+
+    async def get(self, user_id: int, key: str) -> models.IdempotencyKey | None:
         return (await self.session.execute(
-            select(models.VerifyCode).where(models.VerifyCode.email == email)
+            select(models.IdempotencyKey).where(
+                models.IdempotencyKey.user_id == user_id, models.IdempotencyKey.key == key
+            ).execution_options(populate_existing=True)
         )).scalar()
 
-    async def delete(self, email: str):
+    async def complete(
+            self, user_id: int, key: str, token: datetime, status_code: int, body: bytes, headers: dict[str, str]
+    ) -> bool:
+        """False when the claim was taken over since, the new owner's row is left alone."""
+        return bool((await self.session.execute(
+            update(models.IdempotencyKey).where(
+                models.IdempotencyKey.user_id == user_id,
+                models.IdempotencyKey.key == key,
+                models.IdempotencyKey.locked_at == token
+            ).values(status_code=status_code, body=body, headers=headers).execution_options(synchronize_session=False)
+        )).rowcount)
+
+    async def delete(self, user_id: int, key: str, token: datetime):
         await self.session.execute(
-            delete(models.VerifyCode).where(models.VerifyCode.email == email)
+            delete(models.IdempotencyKey).where(
+                models.IdempotencyKey.user_id == user_id,
+                models.IdempotencyKey.key == key,
+                models.IdempotencyKey.locked_at == token
+            )
         )
+
+    async def expire(self, now: datetime, limit: int) -> int:
+        expired = select(models.IdempotencyKey.user_id, models.IdempotencyKey.key).where(
+            models.IdempotencyKey.expire_at < now
+        ).limit(limit)
+        return (await self.session.execute(
+            delete(models.IdempotencyKey).where(
+                sa.tuple_(models.IdempotencyKey.user_id, models.IdempotencyKey.key).in_(expired)
+            ).execution_options(synchronize_session=False)
+        )).rowcount
+
+
+class JobRepository:
+    def __init__(self, session):
+        self.session = session
+
+    def add(self, job: models.Job):
+        self.session.add(job)
+
+    async def acquire(self, kinds: list[str], worker: str, now: datetime, limit: int = 1) -> list[models.Job]:
+        """
+        Claim due jobs in one UPDATE. FOR UPDATE SKIP LOCKED in the subquery lets concurrent
+        workers on PostgreSQL pass over each other's rows instead of queueing on them;
+        SQLite renders no locking clause and serializes the writers instead.
+        """
+        due = select(models.Job.id).where(
+            models.Job.status == "queued", models.Job.run_at <= now, models.Job.kind.in_(kinds)
+        ).order_by(models.Job.run_at, models.Job.id).limit(limit).with_for_update(skip_locked=True)
+        return list((await self.session.execute(
+            update(models.Job).where(models.Job.id.in_(due.scalar_subquery()), models.Job.status == "queued").values(
+                status="running", attempts=models.Job.attempts + 1, locked_at=now, locked_by=worker
+            ).returning(models.Job).execution_options(synchronize_session=False, populate_existing=True)
+        )).scalars())
+
+    async def finish(self, job_id: int):
+        await self.session.execute(delete(models.Job).where(models.Job.id == job_id))
+
+    async def retry(self, job_id: int, error: str, run_at: datetime):
+        await self.session.execute(
+            update(models.Job).where(models.Job.id == job_id).values(
+                status="queued", error=error, run_at=run_at, locked_at=None, locked_by=None
+            ).execution_options(synchronize_session=False)
+        )
+
+    async def fail(self, job_id: int, error: str):
+        await self.session.execute(
+            update(models.Job).where(models.Job.id == job_id).values(
+                status="failed", error=error, locked_at=None, locked_by=None
+            ).execution_options(synchronize_session=False)
+        )
+
+    async def requeue_stale(self, stale_before: datetime) -> list[models.Job]:
+        """Release the jobs of workers that died while running them, failing those out of attempts."""
+        return list((await self.session.execute(
+            update(models.Job).where(models.Job.status == "running", models.Job.locked_at < stale_before).values(
+                status=sa.case((models.Job.attempts >= models.Job.max_attempts, "failed"), else_="queued"),
+                error="worker did not finish the job", locked_at=None, locked_by=None
+            ).returning(models.Job).execution_options(synchronize_session=False, populate_existing=True)
+        )).scalars())
+
+
+class VerifyCodesRepository:
+    def __init__(self, session):
+        self.session = session
+
+    def add(self, verify_code: models.VerifyCode):
+        self.session.add(verify_code)
+
+    async def get(self, email: str) -> models.VerifyCode | None:
+        return (await self.session.execute(_VERIFY_CODE_BY_EMAIL, {"email": email})).scalar()
+
+    async def delete(self, email: str):
+        await self.session.execute(_DELETE_VERIFY_CODE, {"email": email})
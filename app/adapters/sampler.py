@@ -0,0 +1,194 @@
+"""
+On-demand sampling profiler.
+
+A daemon thread wakes every interval, takes the event loop thread's stack from
+sys._current_frames() and files it under the profile of the asyncio task that
+holds the loop at that moment, prefixed with its route. Samples therefore count
+the time a request spends running Python on the loop: route handlers,
+ImageProcess stages, repository calls, not the time it awaits I/O.
+
+Profiles are selected per request or opened for a time window, which also
+samples every other thread (the threadpool included). The thread runs only
+while a profile is open, and nothing is installed unless a token is configured.
+"""
+import asyncio
+import hmac
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from logging import getLogger
+
+import orjson
+
+logger = getLogger("SamplingProfiler")
+
+FORMATS = {"collapsed": "collapsed.txt", "speedscope": "speedscope.json"}
+
+
+def collapse(frame, max_depth: int = 128) -> tuple[str, ...]:
+    """Root-first "module:qualname" names of a frame and its callers."""
+    names = []
+    while frame is not None and len(names) < max_depth:
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_qualname}")
+        frame = frame.f_back
+    names.reverse()
+    return tuple(names)
+
+
+def _label(scope: dict) -> str:
+    route = scope.get("route")
+    return f"{scope['method']} {route.path if route else scope['path']}"
+
+
+@dataclass
+class Profile:
+    name: str
+    interval: float
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    started: float = field(default_factory=time.perf_counter)
+    duration: float = 0.0
+    stacks: Counter = field(default_factory=Counter)
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def collapsed(self) -> str:
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def speedscope(self) -> dict:
+        frames: dict[str, int] = {}
+        samples = []
+        for stack, count in self.stacks.most_common():
+            indexes = [frames.setdefault(name, len(frames)) for name in stack]
+            samples.extend([indexes] * count)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name,
+            "exporter": "iss",
+            "shared": {"frames": [{"name": name} for name in frames]},
+            "profiles": [{
+                "type": "sampled",
+                "name": self.name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": self.duration,
+                "samples": samples,
+                "weights": [self.interval] * len(samples),
+            }],
+        }
+
+
+class SamplingProfiler:
+    def __init__(self, token: str | None = None, interval: float = 0.005, output_dir: str = "profiles"):
+        self.configure(token, interval, output_dir)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: int | None = None
+        # task -> (scope, profile of a selected request or None when only its route is wanted)
+        self._tasks: dict[asyncio.Task, tuple[dict, Profile | None]] = {}
+        self._windows: dict[str, tuple[Profile, float]] = {}
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def configure(self, token: str | None, interval: float, output_dir: str):
+        self.token = token
+        self.interval = interval
+        self.output_dir = output_dir
+
+    def authorized(self, token: str | None) -> bool:
+        return bool(self.token and token) and hmac.compare_digest(self.token.encode(), token.encode())
+
+    @property
+    def active(self) -> bool:
+        # begin() and end() change _tasks on the loop thread while the sampler thread asks
+        return bool(self._windows) or any(profile for _, profile in list(self._tasks.values()))
+
+    def path(self, profile_id: str, fmt: str) -> str:
+        return os.path.join(os.path.abspath(self.output_dir), f"{profile_id}.{FORMATS[fmt]}")
+
+    def begin(self, scope: dict, selected: bool) -> Profile | None:
+        """Called from the request's task; the profile is returned only for selected requests."""
+        profile = Profile(f"{scope['method']} {scope['path']}", self.interval) if selected else None
+        self._tasks[asyncio.current_task()] = (scope, profile)
+        if profile:
+            self._ensure_running()
+        return profile
+
+    def end(self, profile: Profile | None = None):
+        scope, _ = self._tasks.pop(asyncio.current_task(), (None, None))
+        if profile:
+            profile.name = _label(scope)
+            profile.duration = time.perf_counter() - profile.started
+            self.save(profile)
+
+    def window(self, seconds: float) -> Profile:
+        profile = Profile(f"window {seconds:g}s", self.interval)
+        self._windows[profile.id] = (profile, profile.started + seconds)
+        self._ensure_running()
+        return profile
+
+    def save(self, profile: Profile):
+        os.makedirs(os.path.abspath(self.output_dir), exist_ok=True)
+        for fmt, data in (
+                ("collapsed", profile.collapsed().encode()),
+                ("speedscope", orjson.dumps(profile.speedscope()))
+        ):
+            path = self.path(profile.id, fmt)
+            with open(f"{path}.tmp", "wb") as f:
+                f.write(data)
+            os.replace(f"{path}.tmp", path)
+
+    def _ensure_running(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            try:
+                for profile_id, (profile, deadline) in list(self._windows.items()):
+                    if now >= deadline:
+                        del self._windows[profile_id]
+                        profile.duration = now - profile.started
+                        self.save(profile)
+                with self._lock:
+                    if not self.active:
+                        self._thread = None
+                        return
+                self._sample(me)
+            except Exception:
+                # the thread must outlive a failed save, the other open windows are still to be saved
+                logger.exception("sampling failed")
+
+    def _sample(self, me: int):
+        windows = [profile for profile, _ in list(self._windows.values())]
+        # reading another thread's current task is a dict lookup, safe under the GIL
+        task = asyncio.current_task(self._loop) if self._loop else None
+        scope, selected = self._tasks.get(task, (None, None))
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == me:
+                continue
+            if thread_id == self._loop_thread:
+                stack = (_label(scope),) + collapse(frame) if scope else ("<loop>",) + collapse(frame)
+                if selected:
+                    selected.stacks[stack] += 1
+            elif windows:
+                stack = ("<threads>",) + collapse(frame)
+            else:
+                continue
+            for profile in windows:
+                profile.stacks[stack] += 1
+
+
+PROFILER = SamplingProfiler()
@@ -0,0 +1,155 @@
+"""
+Perceptual hashes and a near-duplicate index.
+
+dhash() reduces a picture to 64 bits that survive re-encoding, resizing and
+small crops; two pictures are near-duplicates when the Hamming distance of
+their hashes is small. SimilarityIndex keeps the hashes in a MultiIndex
+split for its radius, so a lookup checks a few exact-match buckets instead of
+every picture. The index is built from a snapshot of (hash, picture id) rows that
+`python -m app.service_layer.jobs build-similarity-index` writes from the
+database, memory-mapped at startup; pictures published afterwards are added
+as they come in, by the process that published them only. Other processes
+see them after the next snapshot, so detection is best-effort between runs
+of the job.
+"""
+import os
+from itertools import combinations
+from typing import Iterable, Iterator, Protocol
+from uuid import UUID
+
+import numpy as np
+from PIL import Image
+
+SNAPSHOT_DTYPE = np.dtype([("hash", "<i8"), ("picture", "V16")])
+
+_MASK = (1 << 64) - 1
+
+
+def dhash(image: Image.Image) -> int:
+    """Difference hash, as a signed 64-bit integer so it fits a BIGINT column."""
+    pixels = np.asarray(image.convert("L").resize((9, 8), Image.BOX), dtype=np.int16)
+    bits = np.packbits(pixels[:, 1:] > pixels[:, :-1])
+    return int(bits.view(">i8")[0])
+
+
+def hamming(a: int, b: int) -> int:
+    return ((a ^ b) & _MASK).bit_count()
+
+
+def _variants(value: int, width: int, flips: int) -> Iterator[int]:
+    """value and every value of the same width within flips bits of it."""
+    for k in range(flips + 1):
+        for bits in combinations(range(width), k):
+            variant = value
+            for bit in bits:
+                variant ^= 1 << bit
+            yield variant
+
+
+class MultiIndex:
+    """
+    Multi-index hashing over Hamming distance. The 64 bits are split into
+    `parts` substrings, each with a table of substring -> hashes. Two hashes
+    within r bits agree on some substring within r // parts bits (pigeonhole),
+    so a lookup reads the buckets of those few substring variants and checks
+    the distance of the candidates only; with parts = radius + 1 these are
+    exact-match buckets. Pictures sharing a hash share an entry.
+    """
+
+    def __init__(self, parts: int = 9):
+        self.parts = parts
+        self._slices: list[tuple[int, int]] = []
+        shift = 0
+        for i in range(parts):
+            width = 64 // parts + (i < 64 % parts)
+            self._slices.append((shift, (1 << width) - 1))
+            shift += width
+        self._tables: list[dict[int, list[int]]] = [{} for _ in range(parts)]
+        self._pictures: dict[int, list[UUID]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pictures)
+
+    def add(self, hash_: int, picture: UUID):
+        hash_ &= _MASK
+        pictures = self._pictures.get(hash_)
+        if pictures is not None:
+            pictures.append(picture)
+            return
+        self._pictures[hash_] = [picture]
+        for table, (shift, mask) in zip(self._tables, self._slices):
+            table.setdefault((hash_ >> shift) & mask, []).append(hash_)
+
+    def search(self, hash_: int, radius: int) -> list[tuple[int, UUID]]:
+        hash_ &= _MASK
+        flips = radius // self.parts
+        found, seen = [], set()
+        for table, (shift, mask) in zip(self._tables, self._slices):
+            for variant in _variants((hash_ >> shift) & mask, mask.bit_length(), flips):
+                for candidate in table.get(variant, ()):
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    distance = (hash_ ^ candidate).bit_count()
+                    if distance <= radius:
+                        found.extend((distance, picture) for picture in self._pictures[candidate])
+        return found
+
+
+class SimilarityIndexProtocol(Protocol):
+    radius: int
+
+    def add(self, hash_: int, picture: UUID):
+        raise NotImplementedError
+
+    def discard(self, picture: UUID):
+        raise NotImplementedError
+
+    def search(self, hash_: int, radius: int | None = None, limit: int = 20) -> list[tuple[UUID, int]]:
+        raise NotImplementedError
+
+    def nearest(self, hash_: int) -> UUID | None:
+        raise NotImplementedError
+
+
+class SimilarityIndex:
+    def __init__(self, path: str | None = None, radius: int = 8):
+        self.path = path
+        self.radius = radius
+        self.hashes = MultiIndex(radius + 1)
+        self._deleted: set[UUID] = set()
+
+    def load(self) -> int:
+        """Build the index from the snapshot at path, if there is one; returns the number of rows."""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        rows = np.load(self.path, mmap_mode="r")
+        for row in rows:
+            self.hashes.add(int(row["hash"]), UUID(bytes=row["picture"].tobytes()))
+        return len(rows)
+
+    @staticmethod
+    def save(path: str, rows: Iterable[tuple[int, UUID]]):
+        """Write a snapshot atomically, so workers starting meanwhile map either the old or the new one."""
+        array = np.array([(hash_, picture.bytes) for hash_, picture in rows], dtype=SNAPSHOT_DTYPE)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(f"{path}.tmp", "wb") as f:
+            np.save(f, array)
+        os.replace(f"{path}.tmp", path)
+
+    def add(self, hash_: int, picture: UUID):
+        self._deleted.discard(picture)
+        self.hashes.add(hash_, picture)
+
+    def discard(self, picture: UUID):
+        # dropping a picture from every bucket is not worth it, deleted pictures are skipped instead
+        self._deleted.add(picture)
+
+    def search(self, hash_: int, radius: int | None = None, limit: int = 20) -> list[tuple[UUID, int]]:
+        found = self.hashes.search(hash_, self.radius if radius is None else radius)
+        found.sort(key=lambda item: (item[0], item[1]))
+        return [(picture, distance) for distance, picture in found if picture not in self._deleted][:limit]
+
+    def nearest(self, hash_: int) -> UUID | None:
+        found = self.search(hash_, limit=1)
+        return found[0][0] if found else None
@@ -0,0 +1,119 @@
+import re
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_PARAM = re.compile(r"\$\d+|%\(\w+\)s|(?<!:):\w+|\?")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"\bVALUES\s*\(([^()]*)\)(?:\s*,\s*\(\1\))+", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(statement: str) -> str:
+    """Collapse literals, bind parameters and IN/VALUES lists so repeated queries compare equal."""
+    sql = _STRING.sub("?", statement)
+    sql = _NUMBER.sub("?", sql)
+    sql = _PARAM.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    sql = _VALUES_LIST.sub(r"VALUES (\1), ...", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+@dataclass
+class Statement:
+    sql: str
+    seconds: float
+    rows: int | None
+
+
+@dataclass
+class Profile:
+    statements: list[Statement] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def seconds(self) -> float:
+        return sum(s.seconds for s in self.statements)
+
+    def grouped(self) -> list[tuple[str, int, float]]:
+        groups = defaultdict(lambda: [0, 0.0])
+        for s in self.statements:
+            groups[s.sql][0] += 1
+            groups[s.sql][1] += s.seconds
+        return sorted(
+            ((sql, count, seconds) for sql, (count, seconds) in groups.items()),
+            key=lambda g: (g[1], g[2]), reverse=True
+        )
+
+    def repeated(self, threshold: int) -> list[tuple[str, int, float]]:
+        return [g for g in self.grouped() if g[1] >= threshold]
+
+    def summary(self, top: int = 5) -> str:
+        lines = [f"{self.count} statements, {self.seconds * 1000:.1f}ms in SQL"]
+        for sql, count, seconds in self.grouped()[:top]:
+            lines.append(f"  {count}x {seconds * 1000:.1f}ms {sql}")
+        return "\n".join(lines)
+
+
+current_profile: ContextVar[Profile | None] = ContextVar("current_profile", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_profile.get() is not None:
+        context._profiler_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    if profile is None or not hasattr(context, "_profiler_start"):
+        return
+    rowcount = cursor.rowcount
+    profile.statements.append(Statement(
+        sql=normalize(statement),
+        seconds=time.perf_counter() - context._profiler_start,
+        rows=rowcount if rowcount >= 0 else None
+    ))
+
+
+def instrument_engine(engine: AsyncEngine):
+    sync_engine = engine.sync_engine
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def profile():
+    parent = current_profile.get()
+    collected = Profile()
+    token = current_profile.set(collected)
+    try:
+        yield collected
+    finally:
+        current_profile.reset(token)
+        if parent is not None:
+            parent.statements.extend(collected.statements)
+
+
+@contextmanager
+def assert_max_queries(limit: int):
+    """
+    Test helper, the engine has to be instrumented:
+
+        with assert_max_queries(1):
+            await client.get("/posts/1")
+    """
+    with profile() as collected:
+        yield collected
+    if collected.count > limit:
+        raise AssertionError(f"expected at most {limit} statements, got {collected.summary(top=10)}")
@@ -0,0 +1,186 @@
+import base64
+import binascii
+import fcntl
+import hashlib
+import os
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from typing import BinaryIO
+
+import orjson
+
+from app.domain import exceptions
+
+
+@dataclass
+class Upload:
+    id: str
+    user_id: str
+    length: int
+    offset: int
+    checksum: str | None
+    created_at: float
+    finished: bool = False
+
+
+def parse_checksum(header: str | None) -> bytes | None:
+    """`Upload-Checksum: sha256 <base64 digest>`, the tus checksum extension format."""
+    if not header:
+        return None
+    algorithm, _, digest = header.partition(" ")
+    if algorithm.lower() != "sha256":
+        raise exceptions.UploadChecksumMismatch(f"unsupported checksum algorithm {algorithm}")
+    try:
+        return base64.b64decode(digest, validate=True)
+    except binascii.Error:
+        raise exceptions.UploadChecksumMismatch(f"malformed checksum {digest}")
+
+
+class UploadWriter:
+    def __init__(self, storage: "UploadStorage", upload: Upload, offset: int):
+        self.storage = storage
+        self.start = offset
+        self.hash = hashlib.sha256()
+        self.file = open(storage.data_path(upload.user_id, upload.id), "r+b")
+        try:
+            fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            # the previous holder of the lock may have moved the offset since upload was read
+            self.upload = storage.get(upload.user_id, upload.id)
+            if self.upload.finished or offset != self.upload.offset:
+                raise exceptions.UploadOffsetMismatch(self.upload.offset)
+        except BlockingIOError:
+            self.file.close()
+            raise exceptions.UploadLocked(upload.id)
+        except Exception:
+            self.file.close()
+            raise
+        self.file.seek(offset)
+
+    def write(self, chunk: bytes):
+        if self.upload.offset + len(chunk) > self.upload.length:
+            raise exceptions.UploadTooLarge(self.upload.length)
+        self.file.write(chunk)
+        self.hash.update(chunk)
+        self.upload.offset += len(chunk)
+
+    def commit(self, checksum: bytes | None = None) -> int:
+        if checksum is not None and checksum != self.hash.digest():
+            self.abort()
+            raise exceptions.UploadChecksumMismatch(self.upload.id)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.storage.save(self.upload)
+        return self.upload.offset
+
+    def abort(self):
+        self.file.truncate(self.start)
+        self.upload.offset = self.start
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class UploadStorage:
+    def __init__(self, base_path: str, max_length: int):
+        self.base_path = base_path
+        self.max_length = max_length
+        os.makedirs(self.base_path, exist_ok=True)
+
+    def data_path(self, user_id: str, upload_id: str) -> str:
+        return os.path.join(self.base_path, user_id, upload_id)
+
+    def _meta_path(self, user_id: str, upload_id: str) -> str:
+        return os.path.join(self.base_path, user_id, f"{upload_id}.json")
+
+    def save(self, upload: Upload):
+        path = self._meta_path(upload.user_id, upload.id)
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(orjson.dumps(asdict(upload)))
+        os.replace(f"{path}.tmp", path)
+
+    def create(self, user_id: str, length: int, checksum: bytes | None = None) -> Upload:
+        if length > self.max_length:
+            raise exceptions.UploadTooLarge(self.max_length)
+        upload = Upload(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            length=length,
+            offset=0,
+            checksum=checksum.hex() if checksum else None,
+            created_at=time.time()
+        )
+        os.makedirs(os.path.join(self.base_path, user_id), exist_ok=True)
+        open(self.data_path(user_id, upload.id), "wb").close()
+        self.save(upload)
+        return upload
+
+    def put(self, user_id: str, source: BinaryIO) -> Upload:
+        """Store a whole file as a finished upload, e.g. to hand it over to an image worker."""
+        length = source.seek(0, os.SEEK_END)
+        source.seek(0)
+        upload = self.create(user_id, length)
+        with self.writer(user_id, upload.id, 0) as writer:
+            while chunk := source.read(1 << 20):
+                writer.write(chunk)
+            writer.commit()
+        return self.finalize(user_id, upload.id)
+
+    def get(self, user_id: str, upload_id: str) -> Upload:
+        try:
+            uuid.UUID(hex=upload_id)
+            with open(self._meta_path(user_id, upload_id), "rb") as f:
+                return Upload(**orjson.loads(f.read()))
+        except (ValueError, FileNotFoundError):
+            raise exceptions.UploadNotFound(upload_id)
+
+    def writer(self, user_id: str, upload_id: str, offset: int) -> UploadWriter:
+        return UploadWriter(self, self.get(user_id, upload_id), offset)
+
+    def finalize(self, user_id: str, upload_id: str) -> Upload:
+        upload = self.get(user_id, upload_id)
+        if upload.offset != upload.length:
+            raise exceptions.UploadIncomplete(upload.offset)
+        if upload.checksum and not upload.finished:
+            digest = hashlib.sha256()
+            with open(self.data_path(user_id, upload_id), "rb") as f:
+                while chunk := f.read(1 << 20):
+                    digest.update(chunk)
+            if digest.hexdigest() != upload.checksum:
+                raise exceptions.UploadChecksumMismatch(upload_id)
+        upload.finished = True
+        self.save(upload)
+        return upload
+
+    def open(self, user_id: str, upload_id: str) -> BinaryIO:
+        if not self.get(user_id, upload_id).finished:
+            raise exceptions.UploadIncomplete(upload_id)
+        return open(self.data_path(user_id, upload_id), "rb")
+
+    def read(self, user_id: str, upload_id: str) -> bytes:
+        with self.open(user_id, upload_id) as f:
+            return f.read()
+
+    def delete(self, user_id: str, upload_id: str):
+        for path in (self.data_path(user_id, upload_id), self._meta_path(user_id, upload_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def expire(self, max_age: float) -> int:
+        expired, deadline = 0, time.time() - max_age
+        for user_id in os.listdir(self.base_path):
+            for name in os.listdir(os.path.join(self.base_path, user_id)):
+                if name.endswith(".json"):
+                    upload = self.get(user_id, name.removesuffix(".json"))
+                    if upload.created_at < deadline:
+                        self.delete(user_id, upload.id)
+                        expired += 1
+        return expired
@@ -0,0 +1,94 @@
+import asyncio
+from collections import Counter
+from logging import getLogger
+from typing import Awaitable, Callable, Protocol
+
+from app.adapters import metrics
+
+logger = getLogger("ViewCounter")
+
+
+class ViewCounterProtocol(Protocol):
+    def hit(self, post_id: int):
+        raise NotImplementedError
+
+
+class ViewCounter:
+    """
+    Per-worker post view counts, written with one batched upsert every
+    flush_interval seconds (or as soon as max_pending posts are waiting)
+    instead of an UPDATE per read. A crash loses at most the views of the
+    current interval; a failed flush keeps its counts for the next one.
+
+    After a failed flush the next one waits flush_interval * 2^failures seconds,
+    up to max_backoff, and only the max_pending most viewed posts are kept;
+    views of other posts are dropped until a flush succeeds.
+    """
+
+    def __init__(
+            self,
+            store: Callable[[dict[int, int]], Awaitable[None]],
+            flush_interval: float = 5,
+            max_pending: int = 10_000,
+            max_backoff: float = 60
+    ):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_backoff = max_backoff
+        self.failures = 0
+        self._pending: Counter[int] = Counter()
+        self._full = asyncio.Event()
+
+    def hit(self, post_id: int):
+        if self.failures and len(self._pending) >= self.max_pending and post_id not in self._pending:
+            metrics.VIEWS_DROPPED.inc()
+            return
+        self._pending[post_id] += 1
+        if len(self._pending) >= self.max_pending:
+            self._full.set()
+
+    async def flush(self):
+        self._full.clear()
+        counts, self._pending = self._pending, Counter()
+        if not counts:
+            return
+        try:
+            await self.store(dict(counts))
+        except Exception:
+            logger.exception("flushing %d post view counters failed", len(counts))
+            metrics.VIEW_FLUSHES.labels("error").inc()
+            self.failures += 1
+            self._pending.update(counts)
+            if len(self._pending) > self.max_pending:
+                kept = Counter(dict(self._pending.most_common(self.max_pending)))
+                metrics.VIEWS_DROPPED.inc(sum(self._pending.values()) - sum(kept.values()))
+                self._pending = kept
+        else:
+            self.failures = 0
+            metrics.VIEW_FLUSHES.labels("ok").inc()
+        finally:
+            metrics.VIEWS_PENDING.set(sum(self._pending.values()))
+
+    async def run(self):
+        while True:
+            if self.failures:
+                # a full counter does not cut the backoff short
+                await asyncio.sleep(min(self.flush_interval * 2 ** self.failures, self.max_backoff))
+            else:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            await self.flush()
+
+
+class NoViewCounter:
+    def hit(self, post_id: int):
+        pass
+
+    async def flush(self):
+        pass
+
+    async def run(self):
+        pass
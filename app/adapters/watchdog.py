@@ -0,0 +1,90 @@
+"""
+Event loop watchdog.
+
+A heartbeat task sleeps `interval` in a loop and exports how late it wakes up
+(the loop lag). A daemon thread checks the heartbeat; once it is `threshold`
+overdue, something is running on the loop without yielding, and the thread
+captures the loop thread's stack and the route of the task holding the loop.
+When the heartbeat resumes the stall is counted and timed under that route.
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from logging import Logger
+
+from starlette.types import Scope
+
+from app.adapters import metrics
+
+# request task -> scope of the in-flight requests, for attributing a stall to its route
+REQUESTS: dict[asyncio.Task, Scope] = {}
+
+
+def route_of(scope: Scope | None) -> str:
+    if scope is None:
+        return "<background>"
+    route = scope.get("route")
+    return f"{scope['method']} {route.path if route else '<unmatched>'}"
+
+
+class LoopWatchdog:
+    def __init__(self, logger: Logger, interval: float = 0.05, threshold: float = 0.1, stack_limit: int = 12):
+        self.logger = logger
+        self.interval = interval
+        self.threshold = threshold
+        self.stack_limit = stack_limit
+        self._beat = time.monotonic()
+        self._stall: str | None = None
+        self._heartbeat: asyncio.Task | None = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        self._beat = time.monotonic()
+        self._heartbeat = asyncio.create_task(self._run_heartbeat(loop))
+        self._stopped.clear()
+        threading.Thread(
+            target=self._watch, args=(loop, threading.get_ident()), name="LoopWatchdog", daemon=True
+        ).start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._heartbeat:
+            self._heartbeat.cancel()
+            try:
+                await self._heartbeat
+            except asyncio.CancelledError:
+                pass
+
+    async def _run_heartbeat(self, loop: asyncio.AbstractEventLoop):
+        while True:
+            self._beat = time.monotonic()
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - start - self.interval, 0.0)
+            metrics.EVENT_LOOP_LAG_SECONDS.observe(lag)
+            route, self._stall = self._stall, None
+            if route:
+                metrics.EVENT_LOOP_STALL_SECONDS.labels(route).observe(lag)
+                self.logger.warning("event loop was blocked for %.0fms by %s", lag * 1000, route)
+
+    def _watch(self, loop: asyncio.AbstractEventLoop, loop_thread: int):
+        reported = None
+        while not self._stopped.wait(self.threshold / 2):
+            beat = self._beat
+            if beat == reported or time.monotonic() - beat < self.interval + self.threshold:
+                continue
+            reported = beat
+            frame = sys._current_frames().get(loop_thread)
+            if frame is None:
+                continue
+            # reading the loop's current task from another thread is a dict lookup, safe under the GIL
+            route = route_of(REQUESTS.get(asyncio.current_task(loop)))
+            self._stall = route
+            metrics.EVENT_LOOP_STALLS.labels(route).inc()
+            self.logger.warning(
+                "event loop blocked for over %.0fms by %s at:\n%s",
+                self.threshold * 1000, route, "".join(traceback.format_stack(frame)[-self.stack_limit:])
+            )
@@ -2,3 +2,6 @@ from app.api.authorization.endpoints import router as authorization_router
 from app.api.posts.endpoints import router as posts_router
 from app.api.users.endpoints import router as users_router
 from app.api.pictures.endpoints import router as pictures_router
+from app.api.metrics.endpoints import router as metrics_router
+from app.api.uploads.endpoints import router as uploads_router
+from app.api.profiling.endpoints import router as profiling_router
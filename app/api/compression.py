@@ -0,0 +1,97 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.adapters.compression import Compressor, negotiate
+from app.adapters.feed_cache import CachedBody
+
+# already compressed payloads gain nothing and cost a full pass over the bytes
+SKIP_CONTENT_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip")
+
+
+def _skip(message: Message, method: str) -> bool:
+    headers = Headers(raw=message["headers"])
+    content_type = headers.get("content-type", "")
+    return (
+        method == "HEAD"
+        or message["status"] in (204, 206, 304)
+        or "content-encoding" in headers
+        or content_type.startswith(SKIP_CONTENT_TYPES)
+    )
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Message | None = None
+        compressor: Compressor | None = None
+        passthrough = False
+
+        async def send_wrapper(message: Message):
+            nonlocal start, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                if _skip(message, scope["method"]):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            headers = MutableHeaders(raw=start["headers"])
+
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = Compressor(encoding, self.gzip_level, self.brotli_quality)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                    await send(start)
+                else:
+                    body = compressor.compress(body) + compressor.finish()
+                    headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+
+            body = compressor.compress(body)
+            if not more_body:
+                body += compressor.finish()
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def cached_response(request: Request, entry: CachedBody, media_type: str = "application/json") -> Response:
+    """Serve a FeedCache entry in the best encoding the client accepts, bypassing CompressionMiddleware."""
+    encoding = negotiate(request.headers.get("accept-encoding", ""), entry.encodings)
+    if encoding is None:
+        response = Response(entry.identity, media_type=media_type)
+    else:
+        response = Response(entry.encoded(encoding), media_type=media_type, headers={"Content-Encoding": encoding})
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from starlette.responses import Response
+
+from app.adapters import metrics
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(metrics.REGISTRY.expose(), media_type="text/plain; version=0.0.4; charset=utf-8")
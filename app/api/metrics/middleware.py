@@ -0,0 +1,39 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.adapters import metrics
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        stats = metrics.QueryStats()
+        token = metrics.query_stats.set(stats)
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.query_stats.reset(token)
+            # route templates keep label cardinality bounded, unmatched paths share one series
+            route = scope.get("route")
+            template = route.path if route else "<unmatched>"
+            method = scope["method"]
+            metrics.HTTP_REQUEST_SECONDS.labels(method, template, str(status)).observe(elapsed)
+            metrics.HTTP_REQUEST_QUERIES.labels(method, template).observe(stats.count)
+            metrics.HTTP_REQUEST_QUERY_SECONDS.labels(method, template).observe(stats.seconds)
@@ -0,0 +1,37 @@
+import time
+from logging import Logger
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.adapters import sql_profiler
+
+
+class SQLProfilerMiddleware:
+    def __init__(self, app: ASGIApp, logger: Logger, slow_request: float, repeated_statements: int):
+        self.app = app
+        self.logger = logger
+        self.slow_request = slow_request
+        self.repeated_statements = repeated_statements
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        with sql_profiler.profile() as profile:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                # a request that raises (or is cancelled) is often the one worth reporting
+                self._report(scope, profile, time.perf_counter() - start)
+
+    def _report(self, scope: Scope, profile: sql_profiler.Profile, elapsed: float):
+        route = scope.get("route")
+        endpoint = f"{scope['method']} {route.path if route else scope['path']}"
+        for sql, count, seconds in profile.repeated(self.repeated_statements):
+            self.logger.warning(
+                "%s: possible N+1, %dx %.1fms %s", endpoint, count, seconds * 1000, sql
+            )
+        if elapsed >= self.slow_request:
+            self.logger.warning("%s: slow request %.1fms, %s", endpoint, elapsed * 1000, profile.summary())
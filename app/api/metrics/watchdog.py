@@ -0,0 +1,24 @@
+import asyncio
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.adapters.watchdog import REQUESTS
+
+
+class WatchdogMiddleware:
+    """Registers the request's task so the watchdog can name the route that stalls the loop."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        task = asyncio.current_task()
+        REQUESTS[task] = scope
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            REQUESTS.pop(task, None)
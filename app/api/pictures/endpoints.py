@@ -1,27 +1,66 @@
 from uuid import UUID
 
 from fastapi import APIRouter, Depends
+from fastapi.params import Query
 from starlette import status
-from starlette.responses import FileResponse, Response
+from starlette.responses import Response
 
 from app.adapters.gallery import GalleryProtocol, Source
+from app.api.pictures import schemas
+from app.api.pictures.serving import PictureSenderProtocol
+from app.api.schemas import ResponseSchema
+from app.service_layer.unit_of_work import UnitOfWork
 
 router = APIRouter(prefix="/pictures", tags=["Pictures"])
 
 
+@router.get(
+    path="/{picture_id}/similar",
+    status_code=200,
+    responses={
+        status.HTTP_200_OK: {"model": list[schemas.SimilarPicture]},
+        status.HTTP_404_NOT_FOUND: {"model": ResponseSchema},
+    }
+)
+async def similar_pictures(
+        picture_id: UUID,
+        response: Response,
+        radius: int | None = Query(None, ge=0, le=16),
+        limit: int = Query(20, ge=1, le=100),
+        gallery: GalleryProtocol = Depends()
+):
+    async with UnitOfWork() as uow:
+        picture = await uow.pictures.get(picture_id)
+        if picture is None:
+            response.status_code = status.HTTP_404_NOT_FOUND
+            return ResponseSchema(message="picture not found")
+        if picture.phash is None:
+            return []
+        found = [
+            (similar, distance) for similar, distance in gallery.similar.search(picture.phash, radius, limit + 1)
+            if similar != picture_id
+        ][:limit]
+        # the index may still hold pictures another worker deleted, those are dropped here
+        rows = await uow.pictures.list_with_users([similar for similar, _ in found])
+        await uow.commit()
+    return [
+        schemas.SimilarPicture(
+            picture=rows[similar][0], user_id=rows[similar][1], post_id=rows[similar][0].post_id, distance=distance
+        )
+        for similar, distance in found if similar in rows
+    ]
+
+
 @router.get("/{source}/{user_id}/{picture_id}")
 async def get_picture(
         source: Source,
         user_id: int,
         picture_id: UUID,
         response: Response,
-        gallery: GalleryProtocol = Depends()
+        gallery: GalleryProtocol = Depends(),
+        send: PictureSenderProtocol = Depends()
 ):
-    try:
-        return FileResponse(
-            gallery.path(source, str(user_id), str(picture_id)),
-            media_type="image/*",
-            filename="picture.jpg"
-        )
-    except FileNotFoundError:
+    picture = send(gallery, source, str(user_id), str(picture_id))
+    if picture is None:
         response.status_code = status.HTTP_404_NOT_FOUND
+    return picture
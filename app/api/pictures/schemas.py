@@ -0,0 +1,13 @@
+from pydantic import BaseModel, Field
+
+from app.api.posts.schemas import Picture
+
+
+class SimilarPicture(BaseModel):
+    picture: Picture
+    user_id: int = Field(alias="userId")
+    post_id: int = Field(alias="postId")
+    distance: int
+
+    class Config:
+        allow_population_by_field_name = True
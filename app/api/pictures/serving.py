@@ -0,0 +1,123 @@
+import os
+from typing import Protocol
+
+from starlette.responses import FileResponse, RedirectResponse, Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from app.adapters.gallery import GalleryProtocol, Source
+from app.adapters.picture_cache import CachedPicture
+
+# picture files are written once under a fresh uuid and never modified
+IMMUTABLE = {"Cache-Control": "public, max-age=31536000, immutable"}
+MEDIA_TYPE = "image/*"
+FILENAME = "picture.jpg"
+
+
+class PictureSenderProtocol(Protocol):
+    def __call__(self, gallery: GalleryProtocol, source: Source, user_id: str, picture_id: str) -> Response | None:
+        """None when the picture does not exist."""
+        raise NotImplementedError
+
+
+def _existing(gallery: GalleryProtocol, source: Source, user_id: str, picture_id: str) -> str | None:
+    path = gallery.path(source, user_id, picture_id)
+    return path if os.path.isfile(path) else None
+
+
+class CachedPictureResponse(Response):
+    """Skips header rendering, the entry carries them."""
+
+    def __init__(self, entry: CachedPicture):
+        self.status_code = 200
+        self.body = entry.body
+        self.background = None
+        self.raw_headers = entry.raw_headers
+
+
+class FileSender:
+    """Serve small pictures from the Gallery cache, stream the rest from disk."""
+
+    def __call__(self, gallery: GalleryProtocol, source: Source, user_id: str, picture_id: str) -> Response | None:
+        entry = gallery.cached(source, user_id, picture_id)
+        if entry is not None:
+            if entry.raw_headers is None:
+                entry.raw_headers = Response(entry.body, media_type=MEDIA_TYPE, headers={
+                    **IMMUTABLE, "Content-Disposition": f'attachment; filename="{FILENAME}"'
+                }).raw_headers
+            return CachedPictureResponse(entry)
+        path = _existing(gallery, source, user_id, picture_id)
+        return path and FileResponse(path, media_type=MEDIA_TYPE, filename=FILENAME, headers=IMMUTABLE)
+
+
+class AccelRedirectSender:
+    """nginx serves prefix + url_path from an internal location, the worker sends headers only."""
+
+    def __init__(self, prefix: str = "/_pictures/"):
+        self.prefix = prefix
+
+    def __call__(self, gallery: GalleryProtocol, source: Source, user_id: str, picture_id: str) -> Response | None:
+        if not _existing(gallery, source, user_id, picture_id):
+            return None
+        return Response(media_type=MEDIA_TYPE, headers={
+            **IMMUTABLE,
+            "Content-Disposition": f'inline; filename="{FILENAME}"',
+            "X-Accel-Redirect": f"{self.prefix}{source}/{user_id}/{picture_id}",
+        })
+
+
+class SendfileSender:
+    """Apache mod_xsendfile / lighttpd read the absolute path from X-Sendfile."""
+
+    def __call__(self, gallery: GalleryProtocol, source: Source, user_id: str, picture_id: str) -> Response | None:
+        path = _existing(gallery, source, user_id, picture_id)
+        if not path:
+            return None
+        return Response(media_type=MEDIA_TYPE, headers={
+            **IMMUTABLE,
+            "Content-Disposition": f'inline; filename="{FILENAME}"',
+            "X-Sendfile": path,
+        })
+
+
+class StaticRedirectSender:
+    """Point clients at the ImmutableStaticFiles mounts, which a CDN can cache forever."""
+
+    def __init__(self, mount: str = "/static/pictures/"):
+        self.mount = mount
+
+    def __call__(self, gallery: GalleryProtocol, source: Source, user_id: str, picture_id: str) -> Response | None:
+        if not _existing(gallery, source, user_id, picture_id):
+            return None
+        return RedirectResponse(f"{self.mount}{source}/{user_id}/{picture_id}", status_code=308, headers=IMMUTABLE)
+
+
+class ImmutableStaticFiles(StaticFiles):
+    def file_response(self, full_path, stat_result, scope: Scope, status_code: int = 200) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers.update(IMMUTABLE)
+        if "content-type" in response.headers:
+            # files have no extension, the guess would be text/plain
+            response.headers["Content-Type"] = MEDIA_TYPE
+        return response
+
+
+def sender(mode: str, accel_prefix: str, static_mount: str) -> PictureSenderProtocol:
+    if mode == "x-accel-redirect":
+        return AccelRedirectSender(accel_prefix)
+    if mode == "x-sendfile":
+        return SendfileSender()
+    if mode == "static":
+        return StaticRedirectSender(static_mount)
+    return FileSender()
+
+
+def mount_static(app, base_path: str, mount: str, sources):
+    # one mount per source so the uploads directory next to them is never exposed
+    for source in sources:
+        directory = os.path.join(os.path.abspath(base_path), source)
+        app.mount(
+            f"{mount}{source}",
+            ImmutableStaticFiles(directory=directory, check_dir=False),
+            name=f"pictures-{source}"
+        )
@@ -1,15 +1,30 @@
-from datetime import datetime
+import base64
+import binascii
+from contextlib import AsyncExitStack
+from datetime import datetime, timezone
 
+import orjson
 from fastapi import APIRouter, UploadFile, Depends
-from fastapi.params import Form, File, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.params import Form, File, Header, Query
+from pydantic import BaseModel, ValidationError, parse_raw_as
 from starlette import status
-from starlette.responses import Response
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
 
+from app.adapters.admission import AdmissionProtocol
+from app.adapters.feed_cache import FeedCacheProtocol
 from app.adapters.security import TokenPayload, JWTCookie
+from app.adapters.view_counter import ViewCounterProtocol
+from app.api.compression import cached_response
 from app.api.posts import schemas
 from app.adapters.gallery import GalleryProtocol
 from app.api.schemas import ResponseSchema
+from app.domain import exceptions
 from app.service_layer import dto, services
+from app.service_layer.idempotency import IdempotencyProtocol, StoredResponse, fingerprint
+from app.service_layer.queue import PublishQueueProtocol
 from app.service_layer.unit_of_work import UnitOfWork
 
 router = APIRouter(prefix="/posts", tags=["Posts"])
@@ -18,34 +33,208 @@ router = APIRouter(prefix="/posts", tags=["Posts"])
 @router.post(
     path="/",
     status_code=200,
-    response_model=ResponseSchema
+    responses={
+        status.HTTP_200_OK: {"model": ResponseSchema},
+        status.HTTP_202_ACCEPTED: {"model": schemas.PostStatus},
+        status.HTTP_404_NOT_FOUND: {"model": ResponseSchema},
+        status.HTTP_409_CONFLICT: {"model": ResponseSchema},
+        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE: {"model": ResponseSchema},
+        status.HTTP_415_UNSUPPORTED_MEDIA_TYPE: {"model": ResponseSchema},
+        status.HTTP_422_UNPROCESSABLE_ENTITY: {"model": ResponseSchema},
+        status.HTTP_503_SERVICE_UNAVAILABLE: {"model": ResponseSchema},
+    }
 )
 async def create_post(
+        response: Response,
         title: str = Form(""),
         description: str = Form(""),
         save_originals: list[bool] = Form(..., alias="saveOriginals"),
         areas: list[schemas.CropArea] = Form(...),
-        files: list[UploadFile] = File(...),
-        gallery: GalleryProtocol = Depends()
+        files: list[UploadFile] = File([]),
+        uploads: list[str] = Form([]),
+        idempotency_key: str | None = Header(None, max_length=255),
+        gallery: GalleryProtocol = Depends(),
+        feed_cache: FeedCacheProtocol = Depends(),
+        admission: AdmissionProtocol = Depends(),
+        idempotency: IdempotencyProtocol = Depends(),
+        publish_queue: PublishQueueProtocol = Depends()
 ):
+    """
+    With an Idempotency-Key header a retried request gets the stored response of
+    the first one (marked Idempotent-Replayed) instead of publishing the post twice.
+
+    With the publish queue enabled the pictures are only checked and staged: the
+    answer is 202 with the post in processing state, and an image worker publishes it.
+    """
+    user_id = 0
     new_post = dto.NewPost(
         title=title,
         description=description,
-        user_id=0,
+        user_id=user_id,
         pictures=[]
     )
-
-    for file, area, save_original in zip(files, areas, save_originals):
-        new_post.pictures.append(dto.NewPicture(
-            file_bytes=await file.read(),
+    # pictures come from the multipart files first, then from finished resumable uploads
+    sources = [dict(file=file.file) for file in files] + [dict(upload_id=upload_id) for upload_id in uploads]
+    pictures = [
+        dto.PictureSource(
             crop_box=(area.x, area.y, area.x + area.width, area.y + area.height),
-            save_original=save_original
-        ))
-        await file.close()
+            save_original=save_original,
+            **source
+        ) for source, area, save_original in zip(sources, areas, save_originals)
+    ]
+
+    async def publish() -> StoredResponse:
+        try:
+            if publish_queue.enabled:
+                post_id = await services.enqueue_post(
+                    new_post, pictures, gallery, admission, publish_queue.max_attempts
+                )
+                return _stored(
+                    status.HTTP_202_ACCEPTED,
+                    schemas.PostStatus(id=post_id, status="processing"),
+                    {"Location": router.url_path_for("get_post_status", post_id=str(post_id))}
+                )
+            await services.publish_uploaded_post(new_post, pictures, gallery, admission)
+        except exceptions.UploadNotFound:
+            return _stored(status.HTTP_404_NOT_FOUND, ResponseSchema(message="upload not found"))
+        except exceptions.UploadIncomplete:
+            return _stored(status.HTTP_409_CONFLICT, ResponseSchema(message="upload is not finalized"))
+        except exceptions.UnsupportedImageFormat:
+            return _stored(status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, ResponseSchema(message="unsupported image format"))
+        except exceptions.ImageTooLarge:
+            return _stored(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, ResponseSchema(message="image is too large"))
+        except exceptions.AdmissionRejected as e:
+            return _stored(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                ResponseSchema(message="too many uploads in progress, retry later"),
+                {"Retry-After": str(e.retry_after)}
+            )
+        feed_cache.invalidate()
+        return _stored(status.HTTP_200_OK, ResponseSchema(message="post published"))
+
+    async with AsyncExitStack() as stack:
+        for file in files:
+            stack.push_async_callback(file.close)
+        try:
+            if idempotency_key is None:
+                result = await publish()
+            else:
+                result = await idempotency.run(user_id, idempotency_key, fingerprint(
+                    title, description, save_originals, [area.dict() for area in areas], uploads,
+                    [(file.filename, file.size) for file in files]
+                ), publish)
+        except exceptions.IdempotencyKeyMismatch:
+            response.status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+            return ResponseSchema(message="idempotency key was used for a different request")
+        except exceptions.IdempotencyKeyInProgress:
+            response.status_code = status.HTTP_409_CONFLICT
+            return ResponseSchema(message="a request with this idempotency key is in progress")
+
+    headers = {**result.headers, "Idempotent-Replayed": "true"} if result.replayed else result.headers
+    return Response(result.body, result.status_code, headers, media_type="application/json")
+
+
+def _stored(status_code: int, body: BaseModel, headers: dict[str, str] | None = None) -> StoredResponse:
+    return StoredResponse(status_code, body.json().encode(), headers or {})
+
+
+@router.post(
+    path="/batch",
+    status_code=200,
+    responses={
+        status.HTTP_200_OK: {"model": schemas.BatchResults},
+        status.HTTP_400_BAD_REQUEST: {"model": ResponseSchema},
+        status.HTTP_404_NOT_FOUND: {"model": ResponseSchema},
+        status.HTTP_409_CONFLICT: {"model": ResponseSchema},
+        status.HTTP_503_SERVICE_UNAVAILABLE: {"model": ResponseSchema},
+    }
+)
+async def create_posts(
+        response: Response,
+        posts: str = Form(...),
+        files: list[UploadFile] = File([]),
+        gallery: GalleryProtocol = Depends(),
+        feed_cache: FeedCacheProtocol = Depends(),
+        admission: AdmissionProtocol = Depends()
+):
+    """
+    posts is a JSON array of {title, description, pictures: [{file | upload, area, saveOriginal}]},
+    where file is an index into files and upload is the id of a finished resumable upload.
+    """
+    user_id = 0
+    try:
+        batch = parse_raw_as(list[schemas.BatchPost], posts)
+    except ValidationError:
+        response.status_code = status.HTTP_400_BAD_REQUEST
+        return ResponseSchema(message="invalid posts")
+    if any(p.file is not None and not 0 <= p.file < len(files) for post in batch for p in post.pictures):
+        response.status_code = status.HTTP_400_BAD_REQUEST
+        return ResponseSchema(message="file index out of range")
+
+    async with AsyncExitStack() as stack:
+        sources = {}
+        for i, file in enumerate(files):
+            stack.push_async_callback(file.close)
+            sources[i] = file.file
+        try:
+            for upload_id in {p.upload for post in batch for p in post.pictures if p.upload is not None}:
+                sources[upload_id] = stack.enter_context(gallery.uploads.open(str(user_id), upload_id))
+        except exceptions.UploadNotFound:
+            response.status_code = status.HTTP_404_NOT_FOUND
+            return ResponseSchema(message="upload not found")
+        except exceptions.UploadIncomplete:
+            response.status_code = status.HTTP_409_CONFLICT
+            return ResponseSchema(message="upload is not finalized")
+
+        # an oversized image fails only the posts using it, it is never read into memory
+        pixels, too_large = [], set()
+        for key, source in sources.items():
+            try:
+                probed = gallery.probe(source).pixels
+                admission.check([probed])
+            except exceptions.UnsupportedImageFormat:
+                continue  # reported per post by publish_posts
+            except exceptions.ImageTooLarge:
+                too_large.add(key)
+                continue
+            pixels.append(probed)
+        rejected = [
+            any((p.upload if p.file is None else p.file) in too_large for p in post.pictures) for post in batch
+        ]
+
+        try:
+            async with admission(user_id, pixels):
+                raw_images = {
+                    key: await run_in_threadpool(source.read)
+                    for key, source in sources.items() if key not in too_large
+                }
+                published = iter(await services.publish_posts([
+                    dto.NewPost(
+                        title=post.title,
+                        description=post.description,
+                        user_id=user_id,
+                        pictures=[dto.NewPicture(
+                            file_bytes=raw_images[p.upload if p.file is None else p.file],
+                            crop_box=(p.area.x, p.area.y, p.area.x + p.area.width, p.area.y + p.area.height),
+                            save_original=p.save_original
+                        ) for p in post.pictures]
+                    ) for post, skip in zip(batch, rejected) if not skip
+                ], gallery))
+            results = [dto.Published(error="image is too large") if skip else next(published) for skip in rejected]
+        except exceptions.AdmissionRejected as e:
+            response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+            response.headers["Retry-After"] = str(e.retry_after)
+            return ResponseSchema(message="too many uploads in progress, retry later")
 
-    await services.publish_post(new_post, gallery)
+    if any(r.post_id for r in results):
+        feed_cache.invalidate()
+    for post, result in zip(batch, results):
+        if result.post_id:
+            for p in post.pictures:
+                if p.upload is not None:
+                    gallery.uploads.delete(str(user_id), p.upload)
 
-    return ResponseSchema(message="post published")
+    return schemas.BatchResults(items=[schemas.BatchItem.from_orm(r) for r in results])
 
 
 @router.get(
@@ -54,14 +243,96 @@ async def create_post(
     response_model=list[schemas.Post]
 )
 async def list_posts(
+        request: Request,
         from_date: datetime = Query(None),
         number: int | None = Query(None),
+        feed_cache: FeedCacheProtocol = Depends()
         # payload: TokenPayload = Depends(JWTCookie)
 ):
+    key = ("feed", from_date and from_date.isoformat(), number)
+    entry = feed_cache.get(key)
+    if entry is None:
+        generation = feed_cache.generation
+        async with UnitOfWork() as uow:
+            posts = await uow.posts.list(from_date, number)
+            await uow.commit()
+        body = orjson.dumps(jsonable_encoder([schemas.Post.from_orm(post) for post in posts]))
+        entry = feed_cache.set(key, body, generation)
+    return cached_response(request, entry)
+
+
+@router.get(
+    path="/search",
+    status_code=200,
+    responses={
+        status.HTTP_200_OK: {"model": schemas.SearchResults},
+        status.HTTP_400_BAD_REQUEST: {"model": ResponseSchema},
+    }
+)
+async def search_posts(
+        response: Response,
+        q: str = Query(..., min_length=1, max_length=200),
+        limit: int = Query(20, ge=1, le=100),
+        cursor: str | None = Query(None)
+):
+    after = None
+    if cursor:
+        try:
+            rank, post_id = orjson.loads(base64.urlsafe_b64decode(cursor))
+            after = (float(rank), int(post_id))
+        except (binascii.Error, orjson.JSONDecodeError, TypeError, ValueError):
+            response.status_code = status.HTTP_400_BAD_REQUEST
+            return ResponseSchema(message="invalid cursor")
+
     async with UnitOfWork() as uow:
-        posts = await uow.posts.list(from_date, number)
+        hits = await uow.posts.search(q, limit, after)
         await uow.commit()
-    return list(posts)
+
+    next_cursor = None
+    if len(hits) == limit:
+        post, rank, _ = hits[-1]
+        next_cursor = base64.urlsafe_b64encode(orjson.dumps([rank, post.id])).decode()
+
+    return schemas.SearchResults(
+        items=[schemas.SearchHit(post=post, rank=rank, snippet=snippet) for post, rank, snippet in hits],
+        next_cursor=next_cursor
+    )
+
+
+EXPORT_CHUNK = 64 * 1024
+
+
+@router.get(
+    path="/export",
+    status_code=200,
+    response_class=StreamingResponse,
+    responses={status.HTTP_200_OK: {"content": {"application/x-ndjson": {}}}}
+)
+async def export_posts(
+        since: datetime | None = Query(None),
+        after_id: int = Query(0, alias="afterId", ge=0)
+):
+    """
+    Every post as one JSON line in (createdAt, id) order. An incremental sync passes
+    the createdAt and id of the last line it got as since and afterId.
+    """
+    if since and since.tzinfo:
+        since = since.astimezone(timezone.utc)
+
+    async def lines():
+        chunk = bytearray()
+        async with UnitOfWork() as uow:
+            async for post in uow.posts.stream((since, after_id) if since else None):
+                chunk += orjson.dumps(jsonable_encoder(schemas.Post.from_orm(post))) + b"\n"
+                # the next batch is read only after the client took this chunk
+                if len(chunk) >= EXPORT_CHUNK:
+                    yield bytes(chunk)
+                    chunk.clear()
+            await uow.commit()
+        if chunk:
+            yield bytes(chunk)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 @router.get(
@@ -72,14 +343,47 @@ async def list_posts(
         status.HTTP_404_NOT_FOUND: {"model": ResponseSchema},
     }
 )
-async def get_post(post_id: int, response: Response):
+async def get_post(
+        post_id: int,
+        request: Request,
+        response: Response,
+        feed_cache: FeedCacheProtocol = Depends(),
+        views: ViewCounterProtocol = Depends()
+):
+    key = ("post", post_id)
+    entry = feed_cache.get(key)
+    if entry is None:
+        generation = feed_cache.generation
+        async with UnitOfWork() as uow:
+            post = await uow.posts.get(post_id)
+            await uow.commit()
+        if not post:
+            response.status_code = status.HTTP_404_NOT_FOUND
+            return ResponseSchema(message="post not found")
+        entry = feed_cache.set(key, orjson.dumps(jsonable_encoder(schemas.Post.from_orm(post))), generation)
+    views.hit(post_id)
+    return cached_response(request, entry)
+
+
+@router.get(
+    path="/{post_id}/status",
+    responses={
+        status.HTTP_200_OK: {"model": schemas.PostStatus},
+        status.HTTP_404_NOT_FOUND: {"model": ResponseSchema},
+    }
+)
+async def get_post_status(post_id: int, response: Response):
+    """Progress of a post published through the queue: processing, published or failed."""
     async with UnitOfWork() as uow:
-        post = await uow.posts.get(post_id)
+        found = await uow.posts.status(post_id)
         await uow.commit()
-    if not post:
+    if not found:
         response.status_code = status.HTTP_404_NOT_FOUND
         return ResponseSchema(message="post not found")
-    return post
+    post_status, job = found
+    return schemas.PostStatus(
+        id=post_id, status=post_status, attempts=job.attempts if job else 0, error=job.error if job else None
+    )
 
 
 @router.delete(
@@ -90,15 +394,14 @@ async def get_post(post_id: int, response: Response):
         status.HTTP_404_NOT_FOUND: {"model": ResponseSchema},
     }
 )
-async def delete_post(post_id: int, response: Response, gallery: GalleryProtocol = Depends()):
-    async with UnitOfWork() as uow:
-        post = await uow.posts.delete(post_id)
-        await uow.commit()
-
-    if not post:
+async def delete_post(
+        post_id: int,
+        response: Response,
+        gallery: GalleryProtocol = Depends(),
+        feed_cache: FeedCacheProtocol = Depends()
+):
+    if not await services.delete_post(post_id, gallery):
         response.status_code = status.HTTP_404_NOT_FOUND
         return ResponseSchema(message="post not found")
-
-    for pic in post.pictures:
-        gallery.delete(post.user_id, str(pic.id))
+    feed_cache.invalidate(post_id)
     return ResponseSchema(message="post deleted")
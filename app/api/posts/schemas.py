@@ -3,7 +3,7 @@ from datetime import datetime
 from uuid import UUID
 
 from fastapi import Form
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, root_validator
 
 
 class User(BaseModel):
@@ -25,9 +25,12 @@ class Picture(BaseModel):
     height: int
     width: int
     format: str
+    quality: int | None
+    near_duplicate_of: UUID | None = Field(alias="nearDuplicateOf")
 
     class Config:
         orm_mode = True
+        allow_population_by_field_name = True
 
 
 class Post(BaseModel):
@@ -37,12 +40,35 @@ class Post(BaseModel):
     user: User
     created_at: datetime = Field(alias="createdAt")
     pictures: list[Picture] = Field(default_factory=list)
+    # flushed every few seconds and cached with the post, so approximate
+    views: int = 0
 
     class Config:
         orm_mode = True
         allow_population_by_field_name = True
 
 
+class PostStatus(BaseModel):
+    id: int
+    status: str
+    attempts: int = 0
+    error: str | None = None
+
+
+class SearchHit(BaseModel):
+    post: Post
+    rank: float
+    snippet: str
+
+
+class SearchResults(BaseModel):
+    items: list[SearchHit]
+    next_cursor: str | None = Field(alias="nextCursor")
+
+    class Config:
+        allow_population_by_field_name = True
+
+
 class CropArea(BaseModel):
     height: int
     width: int
@@ -62,4 +88,41 @@ class CropArea(BaseModel):
     def validate_to_json(cls, value):
         if isinstance(value, str):
             return cls(**json.loads(value))
+        if isinstance(value, dict):
+            return cls(**value)
         return value
+
+
+class BatchPicture(BaseModel):
+    file: int | None = None
+    upload: str | None = None
+    area: CropArea
+    save_original: bool = Field(False, alias="saveOriginal")
+
+    @root_validator(skip_on_failure=True)
+    def one_source(cls, values):
+        if (values.get("file") is None) == (values.get("upload") is None):
+            raise ValueError("picture needs exactly one of file or upload")
+        return values
+
+    class Config:
+        allow_population_by_field_name = True
+
+
+class BatchPost(BaseModel):
+    title: str = ""
+    description: str = ""
+    pictures: list[BatchPicture]
+
+
+class BatchItem(BaseModel):
+    post_id: int | None = Field(alias="postId")
+    error: str | None
+
+    class Config:
+        orm_mode = True
+        allow_population_by_field_name = True
+
+
+class BatchResults(BaseModel):
+    items: list[BatchItem]
@@ -0,0 +1,37 @@
+import os
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.params import Query
+from starlette import status
+from starlette.responses import FileResponse, Response
+
+from app.adapters.sampler import PROFILER
+from app.api.profiling import schemas
+from app.api.schemas import ResponseSchema
+
+router = APIRouter(prefix="/profiling", tags=["Profiling"], include_in_schema=False)
+
+
+def authorize(x_profile: str | None = Header(None)):
+    if not PROFILER.authorized(x_profile):
+        raise HTTPException(status.HTTP_403_FORBIDDEN, "profiling token required")
+
+
+@router.post("/windows", status_code=202, response_model=schemas.Window, dependencies=[Depends(authorize)])
+async def start_window(seconds: float = Query(10, gt=0, le=300)):
+    return schemas.Window(id=PROFILER.window(seconds).id, seconds=seconds)
+
+
+@router.get("/{profile_id}", dependencies=[Depends(authorize)])
+async def get_profile(
+        profile_id: str,
+        response: Response,
+        format: Literal["collapsed", "speedscope"] = Query("speedscope")
+):
+    path = PROFILER.path(os.path.basename(profile_id), format)
+    if not os.path.exists(path):
+        response.status_code = status.HTTP_404_NOT_FOUND
+        return ResponseSchema(message="profile not found or still recording")
+    media_type = "application/json" if format == "speedscope" else "text/plain"
+    return FileResponse(path, media_type=media_type, filename=os.path.basename(path))
@@ -0,0 +1,38 @@
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.adapters.sampler import SamplingProfiler
+
+
+class SamplingProfilerMiddleware:
+    """
+    Profiles requests sent with `X-Profile: <token>` and answers with the id
+    of the profile in `X-Profile-Id`. While a time window is open every request
+    is registered, so the window's samples are attributed to routes.
+    """
+
+    def __init__(self, app: ASGIApp, profiler: SamplingProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        selected = self.profiler.authorized(Headers(scope=scope).get("x-profile"))
+        if not selected and not self.profiler.active:
+            await self.app(scope, receive, send)
+            return
+
+        profile = self.profiler.begin(scope, selected)
+
+        async def send_wrapper(message: Message):
+            if profile and message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.profiler.end(profile)
@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+
+
+class Window(BaseModel):
+    id: str
+    seconds: float
@@ -0,0 +1,35 @@
+import re
+import uuid
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.adapters import logs
+
+_VALID = re.compile(r"[\w\-.:]{1,64}")
+
+
+class RequestIdMiddleware:
+    """Tags the request's log records with X-Request-Id, taken from the proxy or generated, and echoes it."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = Headers(scope=scope).get("x-request-id")
+        value = incoming if incoming and _VALID.fullmatch(incoming) else uuid.uuid4().hex
+        token = logs.request_id.set(value)
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", value.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            logs.request_id.reset(token)
@@ -0,0 +1,131 @@
+from fastapi import APIRouter, Depends, Header
+from starlette import status
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect, Request
+from starlette.responses import Response
+
+from app.adapters.gallery import GalleryProtocol
+from app.adapters.uploads import parse_checksum
+from app.api.schemas import ResponseSchema
+from app.api.uploads import schemas
+from app.domain import exceptions
+
+router = APIRouter(prefix="/uploads", tags=["Uploads"])
+
+TUS_HEADERS = {"Tus-Resumable": "1.0.0", "Cache-Control": "no-store"}
+
+
+@router.post(
+    path="/",
+    status_code=status.HTTP_201_CREATED,
+    responses={
+        status.HTTP_201_CREATED: {"model": schemas.Upload},
+        status.HTTP_400_BAD_REQUEST: {"model": ResponseSchema},
+        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE: {"model": ResponseSchema},
+    }
+)
+async def create_upload(
+        response: Response,
+        upload_length: int = Header(..., ge=1),
+        upload_checksum: str | None = Header(None),
+        gallery: GalleryProtocol = Depends()
+):
+    try:
+        upload = gallery.uploads.create("0", upload_length, parse_checksum(upload_checksum))
+    except exceptions.UploadTooLarge:
+        response.status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        return ResponseSchema(message="upload is too large")
+    except exceptions.UploadChecksumMismatch:
+        response.status_code = status.HTTP_400_BAD_REQUEST
+        return ResponseSchema(message="unsupported checksum")
+    response.headers.update(TUS_HEADERS)
+    response.headers["Location"] = f"{router.prefix}/{upload.id}"
+    return schemas.Upload.from_orm(upload)
+
+
+@router.head(path="/{upload_id}")
+async def get_upload_offset(upload_id: str, gallery: GalleryProtocol = Depends()):
+    try:
+        upload = gallery.uploads.get("0", upload_id)
+    except exceptions.UploadNotFound:
+        return Response(status_code=status.HTTP_404_NOT_FOUND, headers=TUS_HEADERS)
+    return Response(headers={
+        **TUS_HEADERS, "Upload-Offset": str(upload.offset), "Upload-Length": str(upload.length)
+    })
+
+
+@router.patch(
+    path="/{upload_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    responses={
+        status.HTTP_404_NOT_FOUND: {"model": ResponseSchema},
+        status.HTTP_409_CONFLICT: {"model": ResponseSchema},
+        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE: {"model": ResponseSchema},
+        460: {"model": ResponseSchema},
+    }
+)
+async def append_upload(
+        upload_id: str,
+        request: Request,
+        response: Response,
+        upload_offset: int = Header(..., ge=0),
+        upload_checksum: str | None = Header(None),
+        gallery: GalleryProtocol = Depends()
+):
+    try:
+        checksum = parse_checksum(upload_checksum)
+        with gallery.uploads.writer("0", upload_id, upload_offset) as writer:
+            try:
+                async for chunk in request.stream():
+                    writer.write(chunk)
+            except exceptions.UploadTooLarge:
+                writer.abort()
+                raise
+            except ClientDisconnect:
+                # keep what arrived so the client resumes from there, unless it can't be verified
+                if checksum is None:
+                    await run_in_threadpool(writer.commit)
+                else:
+                    writer.abort()
+                raise
+            # fsync and the metadata write block, keep them off the event loop
+            offset = await run_in_threadpool(writer.commit, checksum)
+    except exceptions.UploadNotFound:
+        response.status_code = status.HTTP_404_NOT_FOUND
+        return ResponseSchema(message="upload not found")
+    except (exceptions.UploadOffsetMismatch, exceptions.UploadLocked):
+        response.status_code = status.HTTP_409_CONFLICT
+        return ResponseSchema(message="offset mismatch or upload in progress")
+    except exceptions.UploadTooLarge:
+        response.status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        return ResponseSchema(message="chunk exceeds upload length")
+    except exceptions.UploadChecksumMismatch:
+        response.status_code = 460
+        return ResponseSchema(message="checksum mismatch")
+
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers={**TUS_HEADERS, "Upload-Offset": str(offset)})
+
+
+@router.post(
+    path="/{upload_id}/finalize",
+    status_code=200,
+    responses={
+        status.HTTP_200_OK: {"model": schemas.Upload},
+        status.HTTP_404_NOT_FOUND: {"model": ResponseSchema},
+        status.HTTP_409_CONFLICT: {"model": ResponseSchema},
+        460: {"model": ResponseSchema},
+    }
+)
+async def finalize_upload(upload_id: str, response: Response, gallery: GalleryProtocol = Depends()):
+    try:
+        # hashes the whole upload when it was created with a checksum
+        return schemas.Upload.from_orm(await run_in_threadpool(gallery.uploads.finalize, "0", upload_id))
+    except exceptions.UploadNotFound:
+        response.status_code = status.HTTP_404_NOT_FOUND
+        return ResponseSchema(message="upload not found")
+    except exceptions.UploadIncomplete:
+        response.status_code = status.HTTP_409_CONFLICT
+        return ResponseSchema(message="upload is incomplete")
+    except exceptions.UploadChecksumMismatch:
+        response.status_code = 460
+        return ResponseSchema(message="checksum mismatch")
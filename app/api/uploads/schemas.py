@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+
+
+class Upload(BaseModel):
+    id: str
+    length: int
+    offset: int
+    finished: bool
+
+    class Config:
+        orm_mode = True
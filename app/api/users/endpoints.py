@@ -1,11 +1,77 @@
+import base64
+import binascii
 from datetime import datetime
 
-from fastapi import APIRouter, UploadFile, Depends
-from fastapi.params import Form, File, Query
-from app.api.posts import schemas
-from app.adapters.gallery import GalleryProtocol
+import orjson
+from fastapi import APIRouter
+from fastapi.params import Query
+from starlette import status
+from starlette.responses import Response
+
 from app.api.schemas import ResponseSchema
-from app.service_layer import dto, services
+from app.api.users import schemas
 from app.service_layer.unit_of_work import UnitOfWork
 
 router = APIRouter(prefix="/users", tags=["Users"])
+
+
+@router.get(
+    path="/{username}",
+    status_code=200,
+    responses={
+        status.HTTP_200_OK: {"model": schemas.Profile},
+        status.HTTP_404_NOT_FOUND: {"model": ResponseSchema},
+    }
+)
+async def get_profile(username: str, response: Response):
+    async with UnitOfWork() as uow:
+        user = await uow.users.get_by_username(username)
+        stats = user and await uow.user_stats.get(user.id)
+        await uow.commit()
+    if not user:
+        response.status_code = status.HTTP_404_NOT_FOUND
+        return ResponseSchema(message="user not found")
+    return schemas.Profile(
+        user=user,
+        posts=stats.posts if stats else 0,
+        pictures=stats.pictures if stats else 0,
+        storage_bytes=stats.storage_bytes if stats else 0
+    )
+
+
+@router.get(
+    path="/{username}/posts",
+    status_code=200,
+    responses={
+        status.HTTP_200_OK: {"model": schemas.UserPosts},
+        status.HTTP_400_BAD_REQUEST: {"model": ResponseSchema},
+        status.HTTP_404_NOT_FOUND: {"model": ResponseSchema},
+    }
+)
+async def list_user_posts(
+        username: str,
+        response: Response,
+        limit: int = Query(20, ge=1, le=100),
+        cursor: str | None = Query(None)
+):
+    before = None
+    if cursor:
+        try:
+            created_at, post_id = orjson.loads(base64.urlsafe_b64decode(cursor))
+            before = (datetime.fromisoformat(created_at), int(post_id))
+        except (binascii.Error, orjson.JSONDecodeError, TypeError, ValueError):
+            response.status_code = status.HTTP_400_BAD_REQUEST
+            return ResponseSchema(message="invalid cursor")
+
+    async with UnitOfWork() as uow:
+        user = await uow.users.get_by_username(username)
+        posts = user and await uow.posts.list_by_user(user.id, limit, before)
+        await uow.commit()
+    if not user:
+        response.status_code = status.HTTP_404_NOT_FOUND
+        return ResponseSchema(message="user not found")
+
+    next_cursor = None
+    if len(posts) == limit:
+        next_cursor = base64.urlsafe_b64encode(orjson.dumps([posts[-1].created_at, posts[-1].id])).decode()
+    return schemas.UserPosts(items=posts, next_cursor=next_cursor)
@@ -0,0 +1,21 @@
+from pydantic import BaseModel, Field
+
+from app.api.posts.schemas import Post, User
+
+
+class Profile(BaseModel):
+    user: User
+    posts: int
+    pictures: int
+    storage_bytes: int = Field(alias="storageBytes")
+
+    class Config:
+        allow_population_by_field_name = True
+
+
+class UserPosts(BaseModel):
+    items: list[Post]
+    next_cursor: str | None = Field(alias="nextCursor")
+
+    class Config:
+        allow_population_by_field_name = True
@@ -0,0 +1,69 @@
+from logging import getLogger
+
+from fastapi import FastAPI
+from starlette.middleware.cors import CORSMiddleware
+
+from app import api
+from app.adapters.gallery import Source
+from app.adapters.sampler import PROFILER
+from app.api.compression import CompressionMiddleware
+from app.api.metrics.middleware import MetricsMiddleware
+from app.api.metrics.profiler import SQLProfilerMiddleware
+from app.api.metrics.watchdog import WatchdogMiddleware
+from app.api.pictures.serving import mount_static
+from app.api.profiling.middleware import SamplingProfilerMiddleware
+from app.api.request_id import RequestIdMiddleware
+from app.config import Config
+from app.lifespan import lifespan as default_lifespan
+
+
+def create_app(lifespan=default_lifespan) -> FastAPI:
+    config = Config()
+    app = FastAPI(debug=False, lifespan=lifespan)
+
+    if config.compression.enabled:
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=config.compression.minimum_size,
+            gzip_level=config.compression.gzip_level,
+            brotli_quality=config.compression.brotli_quality
+        )
+    if config.profiling.sql:
+        app.add_middleware(
+            SQLProfilerMiddleware,
+            logger=getLogger("SQLProfiler"),
+            slow_request=config.profiling.slow_request,
+            repeated_statements=config.profiling.repeated_statements
+        )
+    if config.profiling.sampling_token:
+        PROFILER.configure(
+            config.profiling.sampling_token, config.profiling.sampling_interval, config.profiling.output_dir
+        )
+        app.add_middleware(SamplingProfilerMiddleware, profiler=PROFILER)
+    if config.watchdog.enabled:
+        app.add_middleware(WatchdogMiddleware)
+    if config.metrics.enabled:
+        app.add_middleware(MetricsMiddleware)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:5173"],
+        allow_credentials=True,
+        allow_methods=["PUT", "DELETE", "PATCH", "GET", "POST"],
+        allow_headers=["Cookie"],
+    )
+    app.add_middleware(RequestIdMiddleware)
+
+    app.include_router(api.authorization_router)
+    app.include_router(api.posts_router)
+    app.include_router(api.users_router)
+    app.include_router(api.pictures_router)
+    app.include_router(api.uploads_router)
+    if config.metrics.enabled:
+        app.include_router(api.metrics_router)
+    if config.profiling.sampling_token:
+        app.include_router(api.profiling_router)
+    if config.pictures.serving == "static":
+        mount_static(app, config.gallery.base_path, config.pictures.static_mount, list(Source))
+
+    return app
@@ -1,6 +1,6 @@
 import os
 from functools import cache
-from typing import Any
+from typing import Any, Literal
 
 import yaml
 from pydantic import BaseSettings, Field
@@ -38,9 +38,188 @@ class JWT(BaseSettings):
         env_prefix = 'ISS_'
 
 
+class Encoding(BaseSettings):
+    adaptive: bool = Field(default=False, env='ISS_ENCODING_ADAPTIVE')
+    quality: int = Field(default=95, env='ISS_ENCODING_QUALITY')
+    min_quality: int = Field(default=60, env='ISS_ENCODING_MIN_QUALITY')
+    ssim_threshold: float = Field(default=0.985, env='ISS_ENCODING_SSIM_THRESHOLD')
+    time_budget: float = Field(default=0.5, env='ISS_ENCODING_TIME_BUDGET')
+
+    class Config:
+        env_prefix = 'ISS_ENCODING_'
+
+
+class Gallery(BaseSettings):
+    base_path: str = Field(default='data', env='ISS_GALLERY_BASE_PATH')
+    max_upload_length: int = Field(default=512 * 1024 * 1024, env='ISS_GALLERY_MAX_UPLOAD_LENGTH')
+    upload_ttl: int = Field(default=60 * 60 * 24, env='ISS_GALLERY_UPLOAD_TTL')
+    cache_max_bytes: int = Field(default=64 * 1024 * 1024, env='ISS_GALLERY_CACHE_MAX_BYTES')
+    cache_max_item_bytes: int = Field(default=256 * 1024, env='ISS_GALLERY_CACHE_MAX_ITEM_BYTES')
+    cache_ttl: float = Field(default=300, env='ISS_GALLERY_CACHE_TTL')
+    encoding: Encoding = Encoding()
+
+    class Config:
+        env_prefix = 'ISS_GALLERY_'
+
+
+class Similarity(BaseSettings):
+    index_path: str = Field(default='data/phash.npy', env='ISS_SIMILARITY_INDEX_PATH')
+    radius: int = Field(default=8, env='ISS_SIMILARITY_RADIUS')
+
+    class Config:
+        env_prefix = 'ISS_SIMILARITY_'
+
+
+class Pictures(BaseSettings):
+    serving: Literal['app', 'x-accel-redirect', 'x-sendfile', 'static'] = Field(
+        default='app', env='ISS_PICTURES_SERVING'
+    )
+    accel_prefix: str = Field(default='/_pictures/', env='ISS_PICTURES_ACCEL_PREFIX')
+    static_mount: str = Field(default='/static/pictures/', env='ISS_PICTURES_STATIC_MOUNT')
+
+    class Config:
+        env_prefix = 'ISS_PICTURES_'
+
+
+class Logging(BaseSettings):
+    level: str = Field(default='INFO', env='ISS_LOGGING_LEVEL')
+    format: Literal['text', 'json'] = Field(default='text', env='ISS_LOGGING_FORMAT')
+    queue_size: int = Field(default=10_000, env='ISS_LOGGING_QUEUE_SIZE')
+    drop: Literal['newest', 'oldest'] = Field(default='newest', env='ISS_LOGGING_DROP')
+    # fraction of records below WARNING kept per logger prefix, e.g. {"uvicorn.access": 0.1}
+    sample: dict[str, float] = Field(default_factory=dict, env='ISS_LOGGING_SAMPLE')
+    sql: bool = Field(default=False, env='ISS_LOGGING_SQL')
+
+    class Config:
+        env_prefix = 'ISS_LOGGING_'
+
+
+class Metrics(BaseSettings):
+    # /metrics has no authentication, enable it where only the scraper can reach it
+    enabled: bool = Field(default=False, env='ISS_METRICS_ENABLED')
+
+    class Config:
+        env_prefix = 'ISS_METRICS_'
+
+
+class Profiling(BaseSettings):
+    sql: bool = Field(default=False, env='ISS_PROFILING_SQL')
+    slow_request: float = Field(default=0.5, env='ISS_PROFILING_SLOW_REQUEST')
+    repeated_statements: int = Field(default=5, env='ISS_PROFILING_REPEATED_STATEMENTS')
+    # the sampling profiler is installed only when a token is set
+    sampling_token: str | None = Field(default=None, env='ISS_PROFILING_SAMPLING_TOKEN')
+    sampling_interval: float = Field(default=0.005, env='ISS_PROFILING_SAMPLING_INTERVAL')
+    output_dir: str = Field(default='profiles', env='ISS_PROFILING_OUTPUT_DIR')
+
+    class Config:
+        env_prefix = 'ISS_PROFILING_'
+
+
+class Watchdog(BaseSettings):
+    enabled: bool = Field(default=True, env='ISS_WATCHDOG_ENABLED')
+    interval: float = Field(default=0.05, env='ISS_WATCHDOG_INTERVAL')
+    threshold: float = Field(default=0.1, env='ISS_WATCHDOG_THRESHOLD')
+    stack_limit: int = Field(default=12, env='ISS_WATCHDOG_STACK_LIMIT')
+
+    class Config:
+        env_prefix = 'ISS_WATCHDOG_'
+
+
+class Compression(BaseSettings):
+    enabled: bool = Field(default=True, env='ISS_COMPRESSION_ENABLED')
+    minimum_size: int = Field(default=1024, env='ISS_COMPRESSION_MINIMUM_SIZE')
+    gzip_level: int = Field(default=6, env='ISS_COMPRESSION_GZIP_LEVEL')
+    brotli_quality: int = Field(default=4, env='ISS_COMPRESSION_BROTLI_QUALITY')
+
+    class Config:
+        env_prefix = 'ISS_COMPRESSION_'
+
+
+class FeedCache(BaseSettings):
+    enabled: bool = Field(default=True, env='ISS_FEED_CACHE_ENABLED')
+    max_entries: int = Field(default=256, env='ISS_FEED_CACHE_MAX_ENTRIES')
+    ttl: float = Field(default=30, env='ISS_FEED_CACHE_TTL')
+
+    class Config:
+        env_prefix = 'ISS_FEED_CACHE_'
+
+
+class Admission(BaseSettings):
+    enabled: bool = Field(default=True, env='ISS_ADMISSION_ENABLED')
+    max_pixels: int = Field(default=200_000_000, env='ISS_ADMISSION_MAX_PIXELS')
+    max_image_pixels: int = Field(default=50_000_000, env='ISS_ADMISSION_MAX_IMAGE_PIXELS')
+    max_jobs: int = Field(default=4, env='ISS_ADMISSION_MAX_JOBS')
+    per_user: int = Field(default=2, env='ISS_ADMISSION_PER_USER')
+    queue_timeout: float = Field(default=0.5, env='ISS_ADMISSION_QUEUE_TIMEOUT')
+    retry_after: int = Field(default=1, env='ISS_ADMISSION_RETRY_AFTER')
+
+    class Config:
+        env_prefix = 'ISS_ADMISSION_'
+
+
+class Idempotency(BaseSettings):
+    ttl: int = Field(default=60 * 60 * 24, env='ISS_IDEMPOTENCY_TTL')
+    wait: float = Field(default=5, env='ISS_IDEMPOTENCY_WAIT')
+    lock_timeout: int = Field(default=120, env='ISS_IDEMPOTENCY_LOCK_TIMEOUT')
+
+    class Config:
+        env_prefix = 'ISS_IDEMPOTENCY_'
+
+
+class Jobs(BaseSettings):
+    publish_async: bool = Field(default=False, env='ISS_JOBS_PUBLISH_ASYNC')
+    workers: int = Field(default=1, env='ISS_JOBS_WORKERS')
+    poll_interval: float = Field(default=1, env='ISS_JOBS_POLL_INTERVAL')
+    max_attempts: int = Field(default=5, env='ISS_JOBS_MAX_ATTEMPTS')
+    retry_backoff: float = Field(default=10, env='ISS_JOBS_RETRY_BACKOFF')
+    lock_timeout: int = Field(default=600, env='ISS_JOBS_LOCK_TIMEOUT')
+
+    class Config:
+        env_prefix = 'ISS_JOBS_'
+
+
+class Views(BaseSettings):
+    enabled: bool = Field(default=True, env='ISS_VIEWS_ENABLED')
+    flush_interval: float = Field(default=5, env='ISS_VIEWS_FLUSH_INTERVAL')
+    max_pending: int = Field(default=10_000, env='ISS_VIEWS_MAX_PENDING')
+
+    class Config:
+        env_prefix = 'ISS_VIEWS_'
+
+
+class Server(BaseSettings):
+    host: str = Field(default='localhost', env='ISS_SERVER_HOST')
+    port: int = Field(default=8008, env='ISS_SERVER_PORT')
+    workers: int = Field(default=0, env='ISS_SERVER_WORKERS')
+    loop: Literal['auto', 'asyncio', 'uvloop'] = Field(default='auto', env='ISS_SERVER_LOOP')
+    http: Literal['auto', 'h11', 'httptools'] = Field(default='auto', env='ISS_SERVER_HTTP')
+    reuse_port: bool = Field(default=True, env='ISS_SERVER_REUSE_PORT')
+    backlog: int = Field(default=2048, env='ISS_SERVER_BACKLOG')
+    keep_alive: int = Field(default=5, env='ISS_SERVER_KEEP_ALIVE')
+    graceful_timeout: int = Field(default=30, env='ISS_SERVER_GRACEFUL_TIMEOUT')
+    limit_concurrency: int | None = Field(default=None, env='ISS_SERVER_LIMIT_CONCURRENCY')
+
+    class Config:
+        env_prefix = 'ISS_SERVER_'
+
+
 class _Config(BaseSettings):
     database: Database = Database()
     jwt: JWT = JWT()
+    gallery: Gallery = Gallery()
+    pictures: Pictures = Pictures()
+    similarity: Similarity = Similarity()
+    logging: Logging = Logging()
+    metrics: Metrics = Metrics()
+    profiling: Profiling = Profiling()
+    watchdog: Watchdog = Watchdog()
+    compression: Compression = Compression()
+    feed_cache: FeedCache = FeedCache()
+    admission: Admission = Admission()
+    idempotency: Idempotency = Idempotency()
+    jobs: Jobs = Jobs()
+    views: Views = Views()
+    server: Server = Server()
 
 
 @cache
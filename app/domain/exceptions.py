@@ -1,2 +1,49 @@
 class ImageNumberLimit(Exception):
     pass
+
+
+class UploadNotFound(Exception):
+    pass
+
+
+class UploadLocked(Exception):
+    pass
+
+
+class UploadOffsetMismatch(Exception):
+    pass
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UploadChecksumMismatch(Exception):
+    pass
+
+
+class UploadIncomplete(Exception):
+    pass
+
+
+class UnsupportedImageFormat(Exception):
+    pass
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class IdempotencyKeyInProgress(Exception):
+    pass
+
+
+class IdempotencyKeyMismatch(Exception):
+    pass
@@ -6,10 +6,11 @@ from datetime import datetime, timezone
 import sqlalchemy as sa
 
 from sqlalchemy.orm import Mapped
+from sqlalchemy.orm import column_property
 from sqlalchemy.orm import mapped_column
 from sqlalchemy.orm import relationship
 
-from app.adapters.orm import Base
+from app.adapters.orm import Base, UTCDateTime
 
 
 class User(Base):
@@ -20,7 +21,7 @@ class User(Base):
     email: Mapped[str] = mapped_column(sa.String(75), nullable=False)
     name: Mapped[str] = mapped_column(sa.String(50), nullable=True)
     bio: Mapped[str] = mapped_column(sa.String(500), nullable=True)
-    registered_at: Mapped[datetime] = mapped_column(sa.DateTime(timezone=True), default=sa.func.now(tz='UTC'))
+    registered_at: Mapped[datetime] = mapped_column(UTCDateTime(), default=sa.func.now(tz='UTC'))
     posts: Mapped[list[Post]] = relationship(
         back_populates="user",
         cascade="all, delete",
@@ -40,9 +41,13 @@ class Post(Base):
     title: Mapped[str] = mapped_column(sa.String(25), nullable=False)
     description: Mapped[str] = mapped_column(sa.String(500), nullable=True)
     created_at: Mapped[datetime] = mapped_column(
-        sa.DateTime(timezone=True), default=sa.func.now(tz='UTC')
+        UTCDateTime(), default=sa.func.now(tz='UTC')
     )
     user_id: Mapped[int] = mapped_column(sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    # processing and failed posts have no pictures yet, so the inner joins on pictures hide them
+    status: Mapped[str] = mapped_column(
+        sa.String(10), nullable=False, default="published", server_default="published"
+    )
     pictures: Mapped[list[Picture]] = relationship(
         cascade="all, delete",
         lazy='noload',
@@ -53,6 +58,57 @@ class Post(Base):
         lazy='noload',
         innerjoin=True
     )
+    __table_args__ = (
+        sa.Index("ix-posts-user_id.created_at", "user_id", sa.desc("created_at")),
+        sa.Index("ix-posts-created_at.id", "created_at", "id"),
+    )
+
+
+# Full-text search over title and description lives outside the mapped columns:
+# a generated tsvector column with a GIN index on PostgreSQL (see migrations)
+# and an external-content FTS5 table kept in sync by triggers on SQLite.
+SEARCH_CONFIG = "russian"
+
+_search_ddl = {
+    "postgresql": [
+        f"""
+        ALTER TABLE posts ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')
+        ) STORED
+        """,
+        'CREATE INDEX "ix-posts-search_vector" ON posts USING gin (search_vector)',
+    ],
+    "sqlite": [
+        """
+        CREATE VIRTUAL TABLE posts_fts USING fts5(
+            title, description, content='posts', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER posts_fts_insert AFTER INSERT ON posts BEGIN
+            INSERT INTO posts_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+        END
+        """,
+        """
+        CREATE TRIGGER posts_fts_delete AFTER DELETE ON posts BEGIN
+            INSERT INTO posts_fts (posts_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+        """,
+        """
+        CREATE TRIGGER posts_fts_update AFTER UPDATE ON posts BEGIN
+            INSERT INTO posts_fts (posts_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO posts_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+        END
+        """,
+    ],
+}
+
+for _dialect, _statements in _search_ddl.items():
+    for _statement in _statements:
+        sa.event.listen(Post.__table__, "after_create", sa.DDL(_statement).execute_if(dialect=_dialect))
 
 
 class Picture(Base):
@@ -63,14 +119,78 @@ class Picture(Base):
     size: Mapped[int] = mapped_column(nullable=False)
     height: Mapped[int] = mapped_column(nullable=False)
     width: Mapped[int] = mapped_column(nullable=False)
+    quality: Mapped[int] = mapped_column(nullable=True)
+    phash: Mapped[int] = mapped_column(sa.BigInteger, nullable=True)
+    # closest picture in the similarity index at upload time, kept as a hint when that picture is deleted
+    near_duplicate_of: Mapped[uuid.UUID] = mapped_column(sa.UUID(as_uuid=True), nullable=True)
     post_id: Mapped[int] = mapped_column(sa.ForeignKey("posts.id", ondelete="CASCADE"), nullable=False)
 
 
+class UserStats(Base):
+    __tablename__ = "user_stats"
+
+    user_id: Mapped[int] = mapped_column(sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    posts: Mapped[int] = mapped_column(nullable=False, default=0)
+    pictures: Mapped[int] = mapped_column(nullable=False, default=0)
+    storage_bytes: Mapped[int] = mapped_column(sa.BigInteger, nullable=False, default=0)
+
+
+class PostViews(Base):
+    __tablename__ = "post_views"
+
+    post_id: Mapped[int] = mapped_column(sa.ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    views: Mapped[int] = mapped_column(sa.BigInteger, nullable=False, default=0)
+
+
+# read-only view of the counter, written only by the batched flush in ViewCounter
+Post.views = column_property(sa.func.coalesce(
+    sa.select(PostViews.views).where(PostViews.post_id == Post.id).correlate_except(PostViews).scalar_subquery(), 0
+))
+
+
+class IdempotencyKey(Base):
+    """Result of a request sent with an Idempotency-Key; status_code is NULL while it is in progress."""
+    __tablename__ = "idempotency_keys"
+
+    user_id: Mapped[int] = mapped_column(sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    key: Mapped[str] = mapped_column(sa.String(255), primary_key=True)
+    fingerprint: Mapped[str] = mapped_column(sa.String(64), nullable=False)
+    status_code: Mapped[int] = mapped_column(nullable=True)
+    body: Mapped[bytes] = mapped_column(sa.LargeBinary, nullable=True)
+    headers: Mapped[dict] = mapped_column(sa.JSON, nullable=True)
+    locked_at: Mapped[datetime] = mapped_column(UTCDateTime(), nullable=False)
+    expire_at: Mapped[datetime] = mapped_column(UTCDateTime(), nullable=False)
+    __table_args__ = (
+        sa.Index("ix-idempotency_keys-expire_at", "expire_at"),
+    )
+
+
+class Job(Base):
+    """Background work claimed by the workers once run_at has passed; finished jobs are deleted."""
+    __tablename__ = "jobs"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kind: Mapped[str] = mapped_column(sa.String(50), nullable=False)
+    payload: Mapped[dict] = mapped_column(sa.JSON, nullable=False)
+    post_id: Mapped[int] = mapped_column(sa.ForeignKey("posts.id", ondelete="CASCADE"), nullable=True)
+    status: Mapped[str] = mapped_column(sa.String(10), nullable=False, default="queued")
+    attempts: Mapped[int] = mapped_column(nullable=False, default=0)
+    max_attempts: Mapped[int] = mapped_column(nullable=False)
+    error: Mapped[str] = mapped_column(sa.Text, nullable=True)
+    run_at: Mapped[datetime] = mapped_column(UTCDateTime(), nullable=False)
+    locked_at: Mapped[datetime] = mapped_column(UTCDateTime(), nullable=True)
+    locked_by: Mapped[str] = mapped_column(sa.String(100), nullable=True)
+    __table_args__ = (
+        sa.Index("ix-jobs-status.run_at", "status", "run_at"),
+        sa.Index("ix-jobs-post_id", "post_id"),
+    )
+
+
 class VerifyCode(Base):
     __tablename__ = "verify_codes"
 
     email: Mapped[str] = mapped_column(primary_key=True)
     code: Mapped[str] = mapped_column(sa.String(length=4))
     expire_at: Mapped[datetime] = mapped_column(
-        sa.DateTime(timezone=True), default=sa.func.now(tz='UTC')
+        UTCDateTime(), default=sa.func.now(tz='UTC')
     )
@@ -1,27 +1,118 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from logging import getLogger
 
 from fastapi import FastAPI
 
+from app.adapters import metrics, sql_profiler
+from app.adapters.admission import AdmissionController, AdmissionProtocol, NoAdmission
+from app.adapters.encoding import AdaptiveJPEGEncoder, JPEGEncoder
+from app.adapters.feed_cache import FeedCache, FeedCacheProtocol, NoFeedCache
 from app.adapters.security import JWTCookie, JWTCookieProtocol
 from app.adapters.gallery import Gallery, GalleryProtocol
 from app.adapters.gmail import GmailProvider
 from app.adapters.mailer import Mailer, MailerProtocol
-from app.config import Config
+from app.adapters.picture_cache import PictureCache
+from app.adapters.similarity import SimilarityIndex
+from app.adapters.watchdog import LoopWatchdog
+from app.adapters.view_counter import NoViewCounter, ViewCounter, ViewCounterProtocol
+from app.api.pictures import serving
+from app.config import Config, _Config
+from app.service_layer import services
+from app.service_layer.idempotency import Idempotency, IdempotencyProtocol
+from app.service_layer.queue import NoPublishQueue, PublishQueue, PublishQueueProtocol
+from app.service_layer.unit_of_work import ASYNC_ENGINE
+
+
+def build_gallery(config: _Config) -> Gallery:
+    encoding = config.gallery.encoding
+    if encoding.adaptive:
+        encoder = AdaptiveJPEGEncoder(
+            min_quality=encoding.min_quality,
+            max_quality=encoding.quality,
+            threshold=encoding.ssim_threshold,
+            time_budget=encoding.time_budget
+        )
+    else:
+        encoder = JPEGEncoder(encoding.quality)
+    similar = SimilarityIndex(config.similarity.index_path, config.similarity.radius)
+    getLogger("SimilarityIndex").info("loaded %d picture hashes", similar.load())
+    return Gallery(
+        getLogger("Gallery"),
+        config.gallery.base_path,
+        encoder,
+        config.gallery.max_upload_length,
+        PictureCache(config.gallery.cache_max_bytes, config.gallery.cache_max_item_bytes, config.gallery.cache_ttl),
+        similar
+    )
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     config = Config()
+    if config.metrics.enabled:
+        metrics.instrument_engine(ASYNC_ENGINE)
+    if config.profiling.sql:
+        sql_profiler.instrument_engine(ASYNC_ENGINE)
     mail_provider = GmailProvider(getLogger("GmailProvider"))
     mailer = Mailer(getLogger("Mailer"), mail_provider)
-    gallery = Gallery(getLogger("Gallery"), "data")
+    gallery = build_gallery(config)
+    if config.feed_cache.enabled:
+        feed_cache = FeedCache(
+            config.feed_cache.max_entries,
+            config.feed_cache.ttl,
+            config.compression.gzip_level,
+            config.compression.brotli_quality
+        )
+    else:
+        feed_cache = NoFeedCache()
+    if config.admission.enabled:
+        admission = AdmissionController(
+            max_pixels=config.admission.max_pixels,
+            max_image_pixels=config.admission.max_image_pixels,
+            max_jobs=config.admission.max_jobs,
+            per_user=config.admission.per_user,
+            queue_timeout=config.admission.queue_timeout,
+            retry_after=config.admission.retry_after
+        )
+    else:
+        admission = NoAdmission()
+    if config.views.enabled:
+        view_counter = ViewCounter(services.record_views, config.views.flush_interval, config.views.max_pending)
+    else:
+        view_counter = NoViewCounter()
+    send_picture = serving.sender(
+        config.pictures.serving, config.pictures.accel_prefix, config.pictures.static_mount
+    )
     jwt_cookie = JWTCookie(config.jwt.secret, config.jwt.alg)
+    idempotency = Idempotency(config.idempotency.ttl, config.idempotency.wait, config.idempotency.lock_timeout)
+    if config.jobs.publish_async:
+        publish_queue = PublishQueue(config.jobs.max_attempts)
+    else:
+        publish_queue = NoPublishQueue()
 
     app.dependency_overrides = {
         GalleryProtocol: lambda: gallery,
+        FeedCacheProtocol: lambda: feed_cache,
+        AdmissionProtocol: lambda: admission,
+        ViewCounterProtocol: lambda: view_counter,
+        IdempotencyProtocol: lambda: idempotency,
+        PublishQueueProtocol: lambda: publish_queue,
+        serving.PictureSenderProtocol: lambda: send_picture,
         MailerProtocol: lambda: mailer,
         JWTCookieProtocol: lambda: jwt_cookie,
         JWTCookie: jwt_cookie
     }
+    if config.watchdog.enabled:
+        watchdog = LoopWatchdog(
+            getLogger("LoopWatchdog"), config.watchdog.interval, config.watchdog.threshold, config.watchdog.stack_limit
+        )
+        watchdog.start()
+    flusher = asyncio.create_task(view_counter.run())
     yield
+    if config.watchdog.enabled:
+        await watchdog.stop()
+    flusher.cancel()
+    with suppress(asyncio.CancelledError):
+        await flusher
+    await view_counter.flush()
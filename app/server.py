@@ -0,0 +1,122 @@
+"""
+Multi-worker runner, configured by the server group of Config:
+
+    python -m app
+
+Every worker is a spawned process with its own event loop, engine pool and
+caches. With reuse_port each worker binds its own SO_REUSEPORT socket and the
+kernel balances connections between them, otherwise the supervisor binds one
+socket that all workers accept from. SIGTERM stops accepting, lets in-flight
+requests (uploads included) finish within graceful_timeout and then exits.
+"""
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+from logging import getLogger
+from multiprocessing.connection import wait
+
+import uvicorn
+
+from app.adapters import logs
+from app.config import Config, Server
+
+STARTUP_FAILURE = 3
+
+logger = getLogger("Server")
+
+
+def bind(config: Server, reuse_port: bool) -> socket.socket:
+    family = socket.AF_INET6 if ":" in config.host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((config.host, config.port))
+    sock.set_inheritable(True)
+    return sock
+
+
+def uvicorn_config(config: Server) -> uvicorn.Config:
+    return uvicorn.Config(
+        "app.application:create_app",
+        factory=True,
+        loop=config.loop,
+        http=config.http,
+        backlog=config.backlog,
+        timeout_keep_alive=config.keep_alive,
+        timeout_graceful_shutdown=config.graceful_timeout,
+        limit_concurrency=config.limit_concurrency,
+        # uvicorn's loggers propagate to the root queue handler set up by logs.setup
+        log_config=None
+    )
+
+
+def _worker(config: Server, sock: socket.socket | None):
+    logs.setup(Config().logging)
+    if sock is None:
+        sock = bind(config, reuse_port=True)
+    server = uvicorn.Server(uvicorn_config(config))
+    server.run(sockets=[sock])
+    if not server.started:
+        sys.exit(STARTUP_FAILURE)
+
+
+def serve(config: Server):
+    workers = config.workers or os.cpu_count() or 1
+    reuse_port = config.reuse_port and hasattr(socket, "SO_REUSEPORT")
+
+    if workers == 1:
+        _worker(config, bind(config, reuse_port))
+        return
+
+    shared = None if reuse_port else bind(config, reuse_port=False)
+    context = multiprocessing.get_context("spawn")
+    processes: list[multiprocessing.Process] = []
+    should_exit = False
+
+    def start() -> multiprocessing.Process:
+        process = context.Process(target=_worker, args=(config, shared), daemon=False)
+        process.start()
+        return process
+
+    def handle_exit(sig, frame):
+        nonlocal should_exit
+        should_exit = True
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, handle_exit)
+
+    logger.info(
+        "starting %d workers on %s:%d (%s)",
+        workers, config.host, config.port, "SO_REUSEPORT" if reuse_port else "shared socket"
+    )
+    processes.extend(start() for _ in range(workers))
+
+    while not should_exit:
+        wait([p.sentinel for p in processes], timeout=0.5)
+        for i, process in enumerate(processes):
+            if process.exitcode == STARTUP_FAILURE:
+                # restarting would fail the same way, take the whole server down instead
+                logger.error("worker %d failed to start, shutting down", process.pid)
+                should_exit = True
+            elif process.exitcode is not None and not should_exit:
+                logger.warning("worker %d exited with %s, restarting", process.pid, process.exitcode)
+                processes[i] = start()
+
+    logger.info("draining workers, graceful timeout %ds", config.graceful_timeout)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join(config.graceful_timeout + 5)
+        if process.is_alive():
+            logger.error("worker %d did not stop in time, killing", process.pid)
+            process.kill()
+            process.join()
+
+
+def main():
+    logs.setup(Config().logging)
+    serve(Config().server)
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import BinaryIO
 
 
 @dataclass
@@ -8,9 +9,32 @@ class NewPicture:
     save_original: bool
 
 
+@dataclass
+class PictureSource:
+    """A picture of a post request: an uploaded file, or the id of a finished resumable upload."""
+    crop_box: tuple[int, int, int, int]
+    save_original: bool
+    file: BinaryIO | None = None
+    upload_id: str | None = None
+
+
+@dataclass
+class StagedPicture:
+    """A picture waiting in upload storage for an image worker."""
+    upload_id: str
+    crop_box: tuple[int, int, int, int]
+    save_original: bool
+
+
 @dataclass
 class NewPost:
     user_id: int
     title: str
     description: str
     pictures: list[NewPicture]
+
+
+@dataclass
+class Published:
+    post_id: int | None = None
+    error: str | None = None
@@ -0,0 +1,128 @@
+import asyncio
+import hashlib
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Protocol
+
+import orjson
+
+from app.domain import exceptions
+from app.service_layer.unit_of_work import UnitOfWork
+
+
+@dataclass
+class StoredResponse:
+    status_code: int
+    body: bytes
+    headers: dict[str, str] = field(default_factory=dict)
+    # the response of an earlier request with the same key
+    replayed: bool = False
+
+
+def fingerprint(*parts) -> str:
+    """What a key is bound to: a reused key must come with the same request."""
+    return hashlib.sha256(orjson.dumps(parts)).hexdigest()
+
+
+@dataclass
+class Lease:
+    """Ownership of a key from claim() until complete() or release()."""
+    user_id: int
+    key: str
+    token: datetime
+
+
+class IdempotencyProtocol(Protocol):
+    async def run(
+            self, user_id: int, key: str, fingerprint: str, call: Callable[[], Awaitable[StoredResponse]]
+    ) -> StoredResponse:
+        raise NotImplementedError
+
+    async def claim(self, user_id: int, key: str, fingerprint: str) -> Lease | StoredResponse:
+        raise NotImplementedError
+
+    async def complete(self, lease: Lease, status_code: int, body: bytes, headers: dict[str, str]):
+        raise NotImplementedError
+
+    async def release(self, lease: Lease):
+        raise NotImplementedError
+
+
+class Idempotency:
+    """
+    Keys are claimed in the database, so duplicates are caught across workers.
+
+    run() wraps a request in the steps below.
+    claim() gives the first request a Lease; it then runs and stores its response
+    (with the headers a client acts on, such as Location) with complete(), or
+    release()s the key when the client should retry.
+    A duplicate waits up to `wait` seconds for that response and gets it back,
+    or IdempotencyKeyInProgress. A key reused for a different request raises
+    IdempotencyKeyMismatch. A claim left by a crashed worker can be taken
+    over after lock_timeout seconds; the lease of the old owner then no longer
+    matches, so its complete() and release() leave the new claim alone.
+    """
+
+    def __init__(self, ttl: int = 60 * 60 * 24, wait: float = 5, lock_timeout: int = 120, poll: float = 0.05):
+        self.ttl = ttl
+        self.wait = wait
+        self.lock_timeout = lock_timeout
+        self.poll = poll
+
+    async def run(
+            self, user_id: int, key: str, fingerprint: str, call: Callable[[], Awaitable[StoredResponse]]
+    ) -> StoredResponse:
+        """
+        call() once per key: its response is stored when it succeeded (below 400)
+        and replayed to duplicates. A failed call releases the key for a retry.
+        """
+        claimed = await self.claim(user_id, key, fingerprint)
+        if isinstance(claimed, StoredResponse):
+            return replace(claimed, replayed=True)
+        try:
+            result = await call()
+        except BaseException:
+            await self.release(claimed)
+            raise
+        if result.status_code < 400:
+            # call() returns only once its effect is committed, failures raise above
+            await self.complete(claimed, result.status_code, result.body, result.headers)
+        else:
+            # nothing was done (an unfinished upload, load shedding), a retry runs the request again
+            await self.release(claimed)
+        return result
+
+    async def claim(self, user_id: int, key: str, fingerprint: str) -> Lease | StoredResponse:
+        deadline = asyncio.get_running_loop().time() + self.wait
+        poll = self.poll
+        while True:
+            now = datetime.now(timezone.utc)
+            async with UnitOfWork() as uow:
+                token = await uow.idempotency_keys.claim(
+                    user_id, key, fingerprint, now,
+                    now + timedelta(seconds=self.ttl), now - timedelta(seconds=self.lock_timeout)
+                )
+                stored = None if token else await uow.idempotency_keys.get(user_id, key)
+                await uow.commit()
+            if token:
+                return Lease(user_id, key, token)
+            if stored is not None:
+                if stored.fingerprint != fingerprint:
+                    raise exceptions.IdempotencyKeyMismatch()
+                if stored.status_code is not None:
+                    return StoredResponse(stored.status_code, stored.body, stored.headers or {})
+            # the owner is still working, or released the key between our two statements
+            if asyncio.get_running_loop().time() + poll > deadline:
+                raise exceptions.IdempotencyKeyInProgress()
+            await asyncio.sleep(poll)
+            poll = min(poll * 2, 0.5)
+
+    async def complete(self, lease: Lease, status_code: int, body: bytes, headers: dict[str, str]):
+        async with UnitOfWork() as uow:
+            await uow.idempotency_keys.complete(lease.user_id, lease.key, lease.token, status_code, body, headers)
+            await uow.commit()
+
+    async def release(self, lease: Lease):
+        async with UnitOfWork() as uow:
+            await uow.idempotency_keys.delete(lease.user_id, lease.key, lease.token)
+            await uow.commit()
@@ -0,0 +1,94 @@
+import asyncio
+import os
+from datetime import datetime, timezone
+from logging import getLogger
+
+from app.adapters.similarity import SimilarityIndex
+from app.adapters.uploads import UploadStorage
+from app.config import Config
+from app.domain import models
+from app.service_layer.unit_of_work import UnitOfWork
+
+logger = getLogger("jobs")
+
+
+async def repair_user_stats(batch: int = 1000) -> int:
+    """Recompute user_stats from posts and pictures, batch by batch of users, and fix drifted rows."""
+    repaired, from_user_id = 0, 0
+    while True:
+        async with UnitOfWork() as uow:
+            actual = await uow.user_stats.actual(from_user_id, batch)
+            if not actual:
+                break
+            stored = await uow.user_stats.list([row[0] for row in actual])
+            for user_id, posts, pictures, storage_bytes in actual:
+                stats = stored.get(user_id)
+                if stats is None:
+                    stats = models.UserStats(user_id=user_id)
+                    uow.session.add(stats)
+                elif (stats.posts, stats.pictures, stats.storage_bytes) == (posts, pictures, storage_bytes):
+                    continue
+                logger.warning(
+                    "user %d stats drifted: posts %s -> %d, pictures %s -> %d, storage %s -> %d",
+                    user_id, stats.posts, posts, stats.pictures, pictures, stats.storage_bytes, storage_bytes
+                )
+                stats.posts, stats.pictures, stats.storage_bytes = posts, pictures, storage_bytes
+                repaired += 1
+            await uow.commit()
+        from_user_id = actual[-1][0] + 1
+    return repaired
+
+
+def expire_uploads() -> int:
+    config = Config().gallery
+    storage = UploadStorage(os.path.join(os.path.abspath(config.base_path), "uploads"), config.max_upload_length)
+    return storage.expire(config.upload_ttl)
+
+
+async def build_similarity_index(path: str, batch: int = 10000) -> int:
+    """Snapshot every picture hash into the file the workers memory-map at startup."""
+    rows, after = [], None
+    while True:
+        async with UnitOfWork() as uow:
+            hashes = await uow.pictures.hashes(after, batch)
+        if not hashes:
+            break
+        rows.extend(hashes)
+        after = hashes[-1][1]
+    SimilarityIndex.save(path, rows)
+    return len(rows)
+
+
+async def expire_idempotency_keys(batch: int = 1000) -> int:
+    expired = 0
+    while True:
+        async with UnitOfWork() as uow:
+            deleted = await uow.idempotency_keys.expire(datetime.now(timezone.utc), batch)
+            await uow.commit()
+        expired += deleted
+        if deleted < batch:
+            return expired
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.adapters import logs
+
+    parser = argparse.ArgumentParser(prog="python -m app.service_layer.jobs")
+    parser.add_argument("job", choices=[
+        "repair-user-stats", "expire-uploads", "build-similarity-index", "expire-idempotency-keys"
+    ])
+    args = parser.parse_args()
+
+    logs.setup(Config().logging)
+    if args.job == "repair-user-stats":
+        logger.info("repaired %d user_stats rows", asyncio.run(repair_user_stats()))
+    elif args.job == "expire-uploads":
+        logger.info("expired %d uploads", expire_uploads())
+    elif args.job == "build-similarity-index":
+        logger.info("indexed %d picture hashes", asyncio.run(
+            build_similarity_index(Config().similarity.index_path)
+        ))
+    elif args.job == "expire-idempotency-keys":
+        logger.info("expired %d idempotency keys", asyncio.run(expire_idempotency_keys()))
@@ -0,0 +1,134 @@
+"""
+Durable job queue on the jobs table.
+
+Requests insert a job in the transaction that creates its subject (the post),
+so nothing is lost between the two. Image workers (see worker.py) claim due
+jobs with UPDATE ... FOR UPDATE SKIP LOCKED and delete them once done. A job
+that raises is queued again after retry_backoff * 2^(attempt - 1) seconds, up
+to max_attempts; then, or at once for the handler's permanent errors, it is
+kept as failed and the handler's failed callback runs. Jobs of a worker that
+died stay running until lock_timeout, then they are released.
+"""
+import asyncio
+import os
+import socket
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from logging import Logger
+from typing import Awaitable, Callable, Protocol
+
+from app.service_layer.unit_of_work import UnitOfWork
+
+
+class PublishQueueProtocol(Protocol):
+    """Whether posts go through the queue (services.enqueue_post) and how often their job is tried."""
+    enabled: bool
+    max_attempts: int
+
+
+class PublishQueue:
+    enabled = True
+
+    def __init__(self, max_attempts: int = 5):
+        self.max_attempts = max_attempts
+
+
+class NoPublishQueue:
+    """Posts are published within the request."""
+    enabled = False
+    max_attempts = 0
+
+
+@dataclass
+class Handler:
+    run: Callable[[dict], Awaitable[None]]
+    failed: Callable[[dict], Awaitable[None]]
+    # not worth retrying, e.g. an unsupported image
+    permanent: tuple[type[Exception], ...] = ()
+
+
+class JobWorker:
+    def __init__(
+            self,
+            logger: Logger,
+            handlers: dict[str, Handler],
+            poll_interval: float = 1,
+            retry_backoff: float = 10,
+            lock_timeout: int = 600,
+            name: str | None = None
+    ):
+        self.logger = logger
+        self.handlers = handlers
+        self.poll_interval = poll_interval
+        self.retry_backoff = retry_backoff
+        self.lock_timeout = lock_timeout
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self._stopping = asyncio.Event()
+
+    def stop(self):
+        """The job in progress is finished first."""
+        self._stopping.set()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        release_at = loop.time()
+        while not self._stopping.is_set():
+            try:
+                if loop.time() >= release_at:
+                    await self.release_stale()
+                    release_at = loop.time() + self.lock_timeout / 4
+                if await self.run_once():
+                    continue
+            except Exception:
+                self.logger.exception("job queue is unavailable")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_once(self) -> bool:
+        """Run one due job, False when there is none."""
+        async with UnitOfWork() as uow:
+            jobs = await uow.jobs.acquire(list(self.handlers), self.name, datetime.now(timezone.utc))
+            await uow.commit()
+        if not jobs:
+            return False
+        job = jobs[0]
+        handler = self.handlers[job.kind]
+        started = time.perf_counter()
+        try:
+            await handler.run(job.payload)
+        except Exception as e:
+            await self._failed(job, handler, e)
+            return True
+        async with UnitOfWork() as uow:
+            await uow.jobs.finish(job.id)
+            await uow.commit()
+        self.logger.info("job %d %s done in %.3fs", job.id, job.kind, time.perf_counter() - started)
+        return True
+
+    async def release_stale(self) -> int:
+        async with UnitOfWork() as uow:
+            jobs = await uow.jobs.requeue_stale(datetime.now(timezone.utc) - timedelta(seconds=self.lock_timeout))
+            await uow.commit()
+        for job in jobs:
+            self.logger.warning("job %d %s was abandoned by its worker, %s", job.id, job.kind, job.status)
+            if job.status == "failed":
+                await self.handlers[job.kind].failed(job.payload)
+        return len(jobs)
+
+    async def _failed(self, job, handler: Handler, error: Exception):
+        message = f"{type(error).__name__}: {error}"
+        if isinstance(error, handler.permanent) or job.attempts >= job.max_attempts:
+            self.logger.error("job %d %s failed after %d attempts: %s", job.id, job.kind, job.attempts, message)
+            async with UnitOfWork() as uow:
+                await uow.jobs.fail(job.id, message)
+                await uow.commit()
+            await handler.failed(job.payload)
+            return
+        delay = self.retry_backoff * 2 ** (job.attempts - 1)
+        self.logger.warning("job %d %s failed, retrying in %.0fs: %s", job.id, job.kind, delay, message)
+        async with UnitOfWork() as uow:
+            await uow.jobs.retry(job.id, message, datetime.now(timezone.utc) + timedelta(seconds=delay))
+            await uow.commit()
@@ -1,46 +1,281 @@
 import datetime
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from dataclasses import asdict
+from typing import BinaryIO, Iterator
 from random import randint
 from uuid import uuid4
 
-from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
 
+from app.adapters import metrics
+from app.adapters.admission import AdmissionProtocol
 from app.adapters.gallery import GalleryProtocol
 from app.adapters.mailer import MailerProtocol
-from app.domain import models
-from app.service_layer.dto import NewPost
+from app.domain import exceptions, models
+from app.service_layer.dto import NewPicture, NewPost, PictureSource, Published, StagedPicture
 from app.service_layer.unit_of_work import UnitOfWork
 
 
+def _process_pictures(new_post: NewPost, gallery: GalleryProtocol) -> list[dict]:
+    # reject the whole post from headers alone before anything is decoded or written
+    for p in new_post.pictures:
+        gallery.probe(p.file_bytes)
+
+    pictures = []
+    try:
+        for p in new_post.pictures:
+            with gallery(p.file_bytes, str(new_post.user_id)) as im:
+                im.crop(p.crop_box)
+                im.convert()
+                phash = im.phash()
+                im.resize()
+                picture_id = im.save(p.save_original)
+                pictures.append(dict(
+                    id=picture_id,
+                    format=im.format,
+                    height=im.height,
+                    width=im.width,
+                    size=im.size,
+                    quality=im.quality,
+                    phash=phash,
+                    near_duplicate_of=gallery.similar.nearest(phash)
+                ))
+                if pictures[-1]["near_duplicate_of"]:
+                    metrics.PICTURE_NEAR_DUPLICATES.inc()
+    except Exception:
+        for picture in pictures:
+            gallery.delete(str(new_post.user_id), str(picture["id"]))
+        raise
+    return pictures
+
+
+def _index_pictures(pictures: list[dict], gallery: GalleryProtocol):
+    for picture in pictures:
+        gallery.similar.add(picture["phash"], picture["id"])
+
+
 async def publish_post(new_post: NewPost, gallery: GalleryProtocol):
+    pictures = _process_pictures(new_post, gallery)
     post = models.Post(
         user_id=new_post.user_id,
         title=new_post.title,
         description=new_post.description,
-        pictures=[]
+        pictures=[models.Picture(**p) for p in pictures]
     )
 
-    for p in new_post.pictures:
-        with gallery(p.file_bytes, str(new_post.user_id)) as im:
-            im.crop(p.crop_box)
-            im.convert()
-            im.resize()
-            picture_id = im.save(p.save_original)
-            post.pictures.append(models.Picture(
-                id=picture_id,
-                format=im.format,
-                height=im.height,
-                width=im.width,
-                size=im.size
-            ))
+    try:
+        async with UnitOfWork() as uow:
+            uow.posts.add(post)
+            await uow.user_stats.increment(
+                new_post.user_id, 1, len(post.pictures), sum(p.size for p in post.pictures)
+            )
+            await uow.commit()
+    except Exception:
+        for picture in pictures:
+            gallery.delete(str(new_post.user_id), str(picture["id"]))
+        raise
+    _index_pictures(pictures, gallery)
+
+
+@contextmanager
+def _open_sources(pictures: list[PictureSource], user_id: str, gallery: GalleryProtocol) -> Iterator[list[BinaryIO]]:
+    """Raises UploadNotFound or UploadIncomplete for a resumable upload that cannot be used yet."""
+    with ExitStack() as stack:
+        yield [
+            p.file if p.upload_id is None else stack.enter_context(gallery.uploads.open(user_id, p.upload_id))
+            for p in pictures
+        ]
+
+
+async def publish_uploaded_post(
+        new_post: NewPost,
+        pictures: list[PictureSource],
+        gallery: GalleryProtocol,
+        admission: AdmissionProtocol
+):
+    """Publish a post within the request, then delete the resumable uploads it used."""
+    user_id = str(new_post.user_id)
+    with _open_sources(pictures, user_id, gallery) as sources:
+        # admission is decided from image headers, nothing is read into memory before it
+        pixels = [gallery.probe(source).pixels for source in sources]
+        async with admission(new_post.user_id, pixels):
+            for p, source in zip(pictures, sources):
+                new_post.pictures.append(NewPicture(
+                    file_bytes=await run_in_threadpool(source.read),
+                    crop_box=p.crop_box,
+                    save_original=p.save_original
+                ))
+            await publish_post(new_post, gallery)
+
+    for p in pictures:
+        if p.upload_id is not None:
+            gallery.uploads.delete(user_id, p.upload_id)
+
+
+async def enqueue_post(
+        new_post: NewPost,
+        pictures: list[PictureSource],
+        gallery: GalleryProtocol,
+        admission: AdmissionProtocol,
+        max_attempts: int
+) -> int:
+    """
+    Check the pictures from their headers and stage them, then insert the post as
+    processing together with the job that publishes it (see publish_staged_post).
+    """
+    user_id = str(new_post.user_id)
+    with _open_sources(pictures, user_id, gallery) as sources:
+        # the image worker has no admission of its own, oversized images are refused here
+        admission.check([gallery.probe(source).pixels for source in sources])
+        # resumable uploads are handed over as they are, multipart files are staged as uploads
+        staged = [
+            StagedPicture(
+                upload_id=p.upload_id or (await run_in_threadpool(gallery.uploads.put, user_id, source)).id,
+                crop_box=p.crop_box,
+                save_original=p.save_original
+            ) for p, source in zip(pictures, sources)
+        ]
+
+    async with UnitOfWork() as uow:
+        post = models.Post(
+            user_id=new_post.user_id, title=new_post.title, description=new_post.description, status="processing"
+        )
+        uow.posts.add(post)
+        await uow.session.flush()
+        uow.jobs.add(models.Job(
+            kind="publish_post",
+            post_id=post.id,
+            payload=dict(post_id=post.id, user_id=new_post.user_id, pictures=[asdict(p) for p in staged]),
+            max_attempts=max_attempts,
+            run_at=datetime.datetime.now(datetime.timezone.utc)
+        ))
+        await uow.commit()
+    return post.id
 
+
+async def publish_staged_post(payload: dict, gallery: GalleryProtocol, max_image_pixels: int | None = None):
+    """
+    The publish_post job. Safe to run again after a crash: only the run that moves
+    the post out of processing keeps its pictures, the others delete theirs.
+    created_at becomes the publish time, the feed and export cursors only see
+    posts created after the position they read up to. Images above max_image_pixels
+    raise ImageTooLarge before anything is decoded.
+    """
+    user_id, post_id = payload["user_id"], payload["post_id"]
+    new_post = NewPost(user_id=user_id, title="", description="", pictures=[
+        NewPicture(
+            file_bytes=gallery.uploads.read(str(user_id), p["upload_id"]),
+            crop_box=tuple(p["crop_box"]),
+            save_original=p["save_original"]
+        ) for p in payload["pictures"]
+    ])
+    if max_image_pixels is not None:
+        pixels = max(gallery.probe(p.file_bytes).pixels for p in new_post.pictures)
+        if pixels > max_image_pixels:
+            raise exceptions.ImageTooLarge(pixels)
+    pictures = _process_pictures(new_post, gallery)
+
+    published = False
     try:
+        async with UnitOfWork() as uow:
+            published_at = datetime.datetime.now(datetime.timezone.utc)
+            if await uow.posts.set_status(post_id, "published", "processing", created_at=published_at):
+                await uow.posts.add_pictures([dict(p, post_id=post_id) for p in pictures])
+                await uow.user_stats.increment(user_id, 1, len(pictures), sum(p["size"] for p in pictures))
+                await uow.commit()
+                published = True
+    finally:
+        if not published:
+            for picture in pictures:
+                gallery.delete(str(user_id), str(picture["id"]))
+
+    if published:
+        _index_pictures(pictures, gallery)
+    for p in payload["pictures"]:
+        gallery.uploads.delete(str(user_id), p["upload_id"])
+
+
+async def fail_staged_post(payload: dict, gallery: GalleryProtocol):
+    async with UnitOfWork() as uow:
+        await uow.posts.set_status(payload["post_id"], "failed", "processing")
+        await uow.commit()
+    for p in payload["pictures"]:
+        gallery.uploads.delete(str(payload["user_id"]), p["upload_id"])
+
+
+async def publish_posts(new_posts: list[NewPost], gallery: GalleryProtocol) -> list[Published]:
+    """
+    Run every post through the image pipeline, then insert all posts and pictures
+    with two multi-row INSERTs in one transaction. A post whose pictures fail is
+    reported in its result and left out, the rest are still published.
+    """
+    results = [Published() for _ in new_posts]
+    processed: list[tuple[int, NewPost, list[dict]]] = []
+    for i, new_post in enumerate(new_posts):
+        try:
+            processed.append((i, new_post, _process_pictures(new_post, gallery)))
+        except exceptions.UnsupportedImageFormat:
+            results[i].error = "unsupported image format"
+        except exceptions.ImageTooLarge:
+            results[i].error = "image is too large"
+        except Exception:
+            results[i].error = "image could not be processed"
+
+    if not processed:
+        return results
 
+    stats = defaultdict(lambda: [0, 0, 0])
+    try:
         async with UnitOfWork() as uow:
-            uow.posts.add(post)
+            post_ids = await uow.posts.add_many([
+                dict(user_id=new_post.user_id, title=new_post.title, description=new_post.description)
+                for _, new_post, _ in processed
+            ])
+            pictures = []
+            for post_id, (i, new_post, post_pictures) in zip(post_ids, processed):
+                results[i].post_id = post_id
+                pictures.extend(dict(p, post_id=post_id) for p in post_pictures)
+                user = stats[new_post.user_id]
+                user[0] += 1
+                user[1] += len(post_pictures)
+                user[2] += sum(p["size"] for p in post_pictures)
+            await uow.posts.add_pictures(pictures)
+            for user_id, (posts, count, size) in stats.items():
+                await uow.user_stats.increment(user_id, posts, count, size)
             await uow.commit()
+    except Exception:
+        for _, new_post, post_pictures in processed:
+            for picture in post_pictures:
+                gallery.delete(str(new_post.user_id), str(picture["id"]))
+        raise
+
+    for _, _, post_pictures in processed:
+        _index_pictures(post_pictures, gallery)
+    return results
 
-    except IntegrityError:
-        pass
+
+async def delete_post(post_id: int, gallery: GalleryProtocol) -> models.Post | None:
+    async with UnitOfWork() as uow:
+        post = await uow.posts.delete(post_id)
+        if not post:
+            return None
+        # a post still processing in the queue was never counted
+        if post.status == "published":
+            await uow.user_stats.increment(
+                post.user_id, -1, -len(post.pictures), -sum(p.size for p in post.pictures)
+            )
+        await uow.commit()
+
+    for picture in post.pictures:
+        gallery.delete(str(post.user_id), str(picture.id))
+    return post
+
+
+async def record_views(counts: dict[int, int]):
+    async with UnitOfWork() as uow:
+        await uow.post_views.increment_many(counts)
+        await uow.commit()
 
 
 async def confirm_code(code: str, email: str):
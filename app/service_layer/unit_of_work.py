@@ -11,7 +11,7 @@ config = Config()
 
 ASYNC_ENGINE = create_async_engine(
     config.database.dsn,
-    echo=True
+    echo=config.logging.sql
 )
 DEFAULT_SESSION_FACTORY = async_sessionmaker(
     ASYNC_ENGINE,
@@ -25,7 +25,12 @@ class UnitOfWork:
         self.session: AsyncSession = session_factory()
         self.users = repository.UserRepository(self.session)
         self.posts = repository.PostRepository(self.session)
+        self.pictures = repository.PictureRepository(self.session)
         self.verify_codes = repository.VerifyCodesRepository(self.session)
+        self.user_stats = repository.UserStatsRepository(self.session)
+        self.post_views = repository.PostViewsRepository(self.session)
+        self.idempotency_keys = repository.IdempotencyKeyRepository(self.session)
+        self.jobs = repository.JobRepository(self.session)
 
     async def __aenter__(self) -> Self:
         return self
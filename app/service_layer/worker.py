@@ -0,0 +1,98 @@
+"""
+Image worker processes, configured by the jobs group of Config:
+
+    python -m app.service_layer.worker
+
+Runs jobs.workers processes, each processing one queued job at a time, so image
+processing scales with the number of worker processes (and hosts sharing the
+database and gallery storage) independently of the web workers. SIGTERM lets
+every process finish its current job and exit.
+"""
+import asyncio
+import multiprocessing
+import signal
+from functools import partial
+from logging import getLogger
+from multiprocessing.connection import wait
+
+from app.adapters import logs
+from app.adapters.gallery import GalleryProtocol
+from app.config import Config
+from app.domain import exceptions
+from app.lifespan import build_gallery
+from app.service_layer import services
+from app.service_layer.queue import Handler, JobWorker
+
+logger = getLogger("Worker")
+
+
+def handlers(gallery: GalleryProtocol, max_image_pixels: int | None = None) -> dict[str, Handler]:
+    return {
+        "publish_post": Handler(
+            partial(services.publish_staged_post, gallery=gallery, max_image_pixels=max_image_pixels),
+            partial(services.fail_staged_post, gallery=gallery),
+            permanent=(exceptions.UnsupportedImageFormat, exceptions.ImageTooLarge, exceptions.UploadNotFound)
+        ),
+    }
+
+
+async def _serve():
+    config = Config()
+    worker = JobWorker(
+        getLogger("JobWorker"),
+        handlers(build_gallery(config), config.admission.max_image_pixels if config.admission.enabled else None),
+        config.jobs.poll_interval,
+        config.jobs.retry_backoff,
+        config.jobs.lock_timeout
+    )
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    await worker.run()
+
+
+def _worker():
+    logs.setup(Config().logging)
+    asyncio.run(_serve())
+
+
+def main():
+    logs.setup(Config().logging)
+    workers = Config().jobs.workers
+    if workers <= 1:
+        asyncio.run(_serve())
+        return
+
+    context = multiprocessing.get_context("spawn")
+    should_exit = False
+
+    def start() -> multiprocessing.Process:
+        process = context.Process(target=_worker, daemon=False)
+        process.start()
+        return process
+
+    def handle_exit(sig, frame):
+        nonlocal should_exit
+        should_exit = True
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, handle_exit)
+
+    logger.info("starting %d image workers", workers)
+    processes = [start() for _ in range(workers)]
+    while not should_exit:
+        wait([p.sentinel for p in processes], timeout=0.5)
+        for i, process in enumerate(processes):
+            if process.exitcode is not None and not should_exit:
+                logger.warning("worker %d exited with %s, restarting", process.pid, process.exitcode)
+                processes[i] = start()
+
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
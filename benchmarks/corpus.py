@@ -0,0 +1,46 @@
+import io
+import os
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+SIZES = [(640, 480), (1920, 1080), (4000, 3000)]
+FORMATS = ["jpeg", "png", "webp"]
+
+
+def synthetic(width: int, height: int, seed: int = 0) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    channels = []
+    for _ in range(3):
+        fx, fy, phase = rng.uniform(0.5, 3.0, 2).tolist() + [rng.uniform(0, np.pi)]
+        wave = np.sin(x / width * fx * np.pi + phase) * np.cos(y / height * fy * np.pi)
+        channels.append(127 + 100 * wave + rng.normal(0, 6, (height, width)))
+    image = Image.fromarray(np.clip(np.dstack(channels), 0, 255).astype(np.uint8), "RGB")
+
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x0, y0 = rng.integers(0, width), rng.integers(0, height)
+        x1, y1 = x0 + rng.integers(10, width // 3), y0 + rng.integers(10, height // 3)
+        draw.ellipse((x0, y0, x1, y1), fill=tuple(rng.integers(0, 255, 3).tolist()))
+    return image
+
+
+def encode(image: Image.Image, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **({"quality": 95} if fmt in ("jpeg", "webp") else {}))
+    return buffer.getvalue()
+
+
+def generate(sizes=SIZES, formats=FORMATS, per_size: int = 1):
+    for width, height in sizes:
+        for seed in range(per_size):
+            image = synthetic(width, height, seed)
+            for fmt in formats:
+                yield f"{width}x{height}-{seed}.{fmt}", encode(image, fmt)
+
+
+def load(directory: str):
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name), "rb") as f:
+            yield name, f.read()
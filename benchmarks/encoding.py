@@ -0,0 +1,80 @@
+"""
+Fixed quality=95 vs adaptive SSIM-targeted JPEG encoding.
+
+    python -m benchmarks.encoding [--corpus DIR] [--threshold 0.985] [--output FILE]
+"""
+import argparse
+import io
+import time
+
+from PIL import Image
+
+from app.adapters.encoding import AdaptiveJPEGEncoder, JPEGEncoder
+from benchmarks import corpus, report
+
+
+def _timed(encoder, image):
+    start = time.process_time()
+    data, quality = encoder(image)
+    return len(data), quality, time.process_time() - start
+
+
+def run(images, fixed: JPEGEncoder, adaptive: AdaptiveJPEGEncoder) -> list[dict]:
+    results = []
+    for name, raw in images:
+        with Image.open(io.BytesIO(raw)) as im:
+            image = im.convert("RGB")
+        fixed_bytes, _, fixed_cpu = _timed(fixed, image)
+        adaptive_bytes, quality, adaptive_cpu = _timed(adaptive, image)
+        results.append({
+            "image": name,
+            "width": image.width,
+            "height": image.height,
+            "fixed_bytes": fixed_bytes,
+            "adaptive_bytes": adaptive_bytes,
+            "adaptive_quality": quality,
+            "bytes_saved": fixed_bytes - adaptive_bytes,
+            "saved_ratio": round(1 - adaptive_bytes / fixed_bytes, 4),
+            "fixed_cpu_ms": round(fixed_cpu * 1000, 2),
+            "adaptive_cpu_ms": round(adaptive_cpu * 1000, 2),
+            "added_cpu_ms": round((adaptive_cpu - fixed_cpu) * 1000, 2),
+        })
+    return results
+
+
+def summary(results: list[dict]) -> dict:
+    fixed = sum(r["fixed_bytes"] for r in results)
+    adaptive = sum(r["adaptive_bytes"] for r in results)
+    return {
+        "image": "total",
+        "fixed_bytes": fixed,
+        "adaptive_bytes": adaptive,
+        "bytes_saved": fixed - adaptive,
+        "saved_ratio": round(1 - adaptive / fixed, 4) if fixed else 0,
+        "added_cpu_ms": round(sum(r["added_cpu_ms"] for r in results), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", help="directory with sample images (generated when omitted)")
+    parser.add_argument("--quality", type=int, default=95)
+    parser.add_argument("--min-quality", type=int, default=60)
+    parser.add_argument("--threshold", type=float, default=0.985)
+    parser.add_argument("--time-budget", type=float, default=0.5)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    images = corpus.load(args.corpus) if args.corpus else corpus.generate(formats=["jpeg"])
+    adaptive = AdaptiveJPEGEncoder(args.min_quality, args.quality, args.threshold, args.time_budget)
+    results = run(images, JPEGEncoder(args.quality), adaptive)
+    results.append(summary(results))
+    report.emit(
+        "encoding", results, args.output,
+        quality=args.quality, min_quality=args.min_quality,
+        threshold=args.threshold, time_budget=args.time_budget
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Pillow's full plugin registry vs the allow-listed decoders in image_formats.
+
+    python -m benchmarks.formats [--repeat 200] [--output FILE]
+
+Each mode runs in a fresh spawned process: "first" timings include importing
+plugins, "warm" timings are the median of repeated opens afterwards.
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+from PIL import Image
+
+from benchmarks import corpus, report
+
+MODES = ["default", "allow-list"]
+
+
+def _samples() -> list[tuple[str, bytes]]:
+    image = corpus.synthetic(640, 480)
+    gif = io.BytesIO()
+    image.convert("P").save(gif, "gif")
+    return [
+        ("jpeg", corpus.encode(image, "jpeg")),
+        ("gif", gif.getvalue()),
+        ("garbage", os.urandom(64 * 1024)),
+    ]
+
+
+def _measure(args: tuple[str, list[tuple[str, bytes]], int]) -> list[dict]:
+    mode, samples, repeat = args
+    if mode == "default":
+        def open_header(data):
+            with Image.open(io.BytesIO(data)) as im:
+                return im.format
+    else:
+        start = time.perf_counter()
+        from app.adapters import image_formats
+        register_ms = (time.perf_counter() - start) * 1000
+
+        def open_header(data):
+            with image_formats.open_image(data) as im:
+                return im.format
+
+    results = []
+    for name, data in samples:
+        timings = []
+        for _ in range(repeat + 1):
+            start = time.perf_counter()
+            try:
+                outcome = open_header(data).lower()
+            except Exception as e:
+                outcome = f"rejected ({type(e).__name__})"
+            timings.append(time.perf_counter() - start)
+        results.append({
+            "mode": mode,
+            "sample": name,
+            "outcome": outcome,
+            "first_ms": round(timings[0] * 1000, 3),
+            "warm_us": round(statistics.median(timings[1:]) * 1e6, 2),
+        })
+
+    plugins = sorted(m.rsplit(".", 1)[1] for m in sys.modules if m.startswith("PIL.") and m.endswith("ImagePlugin"))
+    for result in results:
+        result["plugins_loaded"] = len(plugins)
+        if mode != "default":
+            result["register_ms"] = round(register_ms, 3)
+    return results
+
+
+def run(repeat: int) -> list[dict]:
+    samples = _samples()
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for mode in MODES:
+        with context.Pool(1) as pool:
+            results.extend(pool.apply(_measure, ((mode, samples, repeat),)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    report.emit("formats", run(args.repeat), args.output, repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
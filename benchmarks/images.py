@@ -0,0 +1,105 @@
+"""
+ImageProcess stage timings over a generated (or given) corpus.
+
+    python -m benchmarks.images [--corpus DIR] [--repeat 3] [--output FILE]
+
+Every image runs in a fresh spawned process so peak RSS is attributable to it.
+"""
+import argparse
+import multiprocessing
+import resource
+import tempfile
+import time
+from logging import getLogger
+
+from app.adapters.gallery import Gallery
+from benchmarks import corpus, report
+
+STAGES = ["decode", "crop", "convert", "resize", "save"]
+
+
+def _peak_rss_kb() -> int:
+    # ru_maxrss survives exec and would report the parent's peak, VmHWM does not
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _measure(args: tuple[str, bytes, int]) -> dict:
+    name, raw, repeat = args
+    baseline = _peak_rss_kb()
+    timings = {stage: [] for stage in STAGES}
+
+    with tempfile.TemporaryDirectory() as base_path:
+        gallery = Gallery(getLogger("benchmark"), base_path)
+        for _ in range(repeat):
+            with gallery(raw, "0") as im:
+                start = time.perf_counter()
+                im.image.load()
+                timings["decode"].append(time.perf_counter() - start)
+
+                dx, dy = im.width // 20, im.height // 20
+                start = time.perf_counter()
+                im.crop((dx, dy, im.width - dx, im.height - dy))
+                timings["crop"].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                im.convert()
+                timings["convert"].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                im.resize()
+                timings["resize"].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                im.save(save_original=False)
+                timings["save"].append(time.perf_counter() - start)
+                width, height, fmt = im.width, im.height, im.format
+
+    megapixels = width * height / 1e6
+    result = {
+        "image": name,
+        "format": fmt,
+        "width": width,
+        "height": height,
+        "bytes": len(raw),
+        "peak_rss_mb": round((_peak_rss_kb() - baseline) / 1024, 2),
+    }
+    total = 0.0
+    for stage, samples in timings.items():
+        best = min(samples)
+        total += best
+        result[f"{stage}_ms"] = round(best * 1000, 3)
+    result["total_ms"] = round(total * 1000, 3)
+    result["images_per_s"] = round(1 / total, 2)
+    result["megapixels_per_s"] = round(megapixels / total, 2)
+    return result
+
+
+def run(images, repeat: int) -> list[dict]:
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for name, raw in images:
+        with context.Pool(1) as pool:
+            results.append(pool.apply(_measure, ((name, raw, repeat),)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", help="directory with sample images (generated when omitted)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    images = corpus.load(args.corpus) if args.corpus else corpus.generate()
+    report.emit("images", run(images, args.repeat), args.output, repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
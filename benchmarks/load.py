@@ -0,0 +1,258 @@
+"""
+In-process load test: drives the ASGI app through httpx with a fake mailer,
+a temp-dir Gallery and a SQLite database, no server or Postgres needed.
+
+    python -m benchmarks.load [--concurrency 16] [--duration 30] [--scenarios login feed upload picture]
+"""
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from logging import getLogger
+
+import httpx
+from PIL import Image
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.adapters import metrics
+from app.adapters.admission import AdmissionController, AdmissionProtocol
+from app.adapters.feed_cache import FeedCache, FeedCacheProtocol
+from app.adapters.gallery import Gallery, GalleryProtocol
+from app.adapters.mailer import MailerProtocol
+from app.adapters.security import JWTCookie, JWTCookieProtocol
+from app.adapters.view_counter import ViewCounter, ViewCounterProtocol
+from app.api.pictures import serving
+from app.application import create_app
+from app.domain import models
+from app.service_layer import services, unit_of_work
+from app.service_layer.idempotency import Idempotency, IdempotencyProtocol
+from app.service_layer.queue import NoPublishQueue, PublishQueueProtocol
+from benchmarks import corpus, report
+
+SCENARIOS = ["login", "feed", "upload", "picture"]
+
+
+class FakeMailer:
+    def __init__(self):
+        self.codes: dict[str, str] = {}
+
+    async def send(self, subject: str, content: str, email: str):
+        self.codes[email] = content[:4]
+        return True
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.lag: dict[str, list[float]] = defaultdict(list)
+        self.in_flight: dict[str, int] = defaultdict(int)
+
+    async def __call__(self, endpoint: str, request) -> httpx.Response:
+        self.in_flight[endpoint] += 1
+        start = time.perf_counter()
+        try:
+            response = await request
+        finally:
+            self.in_flight[endpoint] -= 1
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        self.statuses[endpoint][response.status_code] += 1
+        return response
+
+    async def monitor_lag(self, interval: float = 0.01):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag = time.perf_counter() - start - interval
+            self.lag["*"].append(lag)
+            for endpoint, count in self.in_flight.items():
+                if count:
+                    self.lag[endpoint].append(lag)
+
+    def summary(self, elapsed: float) -> list[dict]:
+        def percentile(samples, q):
+            return round(samples[min(len(samples) - 1, int(len(samples) * q))] * 1000, 2)
+
+        results = []
+        for endpoint, samples in sorted(self.latencies.items()):
+            samples.sort()
+            lag = sorted(self.lag.get(endpoint) or [0.0])
+            results.append({
+                "endpoint": endpoint,
+                "requests": len(samples),
+                "rps": round(len(samples) / elapsed, 1),
+                "p50_ms": percentile(samples, 0.50),
+                "p95_ms": percentile(samples, 0.95),
+                "p99_ms": percentile(samples, 0.99),
+                "max_ms": round(samples[-1] * 1000, 2),
+                "loop_lag_p99_ms": percentile(lag, 0.99),
+                "loop_lag_max_ms": round(lag[-1] * 1000, 2),
+                "statuses": {str(code): n for code, n in self.statuses[endpoint].items()},
+            })
+        lag = sorted(self.lag["*"] or [0.0])
+        results.append({
+            "endpoint": "*",
+            "requests": sum(len(s) for s in self.latencies.values()),
+            "rps": round(sum(len(s) for s in self.latencies.values()) / elapsed, 1),
+            "loop_lag_p99_ms": percentile(lag, 0.99),
+            "loop_lag_max_ms": round(lag[-1] * 1000, 2),
+        })
+        return results
+
+
+class Scenarios:
+    def __init__(self, client: httpx.AsyncClient, record: Recorder, mailer: FakeMailer, image: bytes):
+        self.client = client
+        self.record = record
+        self.mailer = mailer
+        self.image = image
+        self.emails = itertools.count()
+        self.post_ids: list[int] = []
+        self.picture_ids: list[str] = []
+
+    async def login(self):
+        email = f"load{next(self.emails)}@example.com"
+        await self.record("POST /authorization/email", self.client.post(
+            "/authorization/email", json={"email": email}
+        ))
+        await self.record("POST /authorization/code", self.client.post(
+            "/authorization/code", json={"email": email, "code": self.mailer.codes.get(email, "0000")}
+        ))
+
+    async def feed(self):
+        response = await self.record("GET /posts/", self.client.get("/posts/"))
+        if response.status_code == 200:
+            posts = response.json()
+            self.post_ids = [p["id"] for p in posts]
+            self.picture_ids = [pic["id"] for p in posts for pic in p["pictures"]]
+        if self.post_ids:
+            await self.record("GET /posts/{post_id}", self.client.get(f"/posts/{random.choice(self.post_ids)}"))
+
+    async def upload(self):
+        with Image.open(io.BytesIO(self.image)) as im:
+            width, height = im.size
+        await self.record("POST /posts/", self.client.post("/posts/", data={
+            "title": "load test",
+            "description": "load test",
+            "saveOriginals": ["false"],
+            "areas": [json.dumps({"x": 0, "y": 0, "width": width, "height": height, "rotate": 0})],
+        }, files=[("files", ("picture.jpg", self.image, "image/jpeg"))]))
+
+    async def picture(self):
+        if not self.picture_ids:
+            await self.feed()
+        if self.picture_ids:
+            await self.record("GET /pictures/{source}/{user_id}/{picture_id}", self.client.get(
+                f"/pictures/optimized/0/{random.choice(self.picture_ids)}"
+            ))
+
+
+async def _prepare_database(path: str):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", connect_args={"timeout": 30})
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    unit_of_work.DEFAULT_SESSION_FACTORY.configure(bind=engine)
+    async with unit_of_work.UnitOfWork() as uow:
+        uow.users.add(models.User(id=0, username="loadtest", email="loadtest@example.com", name="", bio=""))
+        await uow.commit()
+    return engine
+
+
+async def run(
+        scenarios: list[str],
+        concurrency: int,
+        duration: float,
+        image_size: tuple[int, int],
+        picture_serving: str = "app"
+) -> list[dict]:
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = await _prepare_database(os.path.join(workdir, "load.sqlite"))
+        mailer = FakeMailer()
+        gallery = Gallery(getLogger("Gallery"), os.path.join(workdir, "data"))
+        feed_cache = FeedCache()
+        admission = AdmissionController()
+        view_counter = ViewCounter(services.record_views)
+        idempotency = Idempotency()
+        publish_queue = NoPublishQueue()
+        send_picture = serving.sender(picture_serving, "/_pictures/", "/static/pictures/")
+        jwt_cookie = JWTCookie("in-process-load-test-secret-0123456789", "HS256")
+
+        @asynccontextmanager
+        async def lifespan(app):
+            metrics.instrument_engine(engine)
+            app.dependency_overrides = {
+                GalleryProtocol: lambda: gallery,
+                FeedCacheProtocol: lambda: feed_cache,
+                AdmissionProtocol: lambda: admission,
+                ViewCounterProtocol: lambda: view_counter,
+                IdempotencyProtocol: lambda: idempotency,
+                PublishQueueProtocol: lambda: publish_queue,
+                serving.PictureSenderProtocol: lambda: send_picture,
+                MailerProtocol: lambda: mailer,
+                JWTCookieProtocol: lambda: jwt_cookie,
+                JWTCookie: jwt_cookie
+            }
+            flusher = asyncio.create_task(view_counter.run())
+            yield
+            flusher.cancel()
+
+        app = create_app(lifespan)
+        image = corpus.encode(corpus.synthetic(*image_size), "jpeg")
+
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+                runner = Scenarios(client, Recorder(), mailer, image)
+                await runner.upload()
+                await runner.feed()
+                runner.record = record = Recorder()
+
+                deadline = time.perf_counter() + duration
+
+                async def user(seed: int):
+                    rng = random.Random(seed)
+                    while time.perf_counter() < deadline:
+                        await getattr(runner, rng.choice(scenarios))()
+
+                monitor = asyncio.create_task(record.monitor_lag())
+                start = time.perf_counter()
+                await asyncio.gather(*(user(i) for i in range(concurrency)))
+                elapsed = time.perf_counter() - start
+                monitor.cancel()
+
+        await engine.dispose()
+    return record.summary(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--image-size", type=int, nargs=2, default=[1920, 1080])
+    parser.add_argument(
+        "--picture-serving", choices=["app", "x-accel-redirect", "x-sendfile"], default="app",
+        help="with a redirect mode the picture scenario measures only the worker's share of the work"
+    )
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(
+        args.scenarios, args.concurrency, args.duration, tuple(args.image_size), args.picture_serving
+    ))
+    report.emit(
+        "load", results, args.output,
+        scenarios=args.scenarios, concurrency=args.concurrency, duration=args.duration,
+        picture_serving=args.picture_serving
+    )
+
+
+if __name__ == "__main__":
+    main()
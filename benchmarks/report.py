@@ -0,0 +1,36 @@
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+import orjson
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def emit(benchmark: str, results: list[dict], output: str | None = None, **params):
+    report = {
+        "benchmark": benchmark,
+        "commit": _commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": params,
+        "results": results,
+    }
+    data = orjson.dumps(report, option=orjson.OPT_INDENT_2)
+    if output:
+        with open(output, "wb") as f:
+            f.write(data)
+    else:
+        sys.stdout.buffer.write(data + b"\n")
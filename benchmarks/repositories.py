@@ -0,0 +1,164 @@
+"""
+Repository lookups against a seeded database.
+
+    python -m benchmarks.repositories [--sizes 10000 100000 1000000] [--dsn DSN] [--output FILE]
+
+Without --dsn every size gets its own SQLite file under --db-dir, which is kept
+between runs so seeding is paid once. --dsn points at a scratch Postgres
+database: its users/posts/pictures tables are truncated and re-seeded.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.adapters import repository
+from app.domain import models
+from benchmarks import report
+
+BATCH = 10_000
+USERS_RATIO = 100
+WORDS = [f"tag{i}" for i in range(1000)]
+
+
+async def seed(session_maker: async_sessionmaker, posts: int, seed_: int = 0):
+    rng = random.Random(seed_)
+    users = max(1, posts // USERS_RATIO)
+    epoch = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+    async with session_maker() as session:
+        for start in range(0, users, BATCH):
+            await session.execute(insert(models.User), [{
+                "id": i + 1,
+                "username": f"user{i}",
+                "email": f"user{i}@example.com",
+                "name": f"User {i}",
+                "bio": "",
+                "registered_at": epoch,
+            } for i in range(start, min(users, start + BATCH))])
+
+        for start in range(0, posts, BATCH):
+            ids = range(start + 1, min(posts, start + BATCH) + 1)
+            await session.execute(insert(models.Post), [{
+                "id": i,
+                "title": f"post {i}",
+                "description": f"benchmark post {WORDS[rng.randrange(len(WORDS))]}",
+                "created_at": epoch + timedelta(minutes=i),
+                "user_id": rng.randint(1, users),
+            } for i in ids])
+            await session.execute(insert(models.Picture), [{
+                "id": uuid.UUID(int=rng.getrandbits(128)),
+                "format": "jpeg",
+                "size": 250_000,
+                "height": 1080,
+                "width": 1920,
+                "post_id": i,
+            } for i in ids for _ in range(rng.randint(1, 3))])
+        await session.commit()
+
+
+async def _time(session_maker, call, iterations: int) -> dict:
+    samples = []
+    async with session_maker() as session:
+        for i in range(iterations):
+            start = time.perf_counter()
+            await call(session, i)
+            samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "mean_us": round(statistics.fmean(samples) * 1e6, 1),
+        "p50_us": round(samples[len(samples) // 2] * 1e6, 1),
+        "p95_us": round(samples[int(len(samples) * 0.95)] * 1e6, 1),
+        "ops_per_s": round(iterations / sum(samples), 1),
+    }
+
+
+async def measure(session_maker, posts: int, iterations: int, list_limit: int) -> list[dict]:
+    rng = random.Random(1)
+    users = max(1, posts // USERS_RATIO)
+    post_ids = [rng.randint(1, posts) for _ in range(iterations)]
+    user_ids = [rng.randint(1, users) for _ in range(iterations)]
+
+    cases = {
+        "PostRepository.get": lambda s, i: repository.PostRepository(s).get(post_ids[i]),
+        "UserRepository.get": lambda s, i: repository.UserRepository(s).get(user_ids[i]),
+        "UserRepository.get_by_email": lambda s, i: repository.UserRepository(s).get_by_email(
+            f"user{user_ids[i] - 1}@example.com"
+        ),
+        "UserRepository.is_username_available": lambda s, i: repository.UserRepository(
+            s
+        ).is_username_available(f"user{user_ids[i] - 1}"),
+        "PostRepository.search": lambda s, i: repository.PostRepository(s).search(
+            WORDS[user_ids[i] % len(WORDS)], 20
+        ),
+    }
+
+    async def list_posts(s, _):
+        list(await repository.PostRepository(s).list(None, None))
+
+    results = []
+    for name, call in cases.items():
+        results.append({"posts": posts, "query": name, **await _time(session_maker, call, iterations)})
+    # PostRepository.list ignores its paging arguments and loads the whole table
+    if posts <= list_limit:
+        results.append({"posts": posts, "query": "PostRepository.list", **await _time(session_maker, list_posts, 3)})
+    return results
+
+
+async def run(sizes: list[int], dsn: str | None, db_dir: str, iterations: int, list_limit: int) -> list[dict]:
+    results = []
+    for posts in sizes:
+        if dsn:
+            engine = create_async_engine(dsn)
+            async with engine.begin() as conn:
+                await conn.run_sync(models.Base.metadata.create_all)
+                await conn.execute(text("TRUNCATE pictures, posts, users"))
+            fresh = True
+        else:
+            os.makedirs(db_dir, exist_ok=True)
+            path = os.path.join(db_dir, f"posts-{posts}.sqlite")
+            fresh = not os.path.exists(path)
+            engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+            async with engine.begin() as conn:
+                await conn.run_sync(models.Base.metadata.create_all)
+
+        session_maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+        if fresh:
+            start = time.perf_counter()
+            await seed(session_maker, posts)
+            results.append({"posts": posts, "query": "seed", "seconds": round(time.perf_counter() - start, 2)})
+        async with session_maker() as session:
+            assert (await session.execute(select(func.count(models.Post.id)))).scalar() == posts
+
+        results.extend(await measure(session_maker, posts, iterations, list_limit))
+        await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dsn", help="scratch postgresql+asyncpg:// database, truncated before seeding")
+    parser.add_argument("--db-dir", default=os.path.join(".benchmarks", "db"))
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--list-limit", type=int, default=100_000)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.sizes, args.dsn, args.db_dir, args.iterations, args.list_limit))
+    report.emit(
+        "repositories", results, args.output,
+        sizes=args.sizes, backend="postgresql" if args.dsn else "sqlite", iterations=args.iterations
+    )
+
+
+if __name__ == "__main__":
+    main()
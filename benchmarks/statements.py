@@ -0,0 +1,133 @@
+"""
+Per-query Python overhead of the hot repository lookups: statements built on
+every call (as the repositories did before) vs the prebuilt ones with bound
+parameters they use now.
+
+    python -m benchmarks.statements [--iterations 5000] [--dsn DSN] [--output FILE]
+
+"build" times constructing the statement and its cache key, the part SQLAlchemy
+pays in Python before it can find the compiled form; "execute" times the whole
+lookup through an AsyncSession against a one-row table (in-memory SQLite unless
+--dsn points at a scratch database), where that overhead dominates.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import sqlalchemy as sa
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import joinedload
+
+from app.adapters import repository
+from app.domain import models
+from benchmarks import report
+
+WARMUP = 50
+
+
+def _inline() -> dict:
+    return {
+        "PostRepository.get": lambda: (select(models.Post).where(models.Post.id == 1).options(
+            joinedload(models.Post.pictures), joinedload(models.Post.user)
+        ), None),
+        "UserRepository.get_by_email": lambda: (
+            select(models.User).where(models.User.email == "user@example.com"), None
+        ),
+        "UserRepository.is_username_available": lambda: (
+            select(models.User.username).where(models.User.username == "user"), None
+        ),
+        "VerifyCodesRepository.get": lambda: (
+            select(models.VerifyCode).where(models.VerifyCode.email == "user@example.com"), None
+        ),
+        "VerifyCodesRepository.delete": lambda: (
+            delete(models.VerifyCode).where(models.VerifyCode.email == "nobody@example.com"), None
+        ),
+    }
+
+
+def _prebuilt() -> dict:
+    return {
+        "PostRepository.get": lambda: (repository._POST_BY_ID, {"post_id": 1}),
+        "UserRepository.get_by_email": lambda: (repository._USER_BY_EMAIL, {"email": "user@example.com"}),
+        "UserRepository.is_username_available": lambda: (repository._USERNAME_TAKEN, {"username": "user"}),
+        "VerifyCodesRepository.get": lambda: (repository._VERIFY_CODE_BY_EMAIL, {"email": "user@example.com"}),
+        "VerifyCodesRepository.delete": lambda: (repository._DELETE_VERIFY_CODE, {"email": "nobody@example.com"}),
+    }
+
+
+async def _seed(session_maker: async_sessionmaker):
+    async with session_maker() as session:
+        await session.execute(sa.text("DELETE FROM users"))
+        await session.execute(sa.text("DELETE FROM verify_codes"))
+        session.add(models.User(id=1, username="user", email="user@example.com", name="", bio=""))
+        session.add(models.Post(id=1, user_id=1, title="post", description="", pictures=[
+            models.Picture(id=uuid.uuid4(), format="jpeg", size=1, height=1, width=1)
+        ]))
+        session.add(models.VerifyCode(email="user@example.com", code="0000"))
+        await session.commit()
+
+
+def _summary(samples: list[float]) -> dict:
+    samples.sort()
+    return {
+        "mean_us": round(statistics.fmean(samples) * 1e6, 2),
+        "p50_us": round(samples[len(samples) // 2] * 1e6, 2),
+        "p95_us": round(samples[int(len(samples) * 0.95)] * 1e6, 2),
+    }
+
+
+async def run(iterations: int, dsn: str | None) -> list[dict]:
+    engine = create_async_engine(dsn or "sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    await _seed(session_maker)
+
+    results = []
+    for mode, cases in (("inline", _inline()), ("prebuilt", _prebuilt())):
+        for query, statement in cases.items():
+            build = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                statement()[0]._generate_cache_key()
+                build.append(time.perf_counter() - start)
+
+            execute = []
+            async with session_maker() as session:
+                # the first executions compile the statement into the engine's cache
+                for _ in range(WARMUP):
+                    await session.execute(*statement())
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    await session.execute(*statement())
+                    execute.append(time.perf_counter() - start)
+                    session.expunge_all()
+                await session.rollback()
+
+            results.append({
+                "query": query,
+                "mode": mode,
+                "build": _summary(build),
+                "execute": _summary(execute),
+            })
+    await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--dsn", help="scratch database url, its users and verify_codes rows are replaced")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    report.emit(
+        "statements", asyncio.run(run(args.iterations, args.dsn)), args.output,
+        iterations=args.iterations, backend=args.dsn.split(":", 1)[0] if args.dsn else "sqlite"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Bulk export/import of users, posts and pictures with PostgreSQL COPY.
+
+    python -m bulk export DIR [--format ndjson|binary] [--batch 50000] [--verify]
+    python -m bulk import DIR [--verify]
+
+Both directions work in chunks of --batch rows ordered by primary key and are
+resumable: export keeps its position in DIR/state.json, import records loaded
+chunks in a bulk_import table inside the same transaction as the COPY.
+"""
+import asyncpg
+
+from app.config import Config
+from app.domain import models
+
+TABLES = ["users", "posts", "pictures"]
+
+
+def columns(table: str) -> list[str]:
+    return [c.name for c in models.Base.metadata.tables[table].columns]
+
+
+def primary_key(table: str) -> str:
+    return models.Base.metadata.tables[table].primary_key.columns.values()[0].name
+
+
+async def connect() -> asyncpg.Connection:
+    database = Config().database
+    return await asyncpg.connect(
+        user=database.user,
+        password=database.password,
+        database=database.database,
+        host=database.host,
+        port=database.port
+    )
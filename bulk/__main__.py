@@ -0,0 +1,42 @@
+import argparse
+import asyncio
+import os
+from logging import basicConfig, getLogger, INFO
+
+from app.config import Config
+from bulk import connect
+from bulk.export import export
+from bulk.importer import import_
+from bulk.verify import verify_gallery
+
+
+async def main(args: argparse.Namespace):
+    logger = getLogger("bulk")
+    conn = await connect()
+    try:
+        if args.command == "export":
+            await export(conn, args.directory, args.format, args.batch, logger)
+        else:
+            await import_(conn, args.directory, logger)
+        if args.verify:
+            missing = await verify_gallery(
+                conn, args.gallery, os.path.join(args.directory, "missing.ndjson"), logger, workers=args.workers
+            )
+            if missing:
+                logger.warning("%d pictures have missing gallery files, see missing.ndjson", missing)
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m bulk")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("directory")
+    parser.add_argument("--format", choices=["ndjson", "binary"], default="ndjson")
+    parser.add_argument("--batch", type=int, default=50_000)
+    parser.add_argument("--verify", action="store_true", help="check Gallery files of every picture")
+    parser.add_argument("--gallery", default=Config().gallery.base_path)
+    parser.add_argument("--workers", type=int, default=32)
+
+    basicConfig(level=INFO, format="%(levelname)-3s: %(asctime)s  %(name)s %(message)s")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,67 @@
+import os
+import time
+import uuid
+from logging import Logger
+
+import asyncpg
+import orjson
+
+from app.domain import models
+from bulk import TABLES, columns, primary_key
+from bulk.state import State, chunk_name
+
+
+def _sql_type(table: str) -> str:
+    column = models.Base.metadata.tables[table].columns[primary_key(table)]
+    return "uuid" if column.type.python_type is uuid.UUID else "bigint"
+
+
+async def _export_chunk(
+        conn: asyncpg.Connection, table: str, path: str, fmt: str, last: str | None, batch: int
+) -> tuple[int, str | None]:
+    pk = primary_key(table)
+    # the position is kept as text in state.json and cast back on the server
+    where = f"WHERE {pk} > $1::text::{_sql_type(table)}" if last is not None else "WHERE $1::text IS NULL"
+    query = f"SELECT {', '.join(columns(table))} FROM {table} {where} ORDER BY {pk} LIMIT {batch}"
+
+    async with conn.transaction(isolation="repeatable_read", readonly=True):
+        keys = await conn.fetch(f"SELECT {pk} FROM {table} {where} ORDER BY {pk} LIMIT {batch}", last)
+        if not keys:
+            return 0, last
+        tmp = f"{path}.tmp"
+        if fmt == "binary":
+            await conn.copy_from_query(query, last, output=tmp, format="binary")
+        else:
+            with open(tmp, "wb") as f:
+                for record in await conn.fetch(query, last):
+                    f.write(orjson.dumps(dict(record), default=str) + b"\n")
+    os.replace(tmp, path)
+    return len(keys), str(keys[-1][pk])
+
+
+async def export(conn: asyncpg.Connection, directory: str, fmt: str, batch: int, logger: Logger):
+    os.makedirs(directory, exist_ok=True)
+    state = State(directory)
+    state.data.setdefault("id", str(uuid.uuid4()))
+    if state.data.setdefault("format", fmt) != fmt:
+        raise ValueError(f"{directory} holds a {state.data['format']} export")
+
+    for table in TABLES:
+        progress = state.table(table)
+        if progress["done"]:
+            continue
+        total = await conn.fetchval(f"SELECT count(*) FROM {table}")
+        start = time.monotonic()
+        while True:
+            path = os.path.join(directory, chunk_name(table, progress["chunks"], fmt))
+            rows, last = await _export_chunk(conn, table, path, fmt, progress["last"], batch)
+            if not rows:
+                break
+            progress.update(chunks=progress["chunks"] + 1, last=last, rows=progress["rows"] + rows)
+            state.save()
+            logger.info(
+                "%s: %d/%d rows, %.0f rows/s", table, progress["rows"], total,
+                progress["rows"] / max(time.monotonic() - start, 1e-9)
+            )
+        progress["done"] = True
+        state.save()
@@ -0,0 +1,80 @@
+import os
+import time
+import uuid
+from datetime import datetime
+from logging import Logger
+
+import asyncpg
+import orjson
+
+from app.domain import models
+from bulk import TABLES, columns, primary_key
+from bulk.state import State, chunks
+
+_PROGRESS_TABLE = """
+    CREATE TABLE IF NOT EXISTS bulk_import (
+        chunk text PRIMARY KEY,
+        rows integer NOT NULL,
+        imported_at timestamptz NOT NULL DEFAULT now()
+    )
+"""
+
+
+def _converters(table: str) -> list:
+    result = []
+    for column in models.Base.metadata.tables[table].columns:
+        if column.type.python_type is datetime:
+            result.append(lambda v: v if v is None else datetime.fromisoformat(v))
+        elif column.type.python_type is uuid.UUID:
+            result.append(lambda v: v if v is None else uuid.UUID(v))
+        else:
+            result.append(lambda v: v)
+    return result
+
+
+def _records(path: str, table: str):
+    names, convert = columns(table), _converters(table)
+    with open(path, "rb") as f:
+        for line in f:
+            row = orjson.loads(line)
+            yield tuple(c(row[name]) for name, c in zip(names, convert))
+
+
+async def _import_chunk(conn: asyncpg.Connection, export_id: str, table: str, path: str) -> int:
+    name = f"{export_id}/{os.path.basename(path)}"
+    async with conn.transaction():
+        if await conn.fetchval("SELECT rows FROM bulk_import WHERE chunk = $1", name) is not None:
+            return 0
+        if path.endswith(".copy"):
+            status = await conn.copy_to_table(table, source=path, columns=columns(table), format="binary")
+        else:
+            status = await conn.copy_records_to_table(table, records=_records(path, table), columns=columns(table))
+        rows = int(status.split()[-1])
+        await conn.execute("INSERT INTO bulk_import (chunk, rows) VALUES ($1, $2)", name, rows)
+    return rows
+
+
+async def _reset_sequence(conn: asyncpg.Connection, table: str):
+    pk = primary_key(table)
+    sequence = await conn.fetchval("SELECT pg_get_serial_sequence($1, $2)", table, pk)
+    if sequence:
+        await conn.execute(
+            f"SELECT setval($1, coalesce((SELECT max({pk}) FROM {table}), 0) + 1, false)", sequence
+        )
+
+
+async def import_(conn: asyncpg.Connection, directory: str, logger: Logger):
+    export_id = State(directory).data["id"]
+    await conn.execute(_PROGRESS_TABLE)
+    for table in TABLES:
+        start, imported = time.monotonic(), 0
+        files = chunks(directory, table)
+        for number, name in enumerate(files, 1):
+            rows = await _import_chunk(conn, export_id, table, os.path.join(directory, name))
+            imported += rows
+            logger.info(
+                "%s: chunk %d/%d %s, %.0f rows/s", table, number, len(files),
+                f"{rows} rows" if rows else "already imported",
+                imported / max(time.monotonic() - start, 1e-9)
+            )
+        await _reset_sequence(conn, table)
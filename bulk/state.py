@@ -0,0 +1,36 @@
+import os
+
+import orjson
+
+
+class State:
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, "state.json")
+        self.data: dict = {}
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                self.data = orjson.loads(f.read())
+
+    def table(self, name: str) -> dict:
+        return self.data.setdefault("tables", {}).setdefault(name, {
+            "chunks": 0, "last": None, "rows": 0, "done": False
+        })
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(orjson.dumps(self.data, option=orjson.OPT_INDENT_2))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+def chunk_name(table: str, number: int, fmt: str) -> str:
+    return f"{table}.{number:06d}.{'ndjson' if fmt == 'ndjson' else 'copy'}"
+
+
+def chunks(directory: str, table: str) -> list[str]:
+    return sorted(
+        name for name in os.listdir(directory)
+        if name.startswith(f"{table}.") and name.endswith((".ndjson", ".copy"))
+    )
@@ -0,0 +1,46 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from logging import Logger
+
+import asyncpg
+import orjson
+
+from app.adapters.gallery import Source
+
+_QUERY = """
+    SELECT pictures.id, posts.user_id FROM pictures
+    JOIN posts ON posts.id = pictures.post_id
+    ORDER BY pictures.id
+"""
+
+
+def _missing(base_path: str, picture_id, user_id) -> list[str]:
+    return [
+        source.value for source in Source
+        if not os.path.isfile(os.path.join(base_path, source, str(user_id), str(picture_id)))
+    ]
+
+
+async def verify_gallery(
+        conn: asyncpg.Connection,
+        base_path: str,
+        report_path: str,
+        logger: Logger,
+        batch: int = 10_000,
+        workers: int = 32
+) -> int:
+    checked = missing = 0
+    with ThreadPoolExecutor(workers) as pool, open(report_path, "wb") as report:
+        async with conn.transaction():
+            cursor = await conn.cursor(_QUERY)
+            while rows := await cursor.fetch(batch):
+                results = pool.map(lambda r: _missing(base_path, r["id"], r["user_id"]), rows)
+                for row, sources in zip(rows, results):
+                    if sources:
+                        missing += 1
+                        report.write(orjson.dumps({
+                            "picture_id": row["id"], "user_id": row["user_id"], "missing": sources
+                        }) + b"\n")
+                checked += len(rows)
+                logger.info("gallery: %d pictures checked, %d missing files", checked, missing)
+    return missing
@@ -0,0 +1,33 @@
+"""posts search
+
+Revision ID: 7d2e4b1a9c03
+Revises: 3f1c9a7e2b45
+Create Date: 2026-10-19 11:40:07.118254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2e4b1a9c03'
+down_revision = '3f1c9a7e2b45'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        ALTER TABLE posts ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(description, '')), 'B')
+        ) STORED
+    """)
+    op.create_index(
+        op.f('ix-posts-search_vector'), 'posts', ['search_vector'], unique=False, postgresql_using='gin'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix-posts-search_vector'), table_name='posts', postgresql_using='gin')
+    op.drop_column('posts', 'search_vector')
@@ -0,0 +1,126 @@
+import asyncio
+import io
+import json
+from contextlib import asynccontextmanager
+from logging import getLogger
+
+import httpx
+import pytest
+from PIL import Image
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.adapters import sql_profiler
+from app.adapters.admission import AdmissionController, AdmissionProtocol
+from app.adapters.feed_cache import FeedCache, FeedCacheProtocol
+from app.adapters.gallery import Gallery, GalleryProtocol
+from app.adapters.view_counter import ViewCounter, ViewCounterProtocol
+from app.api.pictures.serving import FileSender, PictureSenderProtocol
+from app.application import create_app
+from app.domain import models
+from app.service_layer import services, unit_of_work
+from app.service_layer.idempotency import Idempotency, IdempotencyProtocol
+from app.service_layer.queue import NoPublishQueue, PublishQueueProtocol
+from app.service_layer.unit_of_work import UnitOfWork
+
+
+@pytest.fixture
+def database(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'iss.sqlite'}", poolclass=NullPool)
+    sql_profiler.instrument_engine(engine)
+
+    async def create_all():
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+
+    asyncio.run(create_all())
+    unit_of_work.DEFAULT_SESSION_FACTORY.configure(bind=engine)
+    yield engine
+    unit_of_work.DEFAULT_SESSION_FACTORY.configure(bind=unit_of_work.ASYNC_ENGINE)
+
+
+@pytest.fixture
+def user(database):
+    """User 0, the one the endpoints act as."""
+    async def add():
+        async with UnitOfWork() as uow:
+            uow.users.add(models.User(id=0, username="user", email="user@example.com", name="", bio=""))
+            await uow.commit()
+
+    asyncio.run(add())
+
+
+@pytest.fixture
+def post_form():
+    """Keyword arguments of a POST /posts/ request with one picture, cropped to its full size."""
+    def form(image: Image.Image | None = None, title: str = "post", format: str = "jpeg") -> dict:
+        image = image or Image.new("RGB", (32, 32), "red")
+        buffer = io.BytesIO()
+        image.save(buffer, format)
+        area = json.dumps({"x": 0, "y": 0, "width": image.width, "height": image.height, "rotate": 0})
+        return {"data": {"title": title, "saveOriginals": ["false"], "areas": [area]},
+                "files": [("files", (f"picture.{format}", buffer.getvalue(), f"image/{format}"))]}
+
+    return form
+
+
+@pytest.fixture
+def gallery(tmp_path):
+    return Gallery(getLogger("Gallery"), str(tmp_path / "data"))
+
+
+@pytest.fixture
+def feed_cache():
+    return FeedCache()
+
+
+@pytest.fixture
+def admission():
+    return AdmissionController()
+
+
+@pytest.fixture
+def view_counter():
+    # flushed explicitly by the tests that read counts
+    return ViewCounter(services.record_views, flush_interval=3600)
+
+
+@pytest.fixture
+def send_picture():
+    return FileSender()
+
+
+@pytest.fixture
+def idempotency():
+    return Idempotency(wait=0.5)
+
+
+@pytest.fixture
+def publish_queue():
+    return NoPublishQueue()
+
+
+@pytest.fixture
+def client(database, gallery, feed_cache, admission, view_counter, send_picture, idempotency, publish_queue):
+    @asynccontextmanager
+    async def lifespan(app):
+        app.dependency_overrides = {
+            GalleryProtocol: lambda: gallery,
+            FeedCacheProtocol: lambda: feed_cache,
+            AdmissionProtocol: lambda: admission,
+            ViewCounterProtocol: lambda: view_counter,
+            IdempotencyProtocol: lambda: idempotency,
+            PublishQueueProtocol: lambda: publish_queue,
+            PictureSenderProtocol: lambda: send_picture
+        }
+        yield
+
+    @asynccontextmanager
+    async def connect():
+        app = create_app(lifespan)
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+                yield c
+
+    return connect
@@ -0,0 +1,33 @@
+import asyncio
+import io
+import json
+
+import pytest
+from PIL import Image
+
+from app.adapters.admission import AdmissionController
+
+
+@pytest.fixture
+def admission():
+    return AdmissionController(max_image_pixels=64 * 64, per_user=0)
+
+
+def test_rejected_publish_gets_503_with_retry_after(database, client):
+    def form(size):
+        buffer = io.BytesIO()
+        Image.new("RGB", (size, size), "red").save(buffer, "jpeg")
+        area = json.dumps({"x": 0, "y": 0, "width": size, "height": size, "rotate": 0})
+        return {"data": {"saveOriginals": ["false"], "areas": [area]},
+                "files": [("files", ("a.jpg", buffer.getvalue(), "image/jpeg"))]}
+
+    async def scenario():
+        async with client() as c:
+            busy = await c.post("/posts/", **form(64))
+            assert busy.status_code == 503
+            assert busy.headers["retry-after"] == "1"
+
+            bomb = await c.post("/posts/", **form(65))
+            assert bomb.status_code == 413
+
+    asyncio.run(scenario())
@@ -0,0 +1,76 @@
+import asyncio
+import io
+import json
+
+from PIL import Image
+
+from app.adapters.sql_profiler import assert_max_queries
+from tests.unit.test_image_formats import png_header
+
+
+def _jpeg(size: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (size, size), "red").save(buffer, "jpeg")
+    return buffer.getvalue()
+
+
+def _picture(file: int, size: int) -> dict:
+    return {"file": file, "area": {"x": 0, "y": 0, "width": size, "height": size, "rotate": 0}}
+
+
+def test_batch_is_inserted_in_one_transaction_with_per_item_results(database, user, client):
+    async def scenario():
+        posts = [
+            {"title": "first", "pictures": [_picture(0, 32), _picture(1, 48)]},
+            {"title": "broken", "pictures": [_picture(0, 32), _picture(2, 16)]},
+        ] + [{"title": f"post {i}", "pictures": [_picture(1, 48)]} for i in range(10)]
+        files = [
+            ("files", ("a.jpg", _jpeg(32), "image/jpeg")),
+            ("files", ("b.jpg", _jpeg(48), "image/jpeg")),
+            ("files", ("c.gif", b"GIF89a" + b"\x00" * 32, "image/gif")),
+        ]
+        async with client() as c:
+            # SQLite cannot order multi-row RETURNING, so SQLAlchemy inserts its posts one by one;
+            # PostgreSQL sends them as a single INSERT. Pictures and stats are batched on both.
+            with assert_max_queries(11 + 3):
+                response = await c.post("/posts/batch", data={"posts": json.dumps(posts)}, files=files)
+            assert response.status_code == 200
+            items = response.json()["items"]
+            assert items[1] == {"postId": None, "error": "unsupported image format"}
+            published = [item["postId"] for item in items if item["postId"]]
+            assert len(published) == 11 and published == sorted(published)
+
+            first = (await c.get(f"/posts/{items[0]['postId']}")).json()
+            assert first["title"] == "first"
+            assert sorted(p["width"] for p in first["pictures"]) == [32, 48]
+            assert (await c.get("/users/user")).json()["pictures"] == 12
+
+            invalid = await c.post("/posts/batch", data={"posts": json.dumps([{"pictures": [_picture(5, 1)]}])})
+            assert invalid.status_code == 400
+
+    asyncio.run(scenario())
+
+
+def test_oversized_image_fails_only_its_post(database, user, client, admission):
+    admission.max_image_pixels = 48 * 48 - 1
+
+    async def scenario():
+        posts = [
+            {"title": "small", "pictures": [_picture(0, 32)]},
+            {"title": "large", "pictures": [_picture(0, 32), _picture(1, 48)]},
+            {"title": "bomb", "pictures": [_picture(2, 32)]},
+        ]
+        files = [
+            ("files", ("a.jpg", _jpeg(32), "image/jpeg")),
+            ("files", ("b.jpg", _jpeg(48), "image/jpeg")),
+            ("files", ("c.png", png_header(100_000, 100_000), "image/png")),
+        ]
+        async with client() as c:
+            response = await c.post("/posts/batch", data={"posts": json.dumps(posts)}, files=files)
+            assert response.status_code == 200
+            items = response.json()["items"]
+            assert items[0]["postId"] and items[0]["error"] is None
+            assert items[1:] == [{"postId": None, "error": "image is too large"}] * 2
+            assert (await c.get("/users/user")).json()["pictures"] == 1
+
+    asyncio.run(scenario())
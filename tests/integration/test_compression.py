@@ -0,0 +1,72 @@
+import asyncio
+import uuid
+
+from PIL import Image
+
+from app.adapters.compression import negotiate
+from app.adapters.sql_profiler import assert_max_queries
+from app.config import Config
+from app.domain import models
+from app.service_layer.unit_of_work import UnitOfWork
+
+
+async def _seed_posts(n: int):
+    async with UnitOfWork() as uow:
+        for i in range(n):
+            uow.posts.add(models.Post(user_id=0, title=f"title {i}", description="description " * 20, pictures=[
+                models.Picture(id=uuid.uuid4(), format="jpeg", size=1, height=1, width=1)
+            ]))
+        await uow.commit()
+
+
+def test_negotiate_respects_q_values():
+    assert negotiate("gzip, br", ("br", "gzip")) == "br"
+    assert negotiate("br;q=0.5, gzip", ("br", "gzip")) == "gzip"
+    assert negotiate("br;q=0, *", ("br", "gzip")) == "gzip"
+    assert negotiate("identity", ("br", "gzip")) is None
+    assert negotiate("", ("gzip",)) is None
+
+
+def test_feed_is_served_precompressed_from_cache(database, user, client, feed_cache, post_form):
+    async def scenario():
+        await _seed_posts(20)
+        async with client() as c:
+            first = await c.get("/posts/", headers={"Accept-Encoding": "gzip"})
+            assert first.headers["content-encoding"] == "gzip"
+            assert "Accept-Encoding" in first.headers["vary"]
+
+            with assert_max_queries(0):
+                second = await c.get("/posts/", headers={"Accept-Encoding": "gzip"})
+            assert second.json() == first.json() and len(first.json()) == 20
+            # only the encodings clients asked for are compressed
+            assert list(feed_cache.get(("feed", None, None)).compressed) == ["gzip"]
+
+            plain = await c.get("/posts/", headers={"Accept-Encoding": "identity"})
+            assert "content-encoding" not in plain.headers
+            assert plain.json() == first.json()
+
+            await c.post("/posts/", **post_form(Image.new("RGB", (64, 64), "red")))
+            assert len((await c.get("/posts/")).json()) == 21
+
+    asyncio.run(scenario())
+
+
+def test_middleware_skips_images_and_small_bodies(database, user, gallery, client, post_form, monkeypatch):
+    monkeypatch.setattr(Config().metrics, "enabled", True)
+
+    async def scenario():
+        async with client() as c:
+            missing = await c.get("/posts/1", headers={"Accept-Encoding": "gzip"})
+            assert missing.status_code == 404 and "content-encoding" not in missing.headers
+
+            metrics = await c.get("/metrics", headers={"Accept-Encoding": "gzip"})
+            assert metrics.headers["content-encoding"] == "gzip"
+            assert metrics.text.startswith("# HELP")
+
+            await c.post("/posts/", **post_form(Image.new("RGB", (256, 256), "red")))
+            picture = (await c.get("/posts/")).json()[0]["pictures"][0]
+            image = await c.get(f"/pictures/optimized/0/{picture['id']}", headers={"Accept-Encoding": "gzip"})
+            assert image.status_code == 200
+            assert "content-encoding" not in image.headers
+
+    asyncio.run(scenario())
@@ -0,0 +1,41 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import orjson
+
+from app.api.posts import endpoints
+from app.domain import models
+from app.service_layer.unit_of_work import UnitOfWork
+
+
+def test_export_streams_ndjson_and_resumes_from_the_last_line(database, client, monkeypatch):
+    monkeypatch.setattr(endpoints, "EXPORT_CHUNK", 1)
+    created_at = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+    async def scenario():
+        async with UnitOfWork() as uow:
+            uow.users.add(models.User(id=1, username="user", email="user@example.com", name="", bio=""))
+            for post_id in range(1, 6):
+                # posts 2 and 3 share a timestamp, only the id tells them apart
+                uow.posts.add(models.Post(
+                    id=post_id, user_id=1, title=f"post {post_id}", description="",
+                    created_at=created_at + timedelta(minutes=post_id - (post_id == 3)),
+                    pictures=[
+                        models.Picture(id=uuid.uuid4(), format="jpeg", size=1, height=1, width=1) for _ in range(2)
+                    ]
+                ))
+            await uow.commit()
+
+        async with client() as c:
+            async with c.stream("GET", "/posts/export") as response:
+                assert response.headers["content-type"] == "application/x-ndjson"
+                lines = [orjson.loads(line) async for line in response.aiter_lines() if line]
+            assert [post["id"] for post in lines] == [1, 2, 3, 4, 5]
+            assert all(len(post["pictures"]) == 2 for post in lines)
+
+            last = lines[2]
+            response = await c.get("/posts/export", params={"since": last["createdAt"], "afterId": last["id"]})
+            assert [orjson.loads(line)["id"] for line in response.text.splitlines()] == [4, 5]
+
+    asyncio.run(scenario())
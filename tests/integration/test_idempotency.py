@@ -0,0 +1,84 @@
+import asyncio
+
+from sqlalchemy import func, select
+
+from app.domain import models
+from app.service_layer.idempotency import Idempotency, Lease, StoredResponse
+from app.service_layer.unit_of_work import UnitOfWork
+
+
+async def _count(model) -> int:
+    async with UnitOfWork() as uow:
+        return (await uow.session.execute(select(func.count()).select_from(model))).scalar()
+
+
+def test_retry_with_the_same_key_replays_the_first_response(database, user, client, post_form):
+    async def scenario():
+        async with client() as c:
+            first = await c.post("/posts/", headers={"Idempotency-Key": "k1"}, **post_form())
+            assert first.status_code == 200
+            assert "idempotent-replayed" not in first.headers
+
+            retry = await c.post("/posts/", headers={"Idempotency-Key": "k1"}, **post_form())
+            assert retry.status_code == 200
+            assert retry.headers["idempotent-replayed"] == "true"
+            assert retry.json() == first.json()
+            assert (await _count(models.Post), await _count(models.Picture)) == (1, 1)
+
+            reused = await c.post("/posts/", headers={"Idempotency-Key": "k1"}, **post_form(title="another post"))
+            assert reused.status_code == 422
+
+            assert (await c.post("/posts/", headers={"Idempotency-Key": "k2"}, **post_form())).status_code == 200
+            assert (await c.post("/posts/", **post_form())).status_code == 200
+            assert await _count(models.Post) == 3
+
+    asyncio.run(scenario())
+
+
+def test_duplicate_of_a_request_in_progress_waits_for_its_response(database, user, client, idempotency, post_form):
+    async def scenario():
+        async with client() as c:
+            await c.post("/posts/", headers={"Idempotency-Key": "first"}, **post_form())
+            async with UnitOfWork() as uow:
+                fingerprint = (await uow.idempotency_keys.get(0, "first")).fingerprint
+                await uow.commit()
+
+            # another worker holds the key and does not finish within the wait
+            assert isinstance(await idempotency.claim(0, "busy", fingerprint), Lease)
+            busy = await c.post("/posts/", headers={"Idempotency-Key": "busy"}, **post_form())
+            assert busy.status_code == 409
+
+            # ... or finishes while the duplicate is waiting
+            lease = await idempotency.claim(0, "slow", fingerprint)
+            retry = asyncio.create_task(c.post("/posts/", headers={"Idempotency-Key": "slow"}, **post_form()))
+            await asyncio.sleep(0.1)
+            await idempotency.complete(lease, 200, b'{"message":"post published"}', {})
+            replayed = await retry
+            assert replayed.status_code == 200
+            assert replayed.headers["idempotent-replayed"] == "true"
+            assert await _count(models.Post) == 1
+
+    asyncio.run(scenario())
+
+
+def test_owner_whose_claim_was_taken_over_does_not_overwrite_it(database, user):
+    async def scenario():
+        idempotency = Idempotency(wait=0, lock_timeout=0)
+        stalled = await idempotency.claim(0, "key", "fingerprint")
+        await asyncio.sleep(0.01)
+        owner = await idempotency.claim(0, "key", "fingerprint")
+        assert isinstance(owner, Lease) and owner.token != stalled.token
+
+        await idempotency.complete(stalled, 500, b'{"message":"stale"}', {})
+        await idempotency.release(stalled)
+        async with UnitOfWork() as uow:
+            row = await uow.idempotency_keys.get(0, "key")
+            assert (row.status_code, row.locked_at is not None) == (None, True)
+            await uow.commit()
+
+        await idempotency.complete(owner, 200, b'{"message":"post published"}', {})
+        assert await Idempotency(wait=0).claim(0, "key", "fingerprint") == StoredResponse(
+            200, b'{"message":"post published"}'
+        )
+
+    asyncio.run(scenario())
@@ -0,0 +1,40 @@
+import asyncio
+import io
+import json
+import os
+
+from PIL import Image
+
+from tests.unit.test_image_formats import png_header
+
+
+def test_post_with_unsupported_picture_is_rejected_as_a_whole(database, user, gallery, client):
+    jpeg = io.BytesIO()
+    Image.new("RGB", (64, 64), "red").save(jpeg, "jpeg")
+
+    async def scenario():
+        area = json.dumps({"x": 0, "y": 0, "width": 64, "height": 64, "rotate": 0})
+        async with client() as c:
+            response = await c.post("/posts/", data={"saveOriginals": ["false", "false"], "areas": [area, area]}, files=[
+                ("files", ("a.jpg", jpeg.getvalue(), "image/jpeg")),
+                ("files", ("b.gif", b"GIF89a" + b"\x00" * 32, "image/gif")),
+            ])
+            assert response.status_code == 415
+            assert (await c.get("/posts/")).json() == []
+        assert not os.listdir(os.path.join(gallery.base_path, "optimized"))
+
+    asyncio.run(scenario())
+
+
+def test_decompression_bomb_header_gets_413(database, client):
+    area = json.dumps({"x": 0, "y": 0, "width": 64, "height": 64, "rotate": 0})
+
+    async def scenario():
+        async with client() as c:
+            single = await c.post("/posts/", data={"saveOriginals": ["false"], "areas": [area]}, files=[
+                ("files", ("bomb.png", png_header(20000, 20000), "image/png")),
+            ])
+            assert single.status_code == 413
+            assert (await c.get("/posts/")).json() == []
+
+    asyncio.run(scenario())
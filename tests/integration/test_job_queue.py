@@ -0,0 +1,184 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime, timezone
+from logging import getLogger
+
+import orjson
+import pytest
+from sqlalchemy import update
+
+from app.domain import models
+from app.service_layer.queue import Handler, JobWorker, PublishQueue
+from app.service_layer.unit_of_work import UnitOfWork
+from app.service_layer.worker import handlers
+
+
+@pytest.fixture
+def publish_queue():
+    return PublishQueue(max_attempts=2)
+
+
+def test_post_is_accepted_and_published_by_a_worker(database, user, client, gallery, feed_cache, post_form):
+    async def scenario():
+        worker = JobWorker(getLogger("JobWorker"), handlers(gallery))
+        async with client() as c:
+            accepted = await c.post("/posts/", **post_form())
+            assert accepted.status_code == 202
+            post_id = accepted.json()["id"]
+            assert accepted.json()["status"] == "processing"
+            assert accepted.headers["location"] == f"/posts/{post_id}/status"
+            assert os.listdir(os.path.join(gallery.uploads.base_path, "0"))
+
+            assert (await c.get(accepted.headers["location"])).json()["status"] == "processing"
+            assert (await c.get(f"/posts/{post_id}")).status_code == 404
+            assert (await c.get("/posts/")).json() == []
+
+            assert await worker.run_once()
+            assert not await worker.run_once()
+
+            assert (await c.get(accepted.headers["location"])).json() == {
+                "id": post_id, "status": "published", "attempts": 0, "error": None
+            }
+            assert len((await c.get(f"/posts/{post_id}")).json()["pictures"]) == 1
+            # the worker cannot invalidate this process' cache, the page is served until its ttl
+            assert (await c.get("/posts/")).json() == []
+            assert not os.listdir(os.path.join(gallery.uploads.base_path, "0"))
+            assert (await c.get("/posts/404/status")).status_code == 404
+
+        async with UnitOfWork() as uow:
+            assert (await uow.user_stats.get(0)).pictures == 1
+
+    asyncio.run(scenario())
+
+
+def test_post_published_by_a_worker_is_after_the_export_cursor(database, user, client, gallery, post_form):
+    async def scenario():
+        worker = JobWorker(getLogger("JobWorker"), handlers(gallery))
+        async with client() as c:
+            slow = (await c.post("/posts/", **post_form())).json()["id"]
+            async with UnitOfWork() as uow:
+                uow.posts.add(models.Post(id=slow + 1, user_id=0, title="post", description="", pictures=[
+                    models.Picture(id=uuid.uuid4(), format="jpeg", size=1, height=1, width=1)
+                ]))
+                await uow.commit()
+            synced = [orjson.loads(line) for line in (await c.get("/posts/export")).text.splitlines()]
+            assert [post["id"] for post in synced] == [slow + 1]
+
+            assert await worker.run_once()
+            response = await c.get(
+                "/posts/export", params={"since": synced[-1]["createdAt"], "afterId": synced[-1]["id"]}
+            )
+            assert [orjson.loads(line)["id"] for line in response.text.splitlines()] == [slow]
+
+    asyncio.run(scenario())
+
+
+def test_oversized_image_is_refused_before_it_is_staged(database, user, client, gallery, admission, post_form):
+    admission.max_image_pixels = 32 * 32 - 1
+
+    async def scenario():
+        async with client() as c:
+            assert (await c.post("/posts/", **post_form())).status_code == 413
+            assert not os.path.exists(os.path.join(gallery.uploads.base_path, "0"))
+
+    asyncio.run(scenario())
+
+
+def test_worker_fails_a_staged_image_above_the_limit(database, user, client, gallery, post_form):
+    async def scenario():
+        worker = JobWorker(getLogger("JobWorker"), handlers(gallery, max_image_pixels=32 * 32 - 1))
+        async with client() as c:
+            location = (await c.post("/posts/", **post_form())).headers["location"]
+            assert await worker.run_once()
+            failed = (await c.get(location)).json()
+            assert (failed["status"], failed["attempts"]) == ("failed", 1)
+            assert failed["error"].startswith("ImageTooLarge")
+
+    asyncio.run(scenario())
+
+
+def test_retry_of_an_accepted_post_replays_its_location(database, user, client, post_form):
+    async def scenario():
+        async with client() as c:
+            accepted = await c.post("/posts/", headers={"Idempotency-Key": "k1"}, **post_form())
+            assert accepted.status_code == 202
+            retry = await c.post("/posts/", headers={"Idempotency-Key": "k1"}, **post_form())
+            assert retry.status_code == 202
+            assert retry.headers["idempotent-replayed"] == "true"
+            assert retry.headers["location"] == accepted.headers["location"]
+            assert retry.json() == accepted.json()
+
+    asyncio.run(scenario())
+
+
+def test_missing_staged_picture_fails_the_post_without_retries(database, user, client, gallery, post_form):
+    async def scenario():
+        worker = JobWorker(getLogger("JobWorker"), handlers(gallery))
+        async with client() as c:
+            location = (await c.post("/posts/", **post_form())).headers["location"]
+            for upload in os.listdir(os.path.join(gallery.uploads.base_path, "0")):
+                os.remove(os.path.join(gallery.uploads.base_path, "0", upload))
+
+            assert await worker.run_once()
+            failed = (await c.get(location)).json()
+            assert (failed["status"], failed["attempts"]) == ("failed", 1)
+            assert failed["error"].startswith("UploadNotFound")
+            assert not await worker.run_once()
+
+    asyncio.run(scenario())
+
+
+def test_failed_jobs_are_retried_with_backoff_and_abandoned_ones_released(database):
+    calls, failed = [], []
+
+    async def run(payload):
+        calls.append(payload)
+        if len(calls) == 1:
+            raise ConnectionError("storage is unavailable")
+
+    async def on_failed(payload):
+        failed.append(payload)
+
+    async def enqueue(**payload) -> int:
+        async with UnitOfWork() as uow:
+            job = models.Job(kind="test", payload=payload, max_attempts=2, run_at=datetime.now(timezone.utc))
+            uow.jobs.add(job)
+            await uow.commit()
+        return job.id
+
+    async def job(job_id: int) -> models.Job | None:
+        async with UnitOfWork() as uow:
+            found = await uow.session.get(models.Job, job_id)
+            await uow.commit()
+        return found
+
+    async def scenario():
+        worker = JobWorker(getLogger("JobWorker"), {"test": Handler(run, on_failed)}, retry_backoff=0.2)
+        retried = await enqueue(n=1)
+        assert await worker.run_once()
+        queued = await job(retried)
+        assert (queued.status, queued.attempts, queued.error) == ("queued", 1, "ConnectionError: storage is unavailable")
+        assert not await worker.run_once()
+        await asyncio.sleep(0.25)
+        assert await worker.run_once()
+        assert await job(retried) is None
+        assert calls == [{"n": 1}, {"n": 1}]
+
+        # a worker took two jobs and died, the second one on its last attempt
+        abandoned = [await enqueue(n=2), await enqueue(n=3)]
+        async with UnitOfWork() as uow:
+            assert len(await uow.jobs.acquire(["test"], "dead", datetime.now(timezone.utc), limit=2)) == 2
+            await uow.session.execute(
+                update(models.Job).where(models.Job.id == abandoned[1]).values(attempts=2)
+            )
+            await uow.commit()
+        assert not await worker.run_once()
+        worker.lock_timeout = 0
+        assert await worker.release_stale() == 2
+        assert [(await job(i)).status for i in abandoned] == ["queued", "failed"]
+        assert failed == [{"n": 3}]
+        assert await worker.run_once()
+        assert calls[-1] == {"n": 2}
+
+    asyncio.run(scenario())
@@ -0,0 +1,83 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+from PIL import Image
+from starlette.applications import Starlette
+
+from app.adapters.gallery import Source
+from app.api.pictures import serving
+
+
+async def _publish(c, form: dict) -> str:
+    await c.post("/posts/", **form)
+    return (await c.get("/posts/")).json()[0]["pictures"][0]["id"]
+
+
+@pytest.fixture
+def send_picture(request):
+    return serving.sender(getattr(request, "param", "app"), "/_pictures/", "/static/pictures/")
+
+
+@pytest.mark.parametrize("send_picture", ["app", "x-accel-redirect", "x-sendfile", "static"], indirect=True)
+def test_picture_is_served_by_the_configured_sender(database, user, gallery, client, send_picture, post_form):
+    async def scenario():
+        async with client() as c:
+            picture_id = await _publish(c, post_form(Image.new("RGB", (64, 64), "red")))
+            assert (await c.get(f"/pictures/optimized/0/{'0' * 32}")).status_code == 404
+
+            response = await c.get(f"/pictures/optimized/0/{picture_id}")
+            assert "immutable" in response.headers["cache-control"]
+            path = gallery.path(Source.optimized, "0", picture_id)
+            if isinstance(send_picture, serving.FileSender):
+                assert response.content == open(path, "rb").read()
+            elif isinstance(send_picture, serving.AccelRedirectSender):
+                assert response.headers["x-accel-redirect"] == f"/_pictures/optimized/0/{picture_id}"
+                assert response.content == b""
+            elif isinstance(send_picture, serving.SendfileSender):
+                assert response.headers["x-sendfile"] == path
+            else:
+                assert response.status_code == 308
+                assert response.headers["location"] == f"/static/pictures/optimized/0/{picture_id}"
+
+    asyncio.run(scenario())
+
+
+def test_static_mounts_expose_only_picture_sources(gallery):
+    os.makedirs(os.path.join(gallery.base_path, "optimized", "0"))
+    with open(os.path.join(gallery.base_path, "optimized", "0", "picture"), "wb") as f:
+        f.write(b"jpeg")
+    gallery.uploads.create("0", 4)
+
+    app = Starlette()
+    serving.mount_static(app, gallery.base_path, "/static/pictures/", list(Source))
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+            response = await c.get("/static/pictures/optimized/0/picture")
+            assert response.content == b"jpeg"
+            assert response.headers["content-type"] == "image/*"
+            assert "immutable" in response.headers["cache-control"]
+            assert (await c.get("/static/pictures/uploads/0")).status_code == 404
+
+    asyncio.run(scenario())
+
+
+def test_small_pictures_are_served_from_memory_until_deleted(database, user, gallery, client, post_form):
+    async def scenario():
+        async with client() as c:
+            picture_id = await _publish(c, post_form(Image.new("RGB", (64, 64), "red")))
+            url = f"/pictures/optimized/0/{picture_id}"
+            first = await c.get(url)
+            os.remove(gallery.path(Source.optimized, "0", picture_id))
+
+            second = await c.get(url)
+            assert second.content == first.content
+            assert second.headers["cache-control"] == first.headers["cache-control"]
+            assert second.headers["content-length"] == str(len(first.content))
+
+            assert (await c.delete(f"/posts/{(await c.get('/posts/')).json()[0]['id']}")).status_code == 200
+            assert (await c.get(url)).status_code == 404
+
+    asyncio.run(scenario())
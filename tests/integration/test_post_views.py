@@ -0,0 +1,58 @@
+import asyncio
+import uuid
+
+from app.adapters.sql_profiler import assert_max_queries
+from app.domain import models
+from app.service_layer.unit_of_work import UnitOfWork
+
+
+def test_views_are_flushed_in_one_upsert_and_reads_stay_read_only(database, user, client, feed_cache, view_counter):
+    async def scenario():
+        async with UnitOfWork() as uow:
+            for post_id in (1, 2, 3):
+                uow.posts.add(models.Post(id=post_id, user_id=0, title=f"post {post_id}", description="", pictures=[
+                    models.Picture(id=uuid.uuid4(), format="jpeg", size=1, height=1, width=1)
+                ]))
+            await uow.commit()
+
+        async with client() as c:
+            with assert_max_queries(1):
+                assert (await c.get("/posts/1")).json()["views"] == 0
+            for _ in range(2):
+                await c.get("/posts/1")
+            await c.get("/posts/2")
+            assert (await c.get("/posts/404")).status_code == 404
+            async with UnitOfWork() as uow:
+                await uow.posts.delete(3)
+                await uow.commit()
+            view_counter.hit(3)
+
+            with assert_max_queries(1):
+                await view_counter.flush()
+            await c.get("/posts/2")
+            await view_counter.flush()
+
+            feed_cache.invalidate(1)
+            assert (await c.get("/posts/1")).json()["views"] == 3
+            assert [p["views"] for p in (await c.get("/posts/")).json()] == [3, 2]
+
+        async with UnitOfWork() as uow:
+            assert await uow.session.get(models.PostViews, 3) is None
+
+    asyncio.run(scenario())
+
+
+def test_large_flushes_are_split_into_batches(database, user):
+    async def scenario():
+        async with UnitOfWork() as uow:
+            for post_id in (1, 2, 3):
+                uow.posts.add(models.Post(id=post_id, user_id=0, title=f"post {post_id}", description=""))
+            await uow.commit()
+
+        async with UnitOfWork() as uow:
+            with assert_max_queries(2):
+                await uow.post_views.increment_many({1: 1, 2: 2, 3: 3}, batch=2)
+            await uow.commit()
+            assert [(await uow.session.get(models.PostViews, post_id)).views for post_id in (1, 2, 3)] == [1, 2, 3]
+
+    asyncio.run(scenario())
@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import uuid
+
+import pytest
+
+from app.adapters.sql_profiler import assert_max_queries, normalize
+from app.api.metrics.profiler import SQLProfilerMiddleware
+from app.domain import models
+from app.service_layer.unit_of_work import UnitOfWork
+
+
+async def _seed_post() -> int:
+    async with UnitOfWork() as uow:
+        uow.users.add(models.User(id=1, username="user", email="user@example.com", name="", bio=""))
+        post = models.Post(user_id=1, title="title", description="", pictures=[
+            models.Picture(id=uuid.uuid4(), format="jpeg", size=1, height=1, width=1) for _ in range(3)
+        ])
+        uow.posts.add(post)
+        await uow.commit()
+        return post.id
+
+
+def test_normalize_collapses_literals_and_lists():
+    assert normalize("SELECT * FROM posts WHERE id IN ($1, $2, $3) AND title = 'a''b'") == \
+           "SELECT * FROM posts WHERE id IN (...) AND title = ?"
+    assert normalize("INSERT INTO t (a, b) VALUES (?, ?), (?, ?)") == "INSERT INTO t (a, b) VALUES (?, ?), ..."
+
+
+def test_get_post_is_a_single_statement(database, client):
+    async def scenario():
+        post_id = await _seed_post()
+        async with client() as c:
+            with assert_max_queries(1):
+                response = await c.get(f"/posts/{post_id}")
+        assert response.status_code == 200
+        assert len(response.json()["pictures"]) == 3
+
+    asyncio.run(scenario())
+
+
+def test_assert_max_queries_fails_on_extra_statements(database):
+    async def scenario():
+        with assert_max_queries(1):
+            async with UnitOfWork() as uow:
+                await uow.posts.get(1)
+                await uow.posts.get(2)
+
+    with pytest.raises(AssertionError, match="2 statements"):
+        asyncio.run(scenario())
+
+
+def test_profiler_reports_requests_that_raise(caplog):
+    async def failing(scope, receive, send):
+        raise RuntimeError("boom")
+
+    middleware = SQLProfilerMiddleware(failing, logging.getLogger("SQLProfiler"), 0, 2)
+    scope = {"type": "http", "method": "GET", "path": "/posts/1"}
+    with caplog.at_level(logging.WARNING), pytest.raises(RuntimeError):
+        asyncio.run(middleware(scope, None, None))
+    assert "GET /posts/1: slow request" in caplog.text
@@ -0,0 +1,12 @@
+import asyncio
+
+
+def test_request_id_is_taken_from_the_proxy_or_generated(database, client):
+    async def scenario():
+        async with client() as c:
+            forwarded = await c.get("/posts/1", headers={"X-Request-Id": "edge-42"})
+            assert forwarded.headers["x-request-id"] == "edge-42"
+            generated = await c.get("/posts/1", headers={"X-Request-Id": "bad id\n"})
+            assert len(generated.headers["x-request-id"]) == 32
+
+    asyncio.run(scenario())
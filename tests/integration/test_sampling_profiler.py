@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+from PIL import Image
+
+from app.adapters.sampler import PROFILER
+from app.config import Config
+
+
+@pytest.fixture
+def profiling(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config().profiling, "sampling_token", "secret")
+    monkeypatch.setattr(Config().profiling, "sampling_interval", 0.001)
+    monkeypatch.setattr(Config().profiling, "output_dir", str(tmp_path / "profiles"))
+    yield
+    PROFILER.configure(None, 0.005, "profiles")
+
+
+def _noise() -> Image.Image:
+    return Image.effect_noise((1600, 1200), 64).convert("RGB")
+
+
+def test_selected_request_is_sampled_under_its_route(database, user, profiling, client, post_form):
+    async def scenario():
+        async with client() as c:
+            plain = await c.post("/posts/", **post_form(_noise(), format="png"))
+            assert "x-profile-id" not in plain.headers
+            assert (await c.post("/profiling/windows", headers={"X-Profile": "wrong"})).status_code == 403
+
+            response = await c.post("/posts/", headers={"X-Profile": "secret"}, **post_form(_noise(), format="png"))
+            assert response.status_code == 200
+            profile_id = response.headers["x-profile-id"]
+
+            collapsed = (await c.get(
+                f"/profiling/{profile_id}", params={"format": "collapsed"}, headers={"X-Profile": "secret"}
+            )).text
+            assert all(line.startswith("POST /posts/;") for line in collapsed.splitlines())
+            assert "app.adapters.gallery:ImageProcess." in collapsed
+
+            speedscope = (await c.get(f"/profiling/{profile_id}", headers={"X-Profile": "secret"})).json()
+            assert speedscope["profiles"][0]["type"] == "sampled"
+            assert (await c.get("/profiling/missing", headers={"X-Profile": "secret"})).status_code == 404
+
+            form = post_form(_noise(), format="png")
+            window = (await c.post(
+                "/profiling/windows", params={"seconds": 0.5}, headers={"X-Profile": "secret"}
+            )).json()
+            await c.post("/posts/", **form)
+            await asyncio.sleep(0.6)
+            collapsed = (await c.get(
+                f"/profiling/{window['id']}", params={"format": "collapsed"}, headers={"X-Profile": "secret"}
+            )).text
+            assert "POST /posts/;" in collapsed
+
+    asyncio.run(scenario())
@@ -0,0 +1,62 @@
+import asyncio
+import uuid
+
+from app.domain import models
+from app.service_layer.unit_of_work import UnitOfWork
+
+
+async def _seed(posts: list[tuple[str, str]]):
+    async with UnitOfWork() as uow:
+        uow.users.add(models.User(id=1, username="user", email="user@example.com", name="", bio=""))
+        for title, description in posts:
+            uow.posts.add(models.Post(user_id=1, title=title, description=description, pictures=[
+                models.Picture(id=uuid.uuid4(), format="jpeg", size=1, height=1, width=1)
+            ]))
+        await uow.commit()
+
+
+def test_search_ranks_and_highlights(database, client):
+    async def scenario():
+        await _seed([
+            ("Sunset", "sea and sunset over the harbour"),
+            ("Mountains", "snow on the peaks"),
+            ("Sunset sunset", "another sunset"),
+        ])
+        async with client() as c:
+            response = await c.get("/posts/search", params={"q": "sunset"})
+        assert response.status_code == 200
+        items = response.json()["items"]
+        assert [i["post"]["title"] for i in items] == ["Sunset sunset", "Sunset"]
+        assert "<mark>" in items[0]["snippet"]
+
+    asyncio.run(scenario())
+
+
+def test_search_keyset_pagination(database, client):
+    async def scenario():
+        await _seed([(f"cat {i}", "a cat photo") for i in range(5)])
+        seen = []
+        async with client() as c:
+            params = {"q": "cat", "limit": 2}
+            while True:
+                page = (await c.get("/posts/search", params=params)).json()
+                seen += [i["post"]["id"] for i in page["items"]]
+                if not page["nextCursor"]:
+                    break
+                params["cursor"] = page["nextCursor"]
+            invalid = await c.get("/posts/search", params={"q": "cat", "cursor": "???"})
+        assert sorted(seen) == [1, 2, 3, 4, 5]
+        assert len(set(seen)) == 5
+        assert invalid.status_code == 400
+
+    asyncio.run(scenario())
+
+
+def test_snippets_escape_the_post_text(database, client):
+    async def scenario():
+        await _seed([("<script>sunset</script>", "")])
+        async with client() as c:
+            items = (await c.get("/posts/search", params={"q": "sunset"})).json()["items"]
+        assert items[0]["snippet"] == "&lt;script&gt;<mark>sunset</mark>&lt;/script&gt;"
+
+    asyncio.run(scenario())
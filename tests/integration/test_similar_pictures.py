@@ -0,0 +1,54 @@
+import asyncio
+import io
+import uuid
+
+from PIL import Image, ImageDraw
+
+from app.adapters.similarity import SimilarityIndex
+from app.domain import models
+from app.service_layer import dto, jobs, services
+from app.service_layer.unit_of_work import UnitOfWork
+
+
+def _jpeg(box: tuple[int, int, int, int], quality: int = 90) -> bytes:
+    image = Image.new("RGB", (96, 64), "white")
+    ImageDraw.Draw(image).rectangle(box, fill="red")
+    buffer = io.BytesIO()
+    image.save(buffer, "jpeg", quality=quality)
+    return buffer.getvalue()
+
+
+async def _publish(gallery, raw: bytes):
+    await services.publish_post(dto.NewPost(user_id=1, title="title", description="", pictures=[
+        dto.NewPicture(file_bytes=raw, crop_box=(0, 0, 96, 64), save_original=False)
+    ]), gallery)
+
+
+def test_near_duplicates_are_flagged_and_listed(database, gallery, client, tmp_path):
+    async def scenario():
+        async with UnitOfWork() as uow:
+            uow.users.add(models.User(id=1, username="user", email="user@example.com", name="", bio=""))
+            await uow.commit()
+        await _publish(gallery, _jpeg((10, 10, 60, 40)))
+        await _publish(gallery, _jpeg((10, 10, 60, 40), quality=30))
+        await _publish(gallery, _jpeg((50, 30, 90, 60)))
+
+        async with client() as c:
+            posts = {p["id"]: p["pictures"][0] for p in (await c.get("/posts/")).json()}
+            original, copy = posts[1], posts[2]
+            assert original["nearDuplicateOf"] is None
+            assert copy["nearDuplicateOf"] == original["id"]
+
+            similar = (await c.get(f"/pictures/{original['id']}/similar")).json()
+            assert [(s["picture"]["id"], s["postId"], s["userId"]) for s in similar] == [(copy["id"], 2, 1)]
+            assert (await c.get(f"/pictures/{original['id']}/similar", params={"radius": 17})).status_code == 422
+
+            path = str(tmp_path / "phash.npy")
+            assert await jobs.build_similarity_index(path, batch=2) == 3
+            assert SimilarityIndex(path).load() == 3
+
+            await services.delete_post(2, gallery)
+            assert (await c.get(f"/pictures/{original['id']}/similar")).json() == []
+            assert (await c.get(f"/pictures/{uuid.uuid4()}/similar")).status_code == 404
+
+    asyncio.run(scenario())
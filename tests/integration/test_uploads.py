@@ -0,0 +1,82 @@
+import asyncio
+import base64
+import hashlib
+import io
+import json
+
+import pytest
+from PIL import Image
+
+from app.adapters.uploads import UploadStorage, UploadWriter
+from app.domain import exceptions
+
+
+def _jpeg() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (320, 240), "blue").save(buffer, "jpeg")
+    return buffer.getvalue()
+
+
+def _checksum(data: bytes) -> str:
+    return "sha256 " + base64.b64encode(hashlib.sha256(data).digest()).decode()
+
+
+def test_resumable_upload_is_published_by_id(database, user, gallery, client):
+    data = _jpeg()
+    half = len(data) // 2
+
+    async def scenario():
+        async with client() as c:
+            created = await c.post("/uploads/", headers={"Upload-Length": str(len(data)), "Upload-Checksum": _checksum(data)})
+            assert created.status_code == 201
+            location = created.headers["Location"]
+            upload_id = created.json()["id"]
+
+            first = await c.patch(location, content=data[:half], headers={"Upload-Offset": "0"})
+            assert first.headers["Upload-Offset"] == str(half)
+
+            stale = await c.patch(location, content=data[half:], headers={"Upload-Offset": "0"})
+            assert stale.status_code == 409
+
+            corrupted = await c.patch(location, content=b"x" * (len(data) - half), headers={
+                "Upload-Offset": str(half), "Upload-Checksum": _checksum(data[half:])
+            })
+            assert corrupted.status_code == 460
+            assert (await c.head(location)).headers["Upload-Offset"] == str(half)
+
+            early = await c.post("/posts/", data={"saveOriginals": ["false"], "areas": [json.dumps(
+                {"x": 0, "y": 0, "width": 320, "height": 240, "rotate": 0}
+            )], "uploads": [upload_id]})
+            assert early.status_code == 409
+
+            await c.patch(location, content=data[half:], headers={
+                "Upload-Offset": str(half), "Upload-Checksum": _checksum(data[half:])
+            })
+            assert (await c.post(f"{location}/finalize")).json()["finished"]
+
+            published = await c.post("/posts/", data={"saveOriginals": ["false"], "areas": [json.dumps(
+                {"x": 0, "y": 0, "width": 320, "height": 240, "rotate": 0}
+            )], "uploads": [upload_id]})
+            assert published.status_code == 200
+            assert (await c.head(location)).status_code == 404
+
+            posts = (await c.get("/posts/")).json()
+            assert posts[0]["pictures"][0]["size"] == len(data)
+
+    asyncio.run(scenario())
+
+
+def test_writer_checks_the_offset_once_it_holds_the_lock(tmp_path):
+    storage = UploadStorage(str(tmp_path), 1024)
+    upload = storage.create("0", 6)
+    # read by a request that then waits while another one appends
+    stale = storage.get("0", upload.id)
+    with storage.writer("0", upload.id, 0) as writer:
+        writer.write(b"abc")
+        writer.commit()
+
+    with pytest.raises(exceptions.UploadOffsetMismatch):
+        UploadWriter(storage, stale, 0)
+    with UploadWriter(storage, stale, 3) as writer:
+        writer.write(b"def")
+        assert writer.commit() == 6
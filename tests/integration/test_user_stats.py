@@ -0,0 +1,79 @@
+import asyncio
+import io
+import os
+
+import pytest
+from PIL import Image
+from sqlalchemy.exc import IntegrityError
+
+from app.adapters import repository
+from app.domain import models
+from app.service_layer import dto, jobs, services
+from app.service_layer.unit_of_work import UnitOfWork
+
+
+def _jpeg() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), "red").save(buffer, "jpeg")
+    return buffer.getvalue()
+
+
+async def _publish(gallery, pictures: int):
+    await services.publish_post(dto.NewPost(user_id=1, title="title", description="", pictures=[
+        dto.NewPicture(file_bytes=_jpeg(), crop_box=(0, 0, 64, 48), save_original=False)
+        for _ in range(pictures)
+    ]), gallery)
+
+
+def test_counters_follow_publish_and_delete(database, gallery, client):
+    async def scenario():
+        async with UnitOfWork() as uow:
+            uow.users.add(models.User(id=1, username="user", email="user@example.com", name="", bio=""))
+            await uow.commit()
+        await _publish(gallery, 2)
+        await _publish(gallery, 1)
+        assert len((await services.delete_post(1, gallery)).pictures) == 2
+        # a retried delete finds nothing to delete and leaves the counters alone
+        assert await services.delete_post(1, gallery) is None
+
+        async with client() as c:
+            profile = (await c.get("/users/user")).json()
+            posts = (await c.get("/users/user/posts")).json()
+        assert (profile["posts"], profile["pictures"]) == (1, 1)
+        assert profile["storageBytes"] == len(_jpeg())
+        assert [p["id"] for p in posts["items"]] == [2]
+
+    asyncio.run(scenario())
+
+
+def test_repair_fixes_drift(database):
+    async def scenario():
+        async with UnitOfWork() as uow:
+            uow.users.add(models.User(id=1, username="user", email="user@example.com", name="", bio=""))
+            uow.users.add(models.User(id=2, username="other", email="other@example.com", name="", bio=""))
+            uow.session.add(models.UserStats(user_id=1, posts=5, pictures=5, storage_bytes=5))
+            await uow.commit()
+
+        assert await jobs.repair_user_stats(batch=1) == 2
+        assert await jobs.repair_user_stats() == 0
+        async with UnitOfWork() as uow:
+            stats = await uow.user_stats.get(1)
+            assert (stats.posts, stats.pictures, stats.storage_bytes) == (0, 0, 0)
+
+    asyncio.run(scenario())
+
+
+def test_failed_publish_is_reported_and_leaves_no_files(database, gallery, monkeypatch):
+    async def conflict(*args):
+        raise IntegrityError("INSERT INTO user_stats", {}, Exception("duplicate key"))
+
+    async def scenario():
+        monkeypatch.setattr(repository.UserStatsRepository, "increment", conflict)
+        with pytest.raises(IntegrityError):
+            await _publish(gallery, 2)
+        async with UnitOfWork() as uow:
+            assert await uow.posts.get(1) is None
+            await uow.commit()
+
+    asyncio.run(scenario())
+    assert not os.listdir(os.path.join(gallery.base_path, "optimized", "1"))
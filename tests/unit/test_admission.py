@@ -0,0 +1,34 @@
+import asyncio
+
+import pytest
+
+from app.adapters.admission import AdmissionController
+from app.domain.exceptions import AdmissionRejected, ImageTooLarge
+
+
+def test_limits_reject_instead_of_queueing():
+    admission = AdmissionController(max_pixels=100, max_image_pixels=80, max_jobs=1, per_user=1, queue_timeout=0.01)
+
+    async def scenario():
+        with pytest.raises(ImageTooLarge):
+            async with admission(1, [81]):
+                pass
+
+        async with admission(1, [60]):
+            with pytest.raises(AdmissionRejected, match="per_user"):
+                async with admission(1, [1]):
+                    pass
+            with pytest.raises(AdmissionRejected, match="pixels"):
+                async with admission(2, [50]):
+                    pass
+            with pytest.raises(AdmissionRejected, match="jobs"):
+                async with admission(2, [10]):
+                    pass
+            assert admission.pixels == 60
+
+        assert admission.pixels == 0
+        async with admission(1, [80, 80]):
+            # a post over the budget still runs once nothing else is in flight
+            assert admission.pixels == 160
+
+    asyncio.run(scenario())
@@ -0,0 +1,38 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from app.adapters.encoding import AdaptiveJPEGEncoder, JPEGEncoder, ssim
+
+
+def _gradient(width=320, height=240):
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.dstack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)])
+    return Image.fromarray(pixels.astype(np.uint8), "RGB")
+
+
+def test_ssim_of_identical_images_is_one():
+    a = np.asarray(_gradient().convert("L"), dtype=np.float64)
+    assert ssim(a, a) == 1.0
+
+
+def test_ssim_drops_with_noise():
+    a = np.asarray(_gradient().convert("L"), dtype=np.float64)
+    b = a + np.random.default_rng(0).normal(0, 25, a.shape)
+    assert ssim(a, b) < 0.9
+
+
+def test_adaptive_encoder_picks_quality_in_range():
+    encoder = AdaptiveJPEGEncoder(min_quality=50, max_quality=95, threshold=0.98, time_budget=5)
+    data, quality = encoder(_gradient())
+    fixed, _ = JPEGEncoder(95)(_gradient())
+    assert 50 <= quality <= 95
+    assert len(data) <= len(fixed)
+    assert Image.open(io.BytesIO(data)).info.get("progressive") == 1
+
+
+def test_adaptive_encoder_falls_back_to_max_quality_without_budget():
+    encoder = AdaptiveJPEGEncoder(min_quality=50, max_quality=90, threshold=0.98, time_budget=0)
+    _, quality = encoder(_gradient())
+    assert quality == 90
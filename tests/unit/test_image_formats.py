@@ -0,0 +1,52 @@
+import io
+import struct
+import zlib
+
+import pytest
+from PIL import Image
+
+from app.adapters import image_formats
+from app.domain.exceptions import ImageTooLarge, UnsupportedImageFormat
+
+
+def _encode(fmt: str, size=(32, 16)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "green").save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def png_header(width: int, height: int) -> bytes:
+    """A PNG that declares width x height but carries no pixel data."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", b"") + chunk(b"IEND", b"")
+
+
+@pytest.mark.parametrize("fmt", ["jpeg", "png"])
+def test_allowed_formats_are_probed_from_headers(fmt):
+    data = _encode(fmt)
+    assert image_formats.sniff(data) == fmt.upper()
+    probe = image_formats.probe(data)
+    assert (probe.format, probe.width, probe.height, probe.pixels) == (fmt, 32, 16, 512)
+
+
+# only the allow-listed plugins are registered, so other formats are spelled out by their magic bytes
+@pytest.mark.parametrize("data", [b"GIF89a" + b"\x00" * 32, b"BM" + b"\x00" * 52, b"not an image", b""])
+def test_everything_else_is_rejected_before_decode(data):
+    assert image_formats.sniff(data) is None
+    with pytest.raises(UnsupportedImageFormat):
+        image_formats.open_image(data)
+
+
+def test_sniffed_format_must_match_the_decoder():
+    with pytest.raises(UnsupportedImageFormat):
+        image_formats.open_image(b"\x89PNG\r\n\x1a\n" + b"\x00" * 64)
+
+
+def test_decompression_bomb_header_is_too_large():
+    source = io.BytesIO(png_header(20000, 20000))
+    with pytest.raises(ImageTooLarge):
+        image_formats.probe(source)
+    assert source.tell() == 0
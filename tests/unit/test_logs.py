@@ -0,0 +1,99 @@
+import json
+import logging
+import queue
+import time
+
+from app.adapters import logs, metrics
+from app.config import Logging
+
+
+def _record(name: str, level: int, message: str) -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 1, message, None, None)
+
+
+def test_full_queue_drops_by_policy_without_blocking():
+    dropped = metrics.LOG_RECORDS_DROPPED.labels("queue_full").value
+    for drop, kept in (("newest", ["a", "b"]), ("oldest", ["b", "c"])):
+        records = queue.Queue(2)
+        handler = logs.DroppingQueueHandler(records, drop)
+        for message in "abc":
+            handler.handle(_record("app", logging.INFO, message))
+        assert [records.get_nowait().getMessage() for _ in range(2)] == kept
+    assert metrics.LOG_RECORDS_DROPPED.labels("queue_full").value == dropped + 2
+
+
+def test_listener_stops_on_a_full_queue():
+    records = queue.Queue(2)
+    listener = logs.DroppingQueueListener(records, logging.NullHandler())
+    for message in "ab":
+        records.put_nowait(_record("app", logging.INFO, message))
+    listener.enqueue_sentinel()
+    assert records.get_nowait().getMessage() == "b"
+    assert records.get_nowait() is None
+
+    written = []
+    handler = logging.Handler()
+    handler.emit = written.append
+    listener = logs.DroppingQueueListener(records, handler)
+    for message in "ab":
+        records.put_nowait(_record("app", logging.INFO, message))
+    listener.start()
+    listener.stop()
+    assert [record.getMessage() for record in written] == ["a", "b"]
+
+
+def test_sampling_keeps_warnings_and_unlisted_loggers():
+    sampler = logs.SamplingFilter({"uvicorn.access": 0.0, "sqlalchemy": 1.0})
+    assert not sampler.filter(_record("uvicorn.access", logging.INFO, "GET /"))
+    assert sampler.filter(_record("uvicorn.access", logging.WARNING, "GET /"))
+    assert sampler.filter(_record("sqlalchemy.engine.Engine", logging.INFO, "SELECT 1"))
+    assert sampler.filter(_record("uvicorn.error", logging.INFO, "started"))
+
+
+def test_json_records_carry_the_request_id(capsys):
+    listener = logs.setup(Logging(format="json", sample={"noisy": 0.0}))
+    try:
+        token = logs.request_id.set("abc123")
+        logging.getLogger("app").info("published %d pictures", 3)
+        logging.getLogger("noisy").info("dropped")
+        logs.request_id.reset(token)
+    finally:
+        listener.stop()
+        logs._listener = None
+        logging.getLogger().handlers.clear()
+
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(e["logger"], e["message"], e["request_id"]) for e in lines] == [("app", "published 3 pictures", "abc123")]
+
+
+def test_exceptions_are_formatted_by_the_listener(capsys):
+    listener = logs.setup(Logging(format="json"))
+    try:
+        try:
+            raise ValueError("broken")
+        except ValueError:
+            logging.getLogger("app").exception("failed %s", "job")
+    finally:
+        listener.stop()
+        logs._listener = None
+        logging.getLogger().handlers.clear()
+
+    entry = json.loads(capsys.readouterr().out)
+    assert entry["message"] == "failed job"
+    assert entry["exception"].startswith("Traceback") and entry["exception"].endswith("ValueError: broken")
+
+
+def test_emitting_costs_microseconds():
+    handler = logs.DroppingQueueHandler(queue.Queue(100_000))
+    logger = logging.getLogger("tests.logs.cost")
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        start = time.perf_counter()
+        for i in range(10_000):
+            logger.warning("request %d", i)
+        per_record = (time.perf_counter() - start) / 10_000
+    finally:
+        logger.removeHandler(handler)
+    # generous bound, the point is that no I/O happens on the caller's side
+    assert per_record < 100e-6
@@ -0,0 +1,36 @@
+from app.adapters.metrics import Registry
+
+
+def test_histogram_exposes_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.histogram("latency_seconds", "Latency.", ["route"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.labels("/posts/").observe(value)
+
+    text = registry.expose()
+
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{route="/posts/",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{route="/posts/",le="1.0"} 3' in text
+    assert 'latency_seconds_bucket{route="/posts/",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{route="/posts/"} 4' in text
+    assert 'latency_seconds_sum{route="/posts/"} 2.65' in text
+
+
+def test_counter_and_callback_gauge():
+    registry = Registry()
+    counter = registry.counter("mails_total", "Mails.")
+    counter.inc()
+    counter.inc(2)
+    registry.gauge("pool", "Pool.", ["state"], lambda: {("checkedout",): 3})
+
+    text = registry.expose()
+
+    assert "mails_total 3" in text
+    assert 'pool{state="checkedout"} 3' in text
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    registry.counter("c", "C.", ["path"]).labels('a"b\\c').inc()
+    assert 'c{path="a\\"b\\\\c"} 1' in registry.expose()
@@ -0,0 +1,31 @@
+from app.adapters import metrics
+from app.adapters.picture_cache import PictureCache
+
+
+def test_cache_is_bounded_by_bytes_and_invalidated_per_picture():
+    cache = PictureCache(max_bytes=10, max_item_bytes=6)
+    cache.put(("optimized", "0", "a"), b"aaaa")
+    cache.put(("original", "0", "a"), b"AAAA")
+    assert cache.get(("optimized", "0", "a")).body == b"aaaa"
+
+    # least recently used goes first, oversized items are returned but not kept
+    cache.put(("optimized", "0", "b"), b"bbbb")
+    assert cache.get(("original", "0", "a")) is None
+    assert cache.put(("optimized", "0", "c"), b"c" * 7).body == b"c" * 7
+    assert cache.get(("optimized", "0", "c")) is None
+    assert cache.bytes == 8
+
+    cache.invalidate("0", "a")
+    assert cache.get(("optimized", "0", "a")) is None
+    assert cache.bytes == 4
+
+
+def test_entries_expire_and_lookups_are_counted():
+    cache = PictureCache(ttl=-1)
+    hits = metrics.PICTURE_CACHE_REQUESTS.labels("hit").value
+    misses = metrics.PICTURE_CACHE_REQUESTS.labels("miss").value
+    cache.put(("optimized", "0", "a"), b"a")
+    assert cache.get(("optimized", "0", "a")) is None
+    assert cache.bytes == 0
+    assert metrics.PICTURE_CACHE_REQUESTS.labels("hit").value == hits
+    assert metrics.PICTURE_CACHE_REQUESTS.labels("miss").value == misses + 1
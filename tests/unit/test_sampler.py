@@ -0,0 +1,60 @@
+import asyncio
+import os
+import sys
+
+from app.adapters.sampler import Profile, SamplingProfiler, collapse
+
+
+def test_collapse_is_root_first_with_qualified_names():
+    def inner():
+        return collapse(sys._getframe())
+
+    stack = inner()
+    assert stack[-1] == f"{__name__}:test_collapse_is_root_first_with_qualified_names.<locals>.inner"
+    assert stack[-2] == f"{__name__}:test_collapse_is_root_first_with_qualified_names"
+
+
+def test_profile_is_exported_as_collapsed_stacks_and_speedscope():
+    profile = Profile("GET /posts/{post_id}", interval=0.01, duration=0.03)
+    profile.stacks[("GET /posts/{post_id}", "a:f", "b:g")] += 2
+    profile.stacks[("GET /posts/{post_id}", "a:f")] += 1
+
+    assert profile.collapsed() == "GET /posts/{post_id};a:f;b:g 2\nGET /posts/{post_id};a:f 1\n"
+    speedscope = profile.speedscope()
+    names = [frame["name"] for frame in speedscope["shared"]["frames"]]
+    assert names == ["GET /posts/{post_id}", "a:f", "b:g"]
+    assert speedscope["profiles"][0]["samples"] == [[0, 1, 2], [0, 1, 2], [0, 1]]
+    assert speedscope["profiles"][0]["weights"] == [0.01] * 3
+
+
+def test_profiler_without_token_authorizes_nobody():
+    assert not SamplingProfiler().authorized("")
+    assert not SamplingProfiler().authorized(None)
+    assert SamplingProfiler("secret").authorized("secret")
+    assert not SamplingProfiler("secret").authorized("secreT")
+
+
+def test_sampler_thread_survives_a_failed_save(tmp_path):
+    profiler = SamplingProfiler(interval=0.001, output_dir=str(tmp_path))
+    save, failed = profiler.save, []
+
+    def save_once_failing(profile):
+        if not failed:
+            failed.append(profile.id)
+            raise OSError("No space left on device")
+        save(profile)
+
+    profiler.save = save_once_failing
+
+    async def scenario():
+        profiler.window(0.01)
+        second = profiler.window(0.05)
+        for _ in range(200):
+            if not profiler.active:
+                break
+            await asyncio.sleep(0.01)
+        return second
+
+    second = asyncio.run(scenario())
+    assert failed
+    assert os.path.exists(profiler.path(second.id, "collapsed"))
@@ -0,0 +1,26 @@
+import socket
+
+import pytest
+
+from app.config import Server
+from app.server import bind, uvicorn_config
+
+
+@pytest.mark.skipif(not hasattr(socket, "SO_REUSEPORT"), reason="SO_REUSEPORT is not available")
+def test_workers_bind_the_same_port_with_reuse_port():
+    first = bind(Server(host="127.0.0.1", port=0), reuse_port=True)
+    port = first.getsockname()[1]
+    second = bind(Server(host="127.0.0.1", port=port), reuse_port=True)
+    try:
+        assert second.getsockname()[1] == port
+        assert second.get_inheritable()
+    finally:
+        first.close()
+        second.close()
+
+
+def test_uvicorn_config_follows_server_settings():
+    config = uvicorn_config(Server(loop="asyncio", http="h11", backlog=128, keep_alive=75, graceful_timeout=10))
+    assert (config.loop, config.http, config.backlog) == ("asyncio", "h11", 128)
+    assert (config.timeout_keep_alive, config.timeout_graceful_shutdown) == (75, 10)
+    assert config.factory and config.app == "app.application:create_app"
@@ -0,0 +1,60 @@
+import io
+import random
+import uuid
+
+from PIL import Image, ImageDraw
+
+from app.adapters.similarity import MultiIndex, SimilarityIndex, dhash, hamming
+
+
+def _picture(seed: int) -> Image.Image:
+    rng = random.Random(seed)
+    image = Image.new("RGB", (320, 240), "white")
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.randrange(300), rng.randrange(220)
+        draw.ellipse((x, y, x + rng.randrange(20, 120), y + rng.randrange(20, 120)), fill=rng.randrange(1 << 24))
+    return image
+
+
+def test_dhash_survives_reencoding_and_resizing_but_not_other_pictures():
+    image = _picture(1)
+    buffer = io.BytesIO()
+    image.save(buffer, "jpeg", quality=40)
+    copy = Image.open(buffer).resize((160, 120)).crop((2, 2, 158, 118))
+
+    assert hamming(dhash(image), dhash(copy)) <= 8
+    assert hamming(dhash(image), dhash(_picture(2))) > 16
+    assert -(1 << 63) <= dhash(image) < 1 << 63
+
+
+def test_multi_index_search_matches_a_linear_scan():
+    rng = random.Random(0)
+    hashes = [rng.getrandbits(64) - (1 << 63) for _ in range(500)]
+    # a few near copies, so small radii find something
+    hashes += [h ^ (1 << rng.randrange(64)) for h in hashes[:50]]
+    pictures = [uuid.uuid4() for _ in hashes]
+    for parts in (9, 5):
+        index = MultiIndex(parts)
+        for h, picture in zip(hashes, pictures):
+            index.add(h, picture)
+
+        # radii above parts - 1 also look up substrings one or two bits away
+        for query in hashes[:20]:
+            for radius in (0, 2, 8, 12):
+                expected = {(hamming(query, h), p) for h, p in zip(hashes, pictures) if hamming(query, h) <= radius}
+                found = index.search(query, radius)
+                assert len(found) == len(expected) and set(found) == expected
+
+
+def test_index_is_rebuilt_from_a_snapshot_and_skips_deleted_pictures(tmp_path):
+    a, b, c = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    path = str(tmp_path / "index" / "phash.npy")
+    SimilarityIndex.save(path, [(-5, a), (-5 ^ 0b11, b), (1 << 40, c)])
+
+    index = SimilarityIndex(path, radius=4)
+    assert index.load() == 3
+    assert index.search(-5) == [(a, 0), (b, 2)]
+    index.discard(a)
+    assert index.nearest(-5) == b
+    assert SimilarityIndex(str(tmp_path / "missing.npy")).load() == 0
@@ -0,0 +1,70 @@
+import asyncio
+
+from app.adapters.view_counter import ViewCounter
+
+
+def test_hits_are_coalesced_and_kept_when_a_flush_fails():
+    flushed = []
+
+    async def store(counts):
+        if not flushed:
+            flushed.append(None)
+            raise ConnectionError()
+        flushed.append(counts)
+
+    async def scenario():
+        counter = ViewCounter(store)
+        for post_id in (1, 2, 1, 1):
+            counter.hit(post_id)
+        await counter.flush()
+        counter.hit(2)
+        await counter.flush()
+        await counter.flush()
+
+    asyncio.run(scenario())
+    assert flushed == [None, {1: 3, 2: 2}]
+
+
+def test_run_flushes_early_when_max_pending_is_reached():
+    flushed = []
+
+    async def store(counts):
+        flushed.append(counts)
+
+    async def scenario():
+        counter = ViewCounter(store, flush_interval=3600, max_pending=2)
+        task = asyncio.create_task(counter.run())
+        counter.hit(1)
+        await asyncio.sleep(0)
+        assert not flushed
+        counter.hit(2)
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert flushed == [{1: 1, 2: 1}]
+
+
+def test_failing_flushes_back_off_and_keep_the_most_viewed_posts():
+    attempts = []
+
+    async def store(counts):
+        attempts.append(asyncio.get_running_loop().time())
+        raise ConnectionError()
+
+    async def scenario():
+        counter = ViewCounter(store, flush_interval=0.01, max_pending=2, max_backoff=0.04)
+        for post_id in (1, 1, 2, 3, 3, 3):
+            counter.hit(post_id)
+        task = asyncio.create_task(counter.run())
+        await asyncio.sleep(0.1)
+        # full and failing, a view of a new post is dropped instead of forcing another flush
+        counter.hit(4)
+        counter.hit(3)
+        task.cancel()
+        return counter
+
+    counter = asyncio.run(scenario())
+    assert counter.failures == len(attempts)
+    assert 2 <= len(attempts) <= 4
+    assert dict(counter._pending) == {3: 4, 1: 2}
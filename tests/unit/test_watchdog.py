@@ -0,0 +1,38 @@
+import asyncio
+import logging
+import time
+
+from app.adapters import metrics
+from app.adapters.watchdog import REQUESTS, LoopWatchdog
+
+
+class _Route:
+    path = "/slow/{id}"
+
+
+def test_blocking_callback_is_attributed_to_its_route(caplog):
+    stalls = metrics.EVENT_LOOP_STALLS.labels("GET /slow/{id}").value
+
+    def block_the_loop():
+        time.sleep(0.3)
+
+    async def scenario():
+        watchdog = LoopWatchdog(logging.getLogger("LoopWatchdog"), interval=0.01, threshold=0.05)
+        watchdog.start()
+        await asyncio.sleep(0.05)
+        REQUESTS[asyncio.current_task()] = {"method": "GET", "route": _Route()}
+        try:
+            block_the_loop()
+        finally:
+            REQUESTS.pop(asyncio.current_task())
+        await asyncio.sleep(0.05)
+        await watchdog.stop()
+
+    with caplog.at_level(logging.WARNING, "LoopWatchdog"):
+        asyncio.run(scenario())
+
+    assert metrics.EVENT_LOOP_STALLS.labels("GET /slow/{id}").value == stalls + 1
+    assert metrics.EVENT_LOOP_STALL_SECONDS.labels("GET /slow/{id}").sum >= 0.25
+    stack, duration = [r.getMessage() for r in caplog.records if "GET /slow/{id}" in r.getMessage()]
+    assert "in block_the_loop" in stack
+    assert duration.startswith("event loop was blocked for")